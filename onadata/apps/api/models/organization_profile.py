@@ -9,6 +9,7 @@ from guardian.models import GroupObjectPermissionBase
 
 from onadata.apps.api.models.team import Team
 from onadata.apps.main.models import UserProfile
+from onadata.apps.main.signals import clear_obj_perms_cache
 from onadata.libs.utils.cache_tools import safe_delete, IS_ORG
 
 
@@ -105,3 +106,17 @@ class OrgProfileUserObjectPermission(UserObjectPermissionBase):
 class OrgProfileGroupObjectPermission(GroupObjectPermissionBase):
     """Guardian model to create direct foreign keys."""
     content_object = models.ForeignKey(OrganizationProfile)
+
+
+post_save.connect(
+    clear_obj_perms_cache, sender=OrgProfileUserObjectPermission,
+    dispatch_uid='org_profile_user_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=OrgProfileUserObjectPermission,
+    dispatch_uid='org_profile_user_obj_perms_post_delete')
+post_save.connect(
+    clear_obj_perms_cache, sender=OrgProfileGroupObjectPermission,
+    dispatch_uid='org_profile_group_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=OrgProfileGroupObjectPermission,
+    dispatch_uid='org_profile_group_obj_perms_post_delete')
@@ -90,6 +90,11 @@ class XFormPermissions(DjangoObjectPermissions):
 
             return user.has_perm(CAN_CHANGE_XFORM, obj)
 
+        if request.method in ['POST', 'DELETE'] and \
+                view.action == 'json_indexes':
+            # indexes slow down every submission, only staff add or drop them
+            return request.user.is_staff or request.user.is_superuser
+
         if request.method == 'DELETE' and view.action == 'destroy':
             return request.user.has_perm(CAN_DELETE_SUBMISSION, obj)
 
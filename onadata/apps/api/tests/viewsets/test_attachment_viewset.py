@@ -1,5 +1,6 @@
 from os import path
 from django.utils import timezone
+from mock import patch
 
 from onadata.apps.api.tests.viewsets.test_abstract_viewset import \
     TestAbstractViewSet
@@ -59,7 +60,7 @@ class TestAttachmentViewSet(TestAbstractViewSet):
         response = self.retrieve_view(request, pk=pk, format=ext)
         self.assertNotEqual(response.get('Cache-Control'), None)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content_type, 'image/jpeg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
 
         self.attachment.instance.xform.deleted_at = timezone.now()
         self.attachment.instance.xform.save()
@@ -67,6 +68,55 @@ class TestAttachmentViewSet(TestAbstractViewSet):
         response = self.retrieve_view(request, pk=pk)
         self.assertEqual(response.status_code, 404)
 
+    def test_retrieve_file_in_ranges(self):
+        self._submit_transport_instance_w_attachment()
+        pk = self.attachment.pk
+        content = self.attachment.media_file.read()
+
+        request = self.factory.get('/', **self.extra)
+        response = self.retrieve_view(request, pk=pk, format='jpg')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(''.join(response.streaming_content), content)
+        etag = response['ETag']
+
+        request = self.factory.get('/', HTTP_RANGE='bytes=10-19',
+                                   **self.extra)
+        response = self.retrieve_view(request, pk=pk, format='jpg')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'],
+                         'bytes 10-19/%d' % len(content))
+        self.assertEqual(''.join(response.streaming_content), content[10:20])
+
+        request = self.factory.get('/', HTTP_RANGE='bytes=-10',
+                                   **self.extra)
+        response = self.retrieve_view(request, pk=pk, format='jpg')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(''.join(response.streaming_content), content[-10:])
+
+        request = self.factory.get(
+            '/', HTTP_RANGE='bytes=%d-' % len(content), **self.extra)
+        response = self.retrieve_view(request, pk=pk, format='jpg')
+        self.assertEqual(response.status_code, 416)
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag,
+                                   **self.extra)
+        response = self.retrieve_view(request, pk=pk, format='jpg')
+        self.assertEqual(response.status_code, 304)
+
+    @patch('onadata.libs.utils.media_tools.MEDIA_DOWNLOAD_OFFLOAD',
+           'x-accel-redirect')
+    def test_retrieve_file_with_x_accel_redirect(self):
+        self._submit_transport_instance_w_attachment()
+
+        request = self.factory.get('/', **self.extra)
+        response = self.retrieve_view(request, pk=self.attachment.pk,
+                                      format='jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected/' + self.attachment.media_file.name)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
     def test_attachments_added_on_duplicate_submission_has_start_time(self):
         self.xform.has_start_time = True
         self.xform.save()
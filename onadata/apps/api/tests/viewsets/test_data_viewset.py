@@ -4,9 +4,12 @@ import os
 import requests
 import datetime
 from mock import patch
+from urlparse import parse_qs, urlparse
 from datetime import timedelta
 from django.utils import timezone
 from django.test import RequestFactory
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.test.utils import override_settings
 from django_digest.test import DigestAuth
 from django_digest.test import Client as DigestClient
@@ -464,6 +467,95 @@ class TestDataViewSet(TestBase):
             **self.extra)
         response = view(request, pk=formid)
 
+    def test_data_keyset_pagination(self):
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        formid = self.xform.pk
+        ids = list(self.xform.instances.order_by('pk')
+                   .values_list('pk', flat=True))
+
+        request = self.factory.get(
+            '/', data={"keyset": "id", "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], ids[:3])
+        self.assertTrue(response.has_header('Link'))
+        next_url = response['Link'][1:response['Link'].index('>')]
+        self.assertIn('cursor=', next_url)
+        self.assertNotIn('keyset=', next_url)
+
+        cursor = parse_qs(urlparse(next_url).query)['cursor'][0]
+        request = self.factory.get(
+            '/', data={"cursor": cursor, "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], ids[3:])
+        self.assertFalse(response.has_header('Link'))
+
+        # descending by date_modified with fields
+        request = self.factory.get(
+            '/', data={"keyset": "-date_modified", "page_size": 2,
+                       "fields": '["_id"]'}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'_id': i} for i in ids[::-1][:2]])
+        self.assertTrue(response.has_header('Link'))
+
+        # query filter
+        request = self.factory.get(
+            '/', data={"keyset": "id", "query": '{"_id": %s}' % ids[1]},
+            **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], [ids[1]])
+
+        # invalid cursor and keyset
+        request = self.factory.get('/', data={"cursor": "invalid"},
+                                   **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 400)
+
+        request = self.factory.get('/', data={"keyset": "name"},
+                                   **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 400)
+
+    def test_data_keyset_pagination_with_sort(self):
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        formid = self.xform.pk
+        ids = list(self.xform.instances.order_by('-pk')
+                   .values_list('pk', flat=True))
+
+        request = self.factory.get(
+            '/', data={"keyset": "id", "sort": '{"_id": -1}',
+                       "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 400)
+
+        request = self.factory.get(
+            '/', data={"keyset": "-id", "sort": '{"_id": -1}',
+                       "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], ids[:3])
+
+        next_url = response['Link'][1:response['Link'].index('>')]
+        self.assertIn('sort=', next_url)
+        cursor = parse_qs(urlparse(next_url).query)['cursor'][0]
+        request = self.factory.get(
+            '/', data={"cursor": cursor, "sort": '{"_id": -1}',
+                       "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], ids[3:])
+
+        # sorting on other fields is not supported
+        request = self.factory.get(
+            '/', data={"keyset": "id", "sort": '{"name": 1}'}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 400)
+
     def test_sort_query_param_with_invalid_values(self):
         self._make_submissions()
         view = DataViewSet.as_view({'get': 'list'})
@@ -1863,6 +1955,75 @@ class TestDataViewSet(TestBase):
         response = _data_response()
         self.assertEqual(etag_data, response['Etag'])
 
+    def test_data_endpoint_if_none_match(self):
+        """Test conditional GETs are answered from the form's data version"""
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        request = self.factory.get('/', **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 200)
+        etag_data = response['Etag']
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag_data,
+                                   **self.extra)
+        with CaptureQueriesContext(connection) as context:
+            response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual([q for q in context.captured_queries
+                          if 'logger_instance' in q['sql']], [])
+        self.assertEqual(response['Etag'], etag_data)
+
+        # quoted etags match too
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='"%s"' % etag_data,
+                                   **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 304)
+
+        # a different query is a different etag
+        request = self.factory.get('/', data={"limit": 1},
+                                   HTTP_IF_NONE_MATCH=etag_data, **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 200)
+
+        # deleting a submission changes the etag
+        self.xform.instances.all()[0].delete()
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag_data,
+                                   **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Etag'], etag_data)
+
+    def test_data_endpoint_total_count_is_cached(self):
+        """Test X-total is counted once per form data version"""
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        data = {"start": 1, "limit": 2}
+        request = self.factory.get('/', data=data, **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response.get('X-total')), 2)
+
+        request = self.factory.get('/', data=data, **self.extra)
+        with CaptureQueriesContext(connection) as context:
+            response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response.get('X-total')), 2)
+        self.assertEqual([q for q in context.captured_queries
+                          if 'COUNT' in q['sql'].upper()], [])
+
+        # deleting a submission invalidates the cached count
+        self.xform.instances.all()[0].delete()
+        request = self.factory.get('/', **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(int(response.get('X-total')), 3)
+
+        # the count can be skipped
+        request = self.factory.get('/', data={"count": "false"}, **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-total'))
+        self.assertEqual(len(response.data), 3)
+
     def test_submission_edit_w_blank_field(self):
         """Test submission json includes has_history key"""
         # create form
@@ -10,6 +10,7 @@ from onadata.apps.api.viewsets.stats_viewset import StatsViewSet
 from onadata.apps.api.viewsets.submissionstats_viewset import\
     SubmissionStatsViewSet
 from onadata.apps.logger.models import XForm
+from onadata.libs.data import statistics
 from onadata.libs.utils.logger_tools import publish_xml_form, create_instance
 from onadata.libs.utils.user_auth import get_user_default_project
 
@@ -241,6 +242,27 @@ class TestStatsViewSet(TestBase):
         }
         self.assertDictContainsSubset(data, response.data)
 
+    def test_stats_are_computed_once_per_data_version(self):
+        self._contributions_form_submissions()
+        view = StatsViewSet.as_view({'get': 'retrieve'})
+        formid = self.xform.pk
+
+        with patch('onadata.libs.data.statistics._get_sql_stats',
+                   wraps=statistics._get_sql_stats) as mock_sql_stats:
+            for method in ['median', 'mean', 'mode', 'range']:
+                request = self.factory.get('/?method=%s' % method,
+                                           **self.extra)
+                response = view(request, pk=formid)
+                self.assertEqual(response.status_code, 200)
+            request = self.factory.get('/', **self.extra)
+            response = view(request, pk=formid)
+            self.assertEqual(response.data['age']['median'], 28.5)
+            self.assertEqual(mock_sql_stats.call_count, 1)
+
+            self.xform.instances.last().set_deleted()
+            response = view(request, pk=formid)
+            self.assertEqual(mock_sql_stats.call_count, 2)
+
     def test_wrong_stat_function_api(self):
         self._contributions_form_submissions()
         view = StatsViewSet.as_view({'get': 'retrieve'})
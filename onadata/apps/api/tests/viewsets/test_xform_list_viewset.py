@@ -1,15 +1,19 @@
 import os
+from datetime import timedelta
+from hashlib import md5
 from mock import patch
 
 from django.conf import settings
 from django.test import TransactionTestCase
 from django_digest.test import DigestAuth
 from django.core.urlresolvers import reverse
+from django.utils import timezone
 
 from onadata.apps.api.tests.viewsets.test_abstract_viewset import\
     TestAbstractViewSet
 from onadata.apps.api.viewsets.xform_list_viewset import XFormListViewSet
 from onadata.apps.api.viewsets.project_viewset import ProjectViewSet
+from onadata.apps.logger.models import XForm
 from onadata.libs.permissions import DataEntryRole
 from onadata.libs.permissions import ReadOnlyRole
 from onadata.libs.utils.export_tools import ExportBuilder
@@ -49,6 +53,62 @@ class TestXFormListViewSet(TestAbstractViewSet, TransactionTestCase):
             self.assertEqual(response['Content-Type'],
                              'text/xml; charset=utf-8')
 
+    def test_get_xform_list_not_modified(self):
+        auth = DigestAuth('bob', 'bobbob')
+        request = self.factory.get('/')
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        etag = response['ETag']
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        # the forms are not queried for a list the client has
+        with patch.object(XFormListViewSet, 'filter_queryset') as mock_filter:
+            response = self.view(request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(mock_filter.called)
+
+        # the cached list changes with the forms
+        self.xform.downloadable = False
+        self.xform.save()
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 0)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # a form that joins the list again is listed
+        self.xform.downloadable = True
+        self.xform.save()
+        request = self.factory.get('/')
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        etag = response['ETag']
+
+        # a change of a listed form only changes the version of the form,
+        # not the lists of every user of it
+        with patch('onadata.apps.logger.models.xform.'
+                   'bump_xform_list_versions') as mock_bump:
+            self.xform.description = u'changed'
+            self.xform.save()
+        self.assertFalse(mock_bump.called)
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_get_xform_list_of_logged_in_user_with_username_param(self):
         # publish 2 forms as bob
         xls_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
@@ -379,6 +439,34 @@ class TestXFormListViewSet(TestAbstractViewSet, TransactionTestCase):
         self.assertTrue(response.has_header('Date'))
         self.assertEqual(response['Content-Type'], 'text/xml; charset=utf-8')
 
+    def test_retrieve_xform_manifest_not_modified(self):
+        self.view = XFormListViewSet.as_view({
+            "get": "manifest"
+        })
+        auth = DigestAuth('bob', 'bobbob')
+
+        def _get_manifest(**extra):
+            request = self.factory.get('/', **extra)
+            response = self.view(request, pk=self.xform.pk)
+            request.META.update(auth(request.META, response))
+
+            return self.view(request, pk=self.xform.pk)
+
+        response = _get_manifest()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+        etag = response['ETag']
+
+        response = _get_manifest(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # the cached manifest changes with the media files
+        self._load_metadata(self.xform)
+        response = _get_manifest(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['filename'], 'screenshot.png')
+        self.assertEqual(response.data[0]['hash'], self.metadata.hash)
+
     def test_retrieve_xform_manifest_anonymous_user(self):
         self._load_metadata(self.xform)
         self.view = XFormListViewSet.as_view({
@@ -491,6 +579,67 @@ class TestXFormListViewSet(TestAbstractViewSet, TransactionTestCase):
         self.assertEqual(response['Content-Disposition'],
                          'attachment; filename=transportation.csv')
 
+    def test_linked_xform_media_hash_follows_data_version(self):
+        data_type = 'media'
+        data_value = 'xform {} transportation'.format(self.xform.pk)
+        self._add_form_metadata(self.xform, data_type, data_value)
+        auth = DigestAuth('bob', 'bobbob')
+
+        def _get(action, **kwargs):
+            view = XFormListViewSet.as_view({"get": action})
+            request = self.factory.head('/')
+            response = view(request, pk=self.xform.pk, **kwargs)
+            request = self.factory.get(
+                '/', {GROUP_DELIMETER_TAG: ExportBuilder.GROUP_DELIMITER_DOT})
+            request.META.update(auth(request.META, response))
+
+            return view(request, pk=self.xform.pk, **kwargs)
+
+        response = _get('media', metadata=self.metadata.pk, format='csv')
+        self.assertEqual(response.status_code, 200)
+        content = ''.join(response.streaming_content)
+        self.assertEqual(response['ETag'], md5(content).hexdigest())
+
+        response = _get('manifest')
+        self.assertEqual(response.data[0]['hash'],
+                         'md5:%s' % md5(content).hexdigest())
+
+        # the csv is created again once the data changes
+        self._make_submissions()
+        _get('manifest')
+        response = _get('manifest')
+        self.assertNotEqual(response.data[0]['hash'],
+                            'md5:%s' % md5(content).hexdigest())
+
+        manifest_hash = response.data[0]['hash']
+        response = _get('media', metadata=self.metadata.pk, format='csv')
+        content = ''.join(response.streaming_content)
+        self.assertEqual(manifest_hash, 'md5:%s' % md5(content).hexdigest())
+
+    def test_linked_xform_manifest_follows_source_form(self):
+        data_value = 'xform {} transportation'.format(self.xform.pk)
+        self._add_form_metadata(self.xform, 'media', data_value)
+        view = XFormListViewSet.as_view({"get": "manifest"})
+        auth = DigestAuth('bob', 'bobbob')
+
+        def _get_manifest(**extra):
+            request = self.factory.get('/', **extra)
+            response = view(request, pk=self.xform.pk)
+            request.META.update(auth(request.META, response))
+
+            return view(request, pk=self.xform.pk)
+
+        etag = _get_manifest()['ETag']
+        response = _get_manifest(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # a change to the source form changes the manifest, even one that
+        # sends no signal
+        XForm.objects.filter(pk=self.xform.pk).update(
+            date_modified=timezone.now() + timedelta(hours=1))
+        response = _get_manifest(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
     def test_retrieve_xform_manifest_linked_form(self):
         # for linked forms check if manifest media download url for csv
         # has a group_delimiter param
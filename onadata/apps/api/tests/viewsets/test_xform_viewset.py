@@ -49,6 +49,7 @@ from onadata.libs.utils.cache_tools import (
     ENKETO_URL_CACHE,
     PROJ_FORMS_CACHE, XFORM_DATA_VERSIONS)
 from onadata.libs.utils.cache_tools import XFORM_PERMISSIONS_CACHE
+from onadata.libs.utils.cache_tools import record_filter_fields
 from onadata.libs.utils.common_tags import MONGO_STRFTIME
 
 
@@ -1903,6 +1904,51 @@ class TestXFormViewSet(TestAbstractViewSet):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(count_before + 9, self.xform.instances.count())
 
+    def test_json_indexes(self):
+        with HTTMock(enketo_mock):
+            xls_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
+                                    "tests", "fixtures", "tutorial.xls")
+            self._publish_xls_form_to_project(xlsform_path=xls_path)
+            view = XFormViewSet.as_view({'get': 'json_indexes',
+                                         'post': 'json_indexes',
+                                         'delete': 'json_indexes'})
+
+            request = self.factory.get('/', **self.extra)
+            response = view(request, pk=self.xform.id)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, [])
+
+            record_filter_fields(self.xform.pk, ['gender', 'gender', 'name'])
+            post_data = {'fields': 'age', 'top': 1, 'gin': 'true'}
+            request = self.factory.post('/', data=post_data, **self.extra)
+            response = view(request, pk=self.xform.id)
+            # only staff users add indexes, the owner can not
+            self.assertEqual(response.status_code, 403)
+
+            self.user.is_staff = True
+            self.user.save()
+            with patch('onadata.apps.api.viewsets.xform_viewset.'
+                       'update_json_indexes_async') as mock_update:
+                request = self.factory.post('/', data=post_data,
+                                            **self.extra)
+                response = view(request, pk=self.xform.id)
+                # indexes are built in the background
+                self.assertEqual(response.status_code, 202)
+                self.assertEqual(response.data, [])
+                mock_update.delay.assert_called_once_with(
+                    self.xform.pk, ['age', 'gender'], True, [])
+
+                request = self.factory.post(
+                    '/', data={'fields': 'not_a_field'}, **self.extra)
+                response = view(request, pk=self.xform.id)
+                self.assertEqual(response.status_code, 400)
+
+                request = self.factory.delete('/?name=not_an_index',
+                                              **self.extra)
+                response = view(request, pk=self.xform.id)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(mock_update.delay.call_count, 1)
+
     def test_csv_import_diff_column(self):
         with HTTMock(enketo_mock):
             xls_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
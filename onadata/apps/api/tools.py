@@ -40,6 +40,11 @@ from onadata.apps.viewer.models.parsed_instance import datetime_from_str
 from onadata.libs.utils.api_export_tools import custom_response_handler
 from onadata.libs.utils.logger_tools import publish_form
 from onadata.libs.utils.logger_tools import response_with_mimetype_and_name
+from onadata.libs.utils.logger_tools import \
+    generate_content_disposition_header
+from onadata.libs.utils.linked_dataset_tools import \
+    get_linked_dataset_response
+from onadata.libs.utils.media_tools import get_file_response
 from onadata.libs.utils.project_utils import set_project_perms_to_xform
 from onadata.libs.utils.user_auth import check_and_set_form_by_id
 from onadata.libs.utils.user_auth import check_and_set_form_by_id_string
@@ -429,12 +434,21 @@ def get_media_file_response(metadata, request=None):
         dfs = get_storage_class()()
 
         if dfs.exists(file_path):
-            response = response_with_mimetype_and_name(
-                metadata.data_file_type,
-                filename, extension=extension, show_date=False,
-                file_path=file_path, full_mime=True)
-
-            return response
+            if request is None:
+                return response_with_mimetype_and_name(
+                    metadata.data_file_type,
+                    filename, extension=extension, show_date=False,
+                    file_path=file_path, full_mime=True)
+
+            # the md5 of the file is stored as md5:<hash>
+            etag_hash = metadata.file_hash.split(':')[-1] \
+                if metadata.file_hash else None
+
+            return get_file_response(
+                request, file_path, metadata.data_file_type, etag_hash,
+                generate_content_disposition_header(filename, extension,
+                                                    show_date=False),
+                storage=dfs)
         else:
             return HttpResponseNotFound()
     else:
@@ -446,6 +460,12 @@ def get_media_file_response(metadata, request=None):
                 dataview = obj if isinstance(obj, DataView) else False
                 xform = obj.xform if isinstance(obj, DataView) else obj
 
+                # the csv is shared by the users that see all the data
+                response = request and get_linked_dataset_response(
+                    request, metadata, xform, dataview, filename)
+                if response:
+                    return response
+
                 return custom_response_handler(
                     request, xform, {}, Export.CSV_EXPORT, filename=filename,
                     dataview=dataview
@@ -1,3 +1,5 @@
+from hashlib import md5
+
 from django.http import Http404
 from django.utils.translation import ugettext as _
 from django.core.files.storage import default_storage
@@ -19,21 +21,22 @@ from onadata.libs.pagination import StandardPageNumberPagination
 from onadata.libs.serializers.attachment_serializer import AttachmentSerializer
 from onadata.libs.renderers.renderers import MediaFileContentNegotiation, \
     MediaFileRenderer
-from onadata.libs.utils.image_tools import image_url
-from onadata.libs.utils.viewer_tools import get_path
+from onadata.libs.utils.image_tools import get_thumbnail_path
+from onadata.libs.utils.media_tools import get_file_response
 
 
-def get_attachment_data(attachment, suffix):
+def get_attachment_path(attachment, suffix):
+    path = None
     if suffix in settings.THUMB_CONF.keys():
-        image_url(attachment, suffix)
-        suffix = settings.THUMB_CONF.get(suffix).get('suffix')
-        f = default_storage.open(
-            get_path(attachment.media_file.name, suffix))
-        data = f.read()
-    else:
-        data = attachment.media_file.read()
+        path = get_thumbnail_path(attachment, suffix)
+
+    return path or attachment.media_file.name
 
-    return data
+
+def get_attachment_etag(attachment, path):
+    return md5(u'{}-{}-{}'.format(
+        path, attachment.file_size, attachment.date_modified
+    ).encode('utf-8')).hexdigest()
 
 
 class AttachmentViewSet(AuthenticateHeaderMixin, CacheControlMixin, ETagsMixin,
@@ -52,22 +55,24 @@ class AttachmentViewSet(AuthenticateHeaderMixin, CacheControlMixin, ETagsMixin,
         renderers.JSONRenderer,
         renderers.BrowsableAPIRenderer,
         MediaFileRenderer)
+    cache_streaming_responses = True
 
     def retrieve(self, request, *args, **kwargs):
         self.object = self.get_object()
 
         if isinstance(request.accepted_renderer, MediaFileRenderer) \
                 and self.object.media_file is not None:
-            suffix = request.query_params.get('suffix')
+            path = get_attachment_path(
+                self.object, request.query_params.get('suffix'))
+            self.etag_hash = get_attachment_etag(self.object, path)
             try:
-                data = get_attachment_data(self.object, suffix)
-            except IOError as e:
-                if unicode(e).startswith('File does not exist'):
+                return get_file_response(request, path, self.object.mimetype,
+                                         self.etag_hash)
+            except (IOError, OSError) as e:
+                if not default_storage.exists(path):
                     raise Http404()
 
                 raise ParseError(e)
-            else:
-                return Response(data, content_type=self.object.mimetype)
 
         filename = request.query_params.get('filename')
         serializer = self.get_serializer(self.object)
@@ -3,6 +3,7 @@ import types
 
 from django.db.models import Q
 from django.db.models.query import QuerySet
+from django.db.models.sql.datastructures import EmptyResultSet
 from django.db.utils import DataError
 from django.conf import settings
 from django.http import Http404
@@ -28,9 +29,9 @@ from onadata.apps.logger.models import OsmData
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.viewer.models.parsed_instance import get_etag_hash_from_query
-from onadata.apps.viewer.models.parsed_instance import get_sql_with_params
 from onadata.apps.viewer.models.parsed_instance import get_where_clause
 from onadata.apps.viewer.models.parsed_instance import query_data
+from onadata.apps.viewer.models.parsed_instance import queryset_json_iterator
 from onadata.libs.renderers import renderers
 from onadata.libs.mixins.anonymous_user_public_forms_mixin import (
     AnonymousUserPublicFormsMixin)
@@ -39,6 +40,7 @@ from onadata.libs.mixins.authenticate_header_mixin import \
 from onadata.libs.mixins.cache_control_mixin import CacheControlMixin
 from onadata.libs.mixins.etags_mixin import ETagsMixin
 from onadata.libs.mixins.total_header_mixin import TotalHeaderMixin
+from onadata.libs.pagination import KeysetPagination
 from onadata.libs.pagination import StandardPageNumberPagination
 from onadata.libs.serializers.data_serializer import DataSerializer
 from onadata.libs.serializers.data_serializer import (
@@ -53,6 +55,9 @@ from onadata.libs.permissions import CAN_DELETE_SUBMISSION,\
 from onadata.libs.utils.viewer_tools import EnketoError
 from onadata.libs.utils.viewer_tools import get_enketo_edit_url
 from onadata.libs.utils.api_export_tools import custom_response_handler
+from onadata.libs.utils.cache_tools import bump_xform_data_version
+from onadata.libs.utils.cache_tools import get_cached_query_count
+from onadata.libs.utils.common_tools import str_to_bool
 from onadata.libs.data import parse_int
 from onadata.apps.api.permissions import ConnectViewsetPermissions
 from onadata.apps.api.tools import get_baseviewset_class
@@ -115,6 +120,7 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
     extra_lookup_fields = None
     public_data_endpoint = 'public'
     pagination_class = StandardPageNumberPagination
+    keyset_pagination_class = KeysetPagination
 
     queryset = XForm.objects.filter()
 
@@ -232,6 +238,9 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
 
         if request.method == 'GET':
             http_status = status.HTTP_200_OK
+        else:
+            # tags filter the data, counts cached for the form are stale
+            bump_xform_data_version(instance.xform_id)
 
         self.etag_data = data
 
@@ -383,8 +392,26 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
 
         return custom_response_handler(request, xform, query, export_type)
 
+    def _get_total_count(self, xform, queryset):
+        """
+        Returns the count of `queryset`, cached until the form's submissions
+        change.
+        """
+        try:
+            key_data = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+
+        return get_cached_query_count(xform.pk, key_data, queryset.count)
+
     def set_object_list_and_total_count(
-            self, query, fields, sort, start, limit, is_public_request):
+            self, query, fields, sort, start, limit, is_public_request,
+            stream=False, count=True):
+        """
+        Sets the object_list and, when `count` is True, the total_count which
+        is cached per form data version so that repeated requests do not
+        count the submissions again.
+        """
         try:
             if not is_public_request:
                 xform = self.get_object()
@@ -401,7 +428,9 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
                     self.get_object(), self.request.user, self.object_list)
                 self.object_list = \
                     self.object_list.order_by('pk')[start: limit]
-                self.total_count = self.object_list.count()
+                if count:
+                    self.total_count = self._get_total_count(
+                        xform, self.object_list)
             elif (sort or limit or start or fields) and not is_public_request:
                 try:
                     query = \
@@ -410,74 +439,122 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
                                                              query)
                     self.object_list = query_data(xform, query=query,
                                                   sort=sort, start_index=start,
-                                                  limit=limit, fields=fields)
-                    self.total_count = query_data(
-                        xform, query=query, sort=sort, start_index=start,
-                        limit=limit, fields=fields, count=True
-                    )[0].get('count')
+                                                  limit=limit, fields=fields,
+                                                  stream=stream)
+                    if count:
+                        self.total_count = get_cached_query_count(
+                            xform.pk, [query, start, limit, fields],
+                            lambda: query_data(
+                                xform, query=query, sort=sort,
+                                start_index=start, limit=limit,
+                                fields=fields, count=True)[0].get('count'))
 
                 except NoRecordsPermission:
                     self.object_list = []
                     self.total_count = 0
 
-            else:
+            elif count and not is_public_request:
+                self.total_count = self._get_total_count(
+                    xform, self.object_list)
+            elif count:
                 self.total_count = self.object_list.count()
 
-            if isinstance(self.object_list, QuerySet):
+            if is_public_request:
                 self.etag_hash = get_etag_hash_from_query(self.object_list)
             else:
-                sql, params, records = get_sql_with_params(
-                    xform, query=query, sort=sort, start_index=start,
-                    limit=limit, fields=fields
-                )
-                self.etag_hash = get_etag_hash_from_query(records, sql, params)
+                self.etag_hash = self.get_data_etag_hash(xform)
         except ValueError, e:
             raise ParseError(unicode(e))
         except DataError, e:
             raise ParseError(unicode(e))
 
+    def _get_keyset_data(self, query, fields, sort, paginator):
+        xform = self.get_object()
+        # sort orders the pages when it is on the keyed columns
+        keyset, after = paginator.get_keyset(self.request, sort)
+        page_size = paginator.get_page_size(self.request)
+
+        try:
+            query = filter_queryset_xform_meta_perms_sql(
+                xform, self.request.user, query)
+            # fetch one more record to know whether there is a next page
+            records = query_data(xform, query=query, fields=fields,
+                                 limit=page_size + 1, keyset=keyset,
+                                 after=after)
+            records = list(records)
+        except NoRecordsPermission:
+            records = []
+        except (ValueError, DataError) as e:
+            raise ParseError(unicode(e))
+
+        self.object_list, next_link = paginator.paginate_records(
+            self.request, records, keyset, page_size)
+
+        if next_link:
+            self.headers.update({'Link': '<%s>; rel="next"' % next_link})
+
+        return Response(self.object_list)
+
     def _get_data(self, query, fields, sort, start, limit, is_public_request):
-        self.set_object_list_and_total_count(
-            query, fields, sort, start, limit, is_public_request)
+        if not is_public_request:
+            # answer conditional requests without querying the submissions
+            self.etag_hash = self.get_data_etag_hash(self.get_object())
+            if self.is_not_modified(self.request, self.etag_hash):
+                return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        keyset_paginator = self.keyset_pagination_class()
+        if not is_public_request and \
+                keyset_paginator.is_requested(self.request):
+            return self._get_keyset_data(query, fields, sort,
+                                         keyset_paginator)
 
         pagination_keys = [self.paginator.page_query_param,
                            self.paginator.page_size_query_param]
         query_param_keys = self.request.query_params
         should_paginate = any([k in query_param_keys for k in pagination_keys])
+        STREAM_DATA = getattr(settings, 'STREAM_DATA', False)
+
+        # the X-total header can be skipped with count=false
+        count = str_to_bool(self.request.query_params.get('count', True))
+
+        self.set_object_list_and_total_count(
+            query, fields, sort, start, limit, is_public_request,
+            stream=STREAM_DATA and not should_paginate, count=count)
+
         if not isinstance(self.object_list, types.GeneratorType) and \
                 should_paginate:
             self.object_list = self.paginate_queryset(self.object_list)
 
-        STREAM_DATA = getattr(settings, 'STREAM_DATA', False)
         if STREAM_DATA:
-            length = self.total_count
-            if should_paginate and \
-                    not isinstance(self.object_list, types.GeneratorType):
-                length = len(self.object_list)
-            response = self._get_streaming_response(length)
+            response = self._get_streaming_response()
         else:
             serializer = self.get_serializer(self.object_list, many=True)
             response = Response(serializer.data)
 
         return response
 
-    def _get_streaming_response(self, length):
-        """Get a StreamingHttpResponse response object
-
-        @param length ensures a valid JSON is generated, avoid a trailing comma
-        """
-        def stream_json(data, length):
+    def _get_streaming_response(self):
+        """Get a StreamingHttpResponse response object"""
+        def stream_json(data):
             """Generator function to stream JSON data"""
             yield u"["
 
-            for i, d in enumerate(data, start=1):
+            for i, d in enumerate(data):
+                # separate records with a comma, avoid a trailing comma
+                if i:
+                    yield u","
                 yield json.dumps(d.json if isinstance(d, Instance) else d)
-                yield "" if i == length else ","
 
             yield u"]"
 
+        data = self.object_list
+        if isinstance(data, QuerySet) and data.model is Instance:
+            # read submissions in batches through a server-side cursor
+            # instead of loading the whole queryset into memory
+            data = queryset_json_iterator(data)
+
         response = StreamingHttpResponse(
-            stream_json(self.object_list, length),
+            stream_json(data),
             content_type="application/json"
         )
 
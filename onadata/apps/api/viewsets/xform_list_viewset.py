@@ -1,17 +1,21 @@
 import pytz
 
 from datetime import datetime
+from hashlib import md5
 
 from django.conf import settings
+from django.core.cache import cache
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from rest_framework import viewsets
 from rest_framework import permissions
+from rest_framework import status
 from rest_framework.decorators import detail_route
 from rest_framework.response import Response
 
 from onadata.apps.api.tools import get_media_file_response
+from onadata.apps.logger.models.data_view import DataView
 from onadata.apps.logger.models.xform import XForm, get_forms_shared_with_user
 from onadata.apps.main.models.meta_data import MetaData
 from onadata.apps.main.models.user_profile import UserProfile
@@ -26,8 +30,18 @@ from onadata.libs.renderers.renderers import XFormManifestRenderer
 from onadata.libs.serializers.xform_serializer import XFormListSerializer
 from onadata.libs.serializers.xform_serializer import XFormManifestSerializer
 from onadata.apps.api.tools import get_baseviewset_class
+from onadata.libs.utils.cache_tools import (XFORM_LIST_CACHE,
+                                            XFORM_LIST_CACHE_TIMEOUT,
+                                            XFORM_LIST_FORMS,
+                                            XFORM_MANIFEST_CACHE,
+                                            get_xform_list_form_versions,
+                                            get_xform_list_version,
+                                            get_xform_manifest_version)
 from onadata.libs.utils.export_tools import ExportBuilder
 from onadata.libs.utils.common_tags import GROUP_DELIMETER_TAG
+from onadata.libs.utils.linked_dataset_tools import get_linked_dataset
+from onadata.libs.utils.linked_dataset_tools import get_source_version
+from onadata.libs.utils.linked_dataset_tools import is_shared_dataset
 
 
 BaseViewset = get_baseviewset_class()
@@ -73,7 +87,15 @@ class XFormListViewSet(CacheControlMixin, ETagsMixin, BaseViewset,
 
         return super(XFormListViewSet, self).get_renderers()
 
-    def filter_queryset(self, queryset):
+    def get_profile(self):
+        """
+        Returns the profile of the user whose forms are listed, None when
+        the forms of the request user are listed, and forces authentication
+        when it is required.
+        """
+        if hasattr(self, 'profile'):
+            return self.profile
+
         username = self.kwargs.get('username')
         if username is None and self.request.user.is_anonymous():
             # raises a permission denied exception, forces authentication
@@ -87,9 +109,15 @@ class XFormListViewSet(CacheControlMixin, ETagsMixin, BaseViewset,
             if profile.require_auth and self.request.user.is_anonymous():
                 # raises a permission denied exception, forces authentication
                 self.permission_denied(self.request)
-            else:
-                queryset = queryset.filter(
-                    user=profile.user, downloadable=True)
+
+        self.profile = profile
+
+        return profile
+
+    def filter_queryset(self, queryset):
+        profile = self.get_profile()
+        if profile is not None:
+            queryset = queryset.filter(user=profile.user, downloadable=True)
 
         if not self.request.user.is_anonymous():
             queryset = super(XFormListViewSet, self).filter_queryset(queryset)
@@ -105,29 +133,133 @@ class XFormListViewSet(CacheControlMixin, ETagsMixin, BaseViewset,
 
         return queryset
 
-    def list(self, request, *args, **kwargs):
-        self.object_list = self.filter_queryset(self.get_queryset())
+    def _get_cached_response(self, prefix, version, serialize):
+        """
+        Returns the response of the data cached for `version`, the data is
+        serialized by calling `serialize` when it is not cached and 304 is
+        returned when the client has it already.
+        """
+        self.etag_hash = md5(version.encode('utf-8')).hexdigest()
+        headers = self.get_openrosa_headers()
 
-        serializer = self.get_serializer(self.object_list, many=True)
+        if self.is_not_modified(self.request, self.etag_hash):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
 
-        return Response(serializer.data, headers=self.get_openrosa_headers())
+        key = '{}{}'.format(prefix, self.etag_hash)
+        data = cache.get(key)
+
+        if data is None:
+            data = serialize()
+            cache.set(key, data, XFORM_LIST_CACHE_TIMEOUT)
+
+        return Response(data, headers=headers)
+
+    def list(self, request, *args, **kwargs):
+        profile = self.get_profile()
+
+        # which forms are listed changes with the forms and permissions of
+        # the user and of the user whose forms are listed, what is listed of
+        # them with the versions of the forms
+        list_version = u'{}-{}-{}-{}-{}'.format(
+            request.user.pk, get_xform_list_version(request.user.pk),
+            profile and profile.user.pk,
+            profile and get_xform_list_version(profile.user.pk),
+            request.build_absolute_uri('/'))
+        forms_key = '{}{}'.format(
+            XFORM_LIST_FORMS, md5(list_version.encode('utf-8')).hexdigest())
+        xform_ids = cache.get(forms_key)
+
+        if xform_ids is None:
+            self.object_list = self.filter_queryset(self.get_queryset())
+            xform_ids = sorted(self.object_list.values_list('pk', flat=True))
+            cache.set(forms_key, xform_ids, XFORM_LIST_CACHE_TIMEOUT)
+        else:
+            self.object_list = None
+
+        version = u'{}-{}'.format(list_version, u'-'.join(
+            [u'{}:{}'.format(xform_id, form_version) for xform_id,
+             form_version in zip(xform_ids,
+                                 get_xform_list_form_versions(xform_ids))]))
+
+        def serialize():
+            if self.object_list is None:
+                self.object_list = self.filter_queryset(self.get_queryset())
+            serializer = self.get_serializer(self.object_list, many=True)
+            data = list(serializer.data)
+            # forms that left or joined the list since it was cached
+            cache.set(forms_key, sorted([x.pk for x in self.object_list]),
+                      XFORM_LIST_CACHE_TIMEOUT)
+
+            return data
+
+        return self._get_cached_response(XFORM_LIST_CACHE, version,
+                                         serialize)
 
     def retrieve(self, request, *args, **kwargs):
         self.object = self.get_object()
 
         return Response(self.object.xml, headers=self.get_openrosa_headers())
 
+    def _get_linked_sources(self, xform):
+        """
+        Returns the (form pk, dataview pk) pairs the linked datasets of the
+        manifest of `xform` are exported from, the dataview pk is None for a
+        whole form.
+        """
+        sources = set()
+
+        for metadata in MetaData.objects.filter(data_type='media',
+                                                object_id=xform.pk):
+            source, dataview, name = get_linked_dataset(metadata.data_value)
+            if source is not None:
+                sources.add((source.pk, dataview and dataview.pk))
+
+        return sorted(sources)
+
     @detail_route(methods=['GET'])
     def manifest(self, request, *args, **kwargs):
         self.object = self.get_object()
-        object_list = MetaData.objects.filter(data_type='media',
-                                              object_id=self.object.pk)
-        context = self.get_serializer_context()
-        context[GROUP_DELIMETER_TAG] = ExportBuilder.GROUP_DELIMITER_DOT
-        serializer = XFormManifestSerializer(object_list, many=True,
-                                             context=context)
-
-        return Response(serializer.data, headers=self.get_openrosa_headers())
+        version = u'{}-{}-{}'.format(
+            self.object.pk, get_xform_manifest_version(self.object.pk),
+            request.build_absolute_uri('/'))
+        sources_key = '{}{}-linked_sources'.format(
+            XFORM_MANIFEST_CACHE, md5(version.encode('utf-8')).hexdigest())
+        sources = cache.get(sources_key)
+
+        if sources is None:
+            sources = self._get_linked_sources(self.object)
+            cache.set(sources_key, sources, XFORM_LIST_CACHE_TIMEOUT)
+
+        # the hashes of linked datasets change with the data, the form and
+        # dataview they are exported from and with whether the user sees all
+        # of the data
+        xforms = XForm.objects.in_bulk(set(s[0] for s in sources))
+        dataviews = DataView.objects.in_bulk(
+            set(s[1] for s in sources if s[1] is not None))
+        for xform_pk, dataview_pk in sources:
+            xform = xforms.get(xform_pk)
+            dataview = dataviews.get(dataview_pk)
+            if xform is None or (dataview_pk is not None and
+                                 dataview is None):
+                continue
+
+            version += u'-{}:{}:{}'.format(
+                xform.pk, get_source_version(xform, dataview),
+                is_shared_dataset(xform, request.user))
+
+        def serialize():
+            object_list = MetaData.objects.filter(data_type='media',
+                                                  object_id=self.object.pk)
+            context = self.get_serializer_context()
+            context[GROUP_DELIMETER_TAG] = ExportBuilder.GROUP_DELIMITER_DOT
+            serializer = XFormManifestSerializer(object_list, many=True,
+                                                 context=context)
+
+            return list(serializer.data)
+
+        return self._get_cached_response(XFORM_MANIFEST_CACHE, version,
+                                         serialize)
 
     @detail_route(methods=['GET'])
     def media(self, request, *args, **kwargs):
@@ -52,6 +52,7 @@ from onadata.apps.api import tools as utils
 from onadata.apps.api.permissions import XFormPermissions
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.models.xform import XFormUserObjectPermission
+from onadata.apps.logger.tasks import update_json_indexes_async
 from onadata.libs.utils.viewer_tools import (
     enketo_url,
     EnketoError,
@@ -62,12 +63,17 @@ from onadata.libs.utils.string import str2bool
 from onadata.libs.utils.csv_import import get_async_csv_submission_status
 from onadata.libs.utils.csv_import import submit_csv
 from onadata.libs.utils.csv_import import submit_csv_async
+from onadata.libs.utils.json_index_tools import check_json_field
+from onadata.libs.utils.json_index_tools import check_json_index
+from onadata.libs.utils.json_index_tools import get_json_indexes
+from onadata.libs.utils.json_index_tools import get_most_filtered_fields
 from onadata.libs.utils.viewer_tools import get_form_url
 from onadata.libs.utils.api_export_tools import custom_response_handler
 from onadata.libs.utils.api_export_tools import process_async_export
 from onadata.libs.utils.api_export_tools import get_async_response
 from onadata.libs.utils.api_export_tools import response_for_format
 from onadata.libs.utils.export_tools import parse_request_export_options
+from onadata.libs.utils.common_tools import str_to_bool
 from onadata.apps.api.tools import get_baseviewset_class
 
 
@@ -552,18 +558,19 @@ class XFormViewSet(AnonymousUserPublicFormsMixin,
                                   'be incorrect'))
         else:
             csv_file = request.FILES.get('csv_file', None)
+            bulk = str_to_bool(request.data.get('bulk'))
             if csv_file is None:
                 resp.update({u'error': u'csv_file field empty'})
             else:
                 num_rows = sum(1 for row in csv_file) - 1
                 if num_rows < settings.CSV_ROW_IMPORT_ASYNC_THRESHOLD:
                     resp.update(submit_csv(request.user.username,
-                                           self.object, csv_file))
+                                           self.object, csv_file, bulk))
                 else:
                     tmp_file_path = utils.generate_tmp_path(csv_file)
                     task = submit_csv_async.delay(request.user.username,
                                                   self.object,
-                                                  tmp_file_path)
+                                                  tmp_file_path, bulk)
                     if task is None:
                         raise ParseError('Task not found')
                     else:
@@ -574,6 +581,49 @@ class XFormViewSet(AnonymousUserPublicFormsMixin,
             status=status.HTTP_200_OK if resp.get('error') is None else
             status.HTTP_400_BAD_REQUEST)
 
+    @detail_route(methods=['GET', 'POST', 'DELETE'])
+    def json_indexes(self, request, *args, **kwargs):
+        """
+        Lists the indexes on the submission json of the form, POST `fields`
+        and/or `top`, the number of fields filtered or sorted on most, to
+        index and `gin` to add a GIN index for containment queries, DELETE
+        with the index `name` to drop it.
+
+        Indexes are built and dropped in the background, a 202 response
+        lists the indexes before the change.
+        """
+        xform = self.get_object()
+
+        if request.method == 'GET':
+            return Response(get_json_indexes(xform))
+
+        fields, gin, drop = [], False, []
+        try:
+            if request.method == 'POST':
+                fields = request.data.get('fields') or []
+                if isinstance(fields, six.string_types):
+                    fields = [f for f in fields.split(',') if f]
+                try:
+                    top = int(request.data.get('top') or 0)
+                except ValueError:
+                    raise ParseError(_(u"top should be a number"))
+                fields += [f for f in get_most_filtered_fields(xform, top)
+                           if f not in fields]
+
+                for field in fields:
+                    check_json_field(xform, field)
+                gin = str2bool(request.data.get('gin'))
+            elif request.method == 'DELETE':
+                drop = [request.query_params.get('name')]
+                check_json_index(xform, drop[0])
+        except ValueError as e:
+            raise ParseError(unicode(e))
+
+        update_json_indexes_async.delay(xform.pk, fields, gin, drop)
+
+        return Response(get_json_indexes(xform),
+                        status=status.HTTP_202_ACCEPTED)
+
     def partial_update(self, request, *args, **kwargs):
         self.object = self.get_object()
         owner = self.object.user
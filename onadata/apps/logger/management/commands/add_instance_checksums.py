@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4 fileencoding=utf-8
+from itertools import chain
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils.translation import ugettext_lazy
+
+from onadata.apps.logger.models import Instance
+from onadata.apps.logger.models.instance import get_xml_checksum
+
+DEFAULT_BATCH_SIZE = 1000
+# the index of the checksums the migration leaves to this command on large
+# tables
+CHECKSUM_INDEX = 'logger_instance_xform_id_checksum_idx'
+
+
+def create_checksum_index(cursor):
+    """
+    Builds the index of the checksums concurrently unless a valid one
+    exists, returns True when it was built.
+    """
+    cursor.execute(
+        "SELECT x.indisvalid FROM pg_index x "
+        "JOIN pg_class c ON c.oid = x.indexrelid WHERE c.relname = %s",
+        [CHECKSUM_INDEX])
+    row = cursor.fetchone()
+    if row and row[0]:
+        return False
+
+    # a build that failed leaves an invalid index behind
+    cursor.execute(
+        'DROP INDEX CONCURRENTLY IF EXISTS {}'.format(CHECKSUM_INDEX))
+    cursor.execute('CREATE INDEX CONCURRENTLY {} ON logger_instance '
+                   '(xform_id, checksum)'.format(CHECKSUM_INDEX))
+
+    return True
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy("Set the checksum of submissions that have none "
+                         "and index the checksums")
+    option_list = BaseCommand.option_list + (
+        make_option('-b', '--batch-size', type='int',
+                    default=DEFAULT_BATCH_SIZE,
+                    help=ugettext_lazy("Number of submissions updated in "
+                                       "one statement")),
+    )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size')
+        total = Instance.objects.filter(checksum=None).count()
+        done = last_pk = 0
+        cursor = connection.cursor()
+
+        while True:
+            # seek on the primary key so every batch costs the same
+            batch = list(Instance.objects.filter(
+                checksum=None, pk__gt=last_pk
+            ).order_by('pk').values_list('pk', 'xml')[:batch_size])
+            if not batch:
+                break
+
+            # one UPDATE per batch
+            cursor.execute(
+                'UPDATE logger_instance SET checksum = v.checksum '
+                'FROM (VALUES {}) AS v (id, checksum) '
+                'WHERE logger_instance.id = v.id'.format(
+                    ', '.join(['(%s, %s)'] * len(batch))),
+                list(chain.from_iterable(
+                    [(pk, get_xml_checksum(xml)) for pk, xml in batch])))
+
+            last_pk = batch[-1][0]
+            done += len(batch)
+            self.stdout.write('Processed {} of {}'.format(done, total))
+
+        if create_checksum_index(cursor):
+            self.stdout.write('Indexed the checksums')
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+import copy
+from optparse import make_option
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _, ugettext_lazy
+from lxml import etree
+
+from onadata.apps.logger.models.xform import XForm
+from onadata.apps.logger.xform_instance_parser import INSTANCE_PARSERS, \
+    clean_xml
+
+DEFAULT_REPEATS = '1,100,1000'
+DEFAULT_ITERATIONS = 10
+
+
+def inflate_repeats(xml, repeats, count):
+    """
+    Returns the submission `xml` with every repeat group repeated `count`
+    times.
+    """
+    root = etree.fromstring(clean_xml(xml))
+    found = {}
+
+    def _find_repeats(node, xpath):
+        for child in node:
+            if not isinstance(child.tag, basestring):
+                continue
+            name = child.tag.rsplit('}', 1)[-1]
+            child_xpath = u'/'.join([xpath, name]) if xpath else name
+            if child_xpath in repeats:
+                found.setdefault(child_xpath, child)
+            _find_repeats(child, child_xpath)
+
+    _find_repeats(root, u'')
+
+    for node in found.values():
+        for i in xrange(count - 1):
+            node.addnext(copy.deepcopy(node))
+
+    return etree.tostring(root, encoding='utf-8', xml_declaration=True)
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy("Time the submission parsers on a form's latest "
+                         "submission with its repeat groups inflated")
+    args = '<xform_id>'
+    option_list = BaseCommand.option_list + (
+        make_option('-r', '--repeats', default=DEFAULT_REPEATS,
+                    help=ugettext_lazy("Comma separated number of times "
+                                       "to repeat each repeat group")),
+        make_option('-i', '--iterations', type='int',
+                    default=DEFAULT_ITERATIONS,
+                    help=ugettext_lazy("Number of parses to time")),
+    )
+
+    def handle(self, *args, **kwargs):
+        if not args:
+            raise CommandError(_(u"Provide the form id"))
+        try:
+            xform = XForm.objects.get(pk=args[0])
+        except XForm.DoesNotExist:
+            raise CommandError(_(u"Form %s does not exist") % args[0])
+
+        instance = xform.instances.filter(deleted_at=None).last()
+        if instance is None:
+            raise CommandError(_(u"Form %s has no submissions") % args[0])
+
+        repeats = [e.get_abbreviated_xpath()
+                   for e in xform.get_survey_elements_of_type(u"repeat")]
+        iterations = kwargs.get('iterations')
+
+        for count in [int(c) for c in kwargs.get('repeats').split(',')]:
+            xml = inflate_repeats(instance.xml, repeats, count)
+
+            for name, parser_class in sorted(INSTANCE_PARSERS.items()):
+                start = default_timer()
+                for i in xrange(iterations):
+                    parser_class(xml, xform)
+                duration = (default_timer() - start) / iterations
+
+                self.stdout.write(
+                    u"%(count)d repeats, %(size).1f KB, %(name)s: "
+                    u"%(duration).2f ms per parse" % {
+                        'count': count,
+                        'size': len(xml) / 1024.0,
+                        'name': name,
+                        'duration': duration * 1000})
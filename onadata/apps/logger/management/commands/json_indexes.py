@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _, ugettext_lazy
+
+from onadata.apps.logger.models.xform import XForm
+from onadata.libs.utils.json_index_tools import create_json_gin_index, \
+    create_json_index, drop_json_index, get_json_indexes, \
+    get_most_filtered_fields
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy("Create, drop and list the indexes on the "
+                         "submission json of a form")
+    args = '<xform_id>'
+    option_list = BaseCommand.option_list + (
+        make_option('-f', '--fields', default='',
+                    help=ugettext_lazy("Comma separated fields to index")),
+        make_option('-t', '--top', type='int', default=0,
+                    help=ugettext_lazy("Index the given number of fields "
+                                       "the form is filtered or sorted on "
+                                       "most")),
+        make_option('-g', '--gin', action='store_true', default=False,
+                    help=ugettext_lazy("Create a GIN index of the json for "
+                                       "containment queries")),
+        make_option('-d', '--drop', default='',
+                    help=ugettext_lazy("Comma separated indexes to drop")),
+    )
+
+    def handle(self, *args, **kwargs):
+        if not args:
+            raise CommandError(_(u"Provide the form id"))
+        try:
+            xform = XForm.objects.get(pk=args[0])
+        except XForm.DoesNotExist:
+            raise CommandError(_(u"Form %s does not exist") % args[0])
+
+        fields = [f for f in kwargs.get('fields').split(',') if f]
+        fields += [f for f in get_most_filtered_fields(xform,
+                                                       kwargs.get('top'))
+                   if f not in fields]
+
+        try:
+            for name in [n for n in kwargs.get('drop').split(',') if n]:
+                drop_json_index(xform, name)
+            for field in fields:
+                create_json_index(xform, field)
+            if kwargs.get('gin'):
+                create_json_gin_index(xform)
+        except ValueError as e:
+            raise CommandError(e)
+
+        for index in get_json_indexes(xform):
+            self.stdout.write(u"%(name)s: %(definition)s" % index)
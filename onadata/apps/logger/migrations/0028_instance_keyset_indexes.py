@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0027_auto_20161201_0730'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='instance',
+            index_together=set([('xform', 'id'),
+                                ('xform', 'date_modified', 'id')]),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0028_instance_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataview',
+            name='materialized',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='DataViewInstance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name='ID')),
+                ('data_view', models.ForeignKey(to='logger.DataView')),
+                ('instance', models.ForeignKey(to='logger.Instance')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dataviewinstance',
+            unique_together=set([('data_view', 'instance')]),
+        ),
+    ]
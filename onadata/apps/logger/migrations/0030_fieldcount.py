@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0029_dataview_materialized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=255)),
+                ('value', models.TextField(null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('xform', models.ForeignKey(to='logger.XForm')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='fieldcount',
+            index_together=set([('xform', 'field')]),
+        ),
+    ]
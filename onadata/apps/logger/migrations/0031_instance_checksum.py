@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+CHECKSUM_INDEX = 'logger_instance_xform_id_checksum_idx'
+# a migration runs in a transaction where the index can only be built by
+# locking submissions out, larger tables are indexed concurrently by the
+# add_instance_checksums command instead
+MIGRATION_INDEX_MAX_ROWS = 100000
+
+
+def create_checksum_index(apps, schema_editor):
+    cursor = schema_editor.connection.cursor()
+    cursor.execute("SELECT reltuples FROM pg_class "
+                   "WHERE relname = 'logger_instance'")
+    row = cursor.fetchone()
+
+    if row is None or row[0] <= MIGRATION_INDEX_MAX_ROWS:
+        cursor.execute('CREATE INDEX {} ON logger_instance '
+                       '(xform_id, checksum)'.format(CHECKSUM_INDEX))
+
+
+def drop_checksum_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS {}'.format(CHECKSUM_INDEX))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0030_fieldcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='checksum',
+            field=models.CharField(max_length=64, null=True, blank=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_checksum_index,
+                                     drop_checksum_index),
+            ],
+            state_operations=[
+                migrations.AlterIndexTogether(
+                    name='instance',
+                    index_together=set([('xform', 'id'),
+                                        ('xform', 'date_modified', 'id'),
+                                        ('xform', 'checksum')]),
+                ),
+            ]),
+    ]
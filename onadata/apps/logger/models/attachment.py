@@ -3,8 +3,13 @@ import mimetypes
 
 from hashlib import md5
 from django.db import models
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 
 from instance import Instance
+from onadata.libs.utils.cache_tools import ATTACHMENT_THUMBNAILS
+from onadata.libs.utils.cache_tools import safe_delete
 
 
 def get_original_filename(filename):
@@ -82,3 +87,22 @@ class Attachment(models.Model):
     @property
     def name(self):
         return get_original_filename(self.filename)
+
+
+def queue_attachment_thumbnails(sender, instance=None, created=False,
+                                **kwargs):
+    if created and instance.mimetype.startswith('image'):
+        from onadata.libs.utils.image_tools import queue_thumbnails
+
+        transaction.on_commit(lambda: queue_thumbnails(instance))
+
+
+def clear_attachment_thumbnails(sender, instance=None, **kwargs):
+    safe_delete('{}{}'.format(ATTACHMENT_THUMBNAILS, instance.pk))
+
+
+post_save.connect(queue_attachment_thumbnails, sender=Attachment,
+                  dispatch_uid='queue_attachment_thumbnails')
+
+post_delete.connect(clear_attachment_thumbnails, sender=Attachment,
+                    dispatch_uid='clear_attachment_thumbnails')
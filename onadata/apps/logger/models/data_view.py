@@ -2,10 +2,12 @@ import datetime
 
 from django.utils.translation import ugettext as _
 from django.contrib.gis.db import models
+from django.core.cache import cache
 from django.contrib.postgres.fields import JSONField
-from django.db import connection
+from django.db import connection, transaction
 from django.db.models.signals import post_delete, post_save
 
+from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.models.project import Project
 from onadata.apps.viewer.parsed_instance_tools import get_where_clause
@@ -21,14 +23,18 @@ from onadata.libs.utils.common_tags import (
     GEOLOCATION,
     SUBMISSION_TIME)
 from onadata.libs.utils.cache_tools import (
+    record_filter_fields,
     safe_delete,
     DATAVIEW_COUNT,
     DATAVIEW_LAST_SUBMISSION_TIME,
-    XFORM_LINKED_DATAVIEWS)
+    XFORM_LINKED_DATAVIEWS,
+    XFORM_MATERIALIZED_DATAVIEWS)
 
 SUPPORTED_FILTERS = ['=', '>', '<', '>=', '<=', '<>', '!=']
 ATTACHMENT_TYPES = ['photo', 'audio', 'video']
 DEFAULT_COLUMNS = [ID, SUBMISSION_TIME, EDITED, LAST_EDITED, NOTES]
+MATERIALIZED_WHERE = u"id IN (SELECT instance_id FROM "\
+    u"logger_dataviewinstance WHERE data_view_id = %s)"
 
 
 def _json_sql_str(key, known_integers=[], known_dates=[]):
@@ -97,6 +103,8 @@ class DataView(models.Model):
     query = JSONField(default=dict, blank=True)
     instances_with_geopoints = models.BooleanField(default=False)
     matches_parent = models.BooleanField(default=False)
+    # keep the ids of the matching submissions in DataViewInstance
+    materialized = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
 
@@ -131,7 +139,54 @@ class DataView(models.Model):
     def save(self, *args, **kwargs):
 
         self.instances_with_geopoints = self.has_geo_columnn_n_data()
-        return super(DataView, self).save(*args, **kwargs)
+        with transaction.atomic():
+            super(DataView, self).save(*args, **kwargs)
+            self.refresh_materialized()
+
+    def _materialize(self, instance_ids=None):
+        """
+        Adds the matching submissions, only those of `instance_ids` if it is
+        set, to the materialized submissions of the dataview.
+        """
+        sql = u"INSERT INTO logger_dataviewinstance (data_view_id, "\
+            u"instance_id) SELECT %s, id FROM logger_instance"
+        where, where_params = self._get_where_clause(self,
+                                                     self.get_known_integers(),
+                                                     self.get_known_dates())
+        sql_where = u""
+        if where:
+            sql_where = u" AND " + u" AND ".join(where)
+
+        params = [self.pk, self.xform_id]
+        sql += u" WHERE xform_id = %s" + sql_where + u" AND deleted_at IS NULL"
+        ids_params = []
+        if instance_ids is not None:
+            sql += u" AND id = ANY(%s)"
+            ids_params = [list(instance_ids)]
+
+        cursor = connection.cursor()
+        cursor.execute(
+            sql, params + [unicode(i) for i in where_params] + ids_params)
+
+    def refresh_materialized(self):
+        """Rebuilds the materialized submissions of the dataview."""
+        DataViewInstance.objects.filter(data_view=self).delete()
+        if self.materialized:
+            self._materialize()
+
+    def refresh_materialized_instance(self, instance):
+        """Adds or removes `instance` from the materialized submissions."""
+        with transaction.atomic():
+            # concurrent refreshes of the same submission take turns,
+            # otherwise two saves of it could both delete and then both
+            # insert it, those of other submissions do not wait
+            cursor = connection.cursor()
+            cursor.execute(u"SELECT pg_advisory_xact_lock(%s, %s)",
+                           [self.pk, instance.pk])
+            DataViewInstance.objects.filter(
+                data_view=self, instance_id=instance.pk).delete()
+            if instance.deleted_at is None:
+                self._materialize([instance.pk])
 
     def _get_known_type(self, type_str):
         return [
@@ -148,6 +203,10 @@ class DataView(models.Model):
 
     def has_instance(self, instance):
         """Return True if instance in set of dataview data"""
+        if self.materialized:
+            return DataViewInstance.objects.filter(
+                data_view=self, instance_id=instance.id).exists()
+
         cursor = connection.cursor()
         sql = u"SELECT count(json) FROM logger_instance"
 
@@ -210,8 +269,8 @@ class DataView(models.Model):
         return where, where_params
 
     @classmethod
-    def query_iterator(cls, sql, fields=None, params=[], count=False):
-        cursor = connection.cursor()
+    def query_iterator(cls, sql, fields=None, params=[], count=False,
+                       stream=False):
         sql_params = fields + params if fields is not None else params
 
         if count:
@@ -225,14 +284,25 @@ class DataView(models.Model):
 
             sql_params = params
             fields = [u'count']
+            stream = False
+
+        sql_params = [unicode(i) for i in sql_params]
 
-        cursor.execute(sql, [unicode(i) for i in sql_params])
+        if stream:
+            # imported here, the parsed instance models import the logger
+            from onadata.apps.viewer.models.parsed_instance import \
+                _named_cursor_rows
+            rows = _named_cursor_rows(sql, sql_params)
+        else:
+            cursor = connection.cursor()
+            cursor.execute(sql, sql_params)
+            rows = cursor.fetchall()
 
         if fields is None:
-            for row in cursor.fetchall():
+            for row in rows:
                 yield row[0]
         else:
-            for row in cursor.fetchall():
+            for row in rows:
                 yield dict(zip(fields, row))
 
     @classmethod
@@ -259,10 +329,15 @@ class DataView(models.Model):
 
             sql = u"SELECT %s FROM logger_instance" % u",".join(field_list)
 
-        where, where_params = cls._get_where_clause(
-            data_view,
-            data_view.get_known_integers(),
-            data_view.get_known_dates())
+        if data_view.materialized:
+            where, where_params = [MATERIALIZED_WHERE], [data_view.pk]
+        else:
+            record_filter_fields(data_view.xform_id,
+                                 [q.get('column') for q in data_view.query])
+            where, where_params = cls._get_where_clause(
+                data_view,
+                data_view.get_known_integers(),
+                data_view.get_known_dates())
 
         if filter_query:
             add_where, add_where_params = \
@@ -305,12 +380,18 @@ class DataView(models.Model):
     @classmethod
     def query_data(cls, data_view, start_index=None, limit=None, count=None,
                    last_submission_time=False, all_data=False, sort=None,
-                   filter_query=None):
-
+                   filter_query=None, stream=False):
+        """
+        Returns the records of the dataview, when `stream` is set as a
+        generator that reads them through a server-side cursor in batches.
+        """
         (sql, columns, params) = cls.generate_query_string(
             data_view, start_index, limit, last_submission_time,
             all_data, sort, filter_query)
 
+        if stream and not count:
+            return DataView.query_iterator(sql, columns, params, stream=True)
+
         try:
             records = [record for record in DataView.query_iterator(sql,
                                                                     columns,
@@ -322,10 +403,37 @@ class DataView(models.Model):
         return records
 
 
+class DataViewInstance(models.Model):
+    """
+    A submission that matches the query of a materialized DataView
+    """
+
+    data_view = models.ForeignKey(DataView)
+    instance = models.ForeignKey(Instance)
+
+    class Meta:
+        app_label = 'logger'
+        unique_together = ('data_view', 'instance')
+
+
+def get_materialized_dataviews(xform_id):
+    """Returns the materialized dataviews of a form, cached."""
+    key = '{}{}'.format(XFORM_MATERIALIZED_DATAVIEWS, xform_id)
+    data_views = cache.get(key)
+
+    if data_views is None:
+        data_views = list(DataView.objects.filter(xform_id=xform_id,
+                                                  materialized=True))
+        cache.set(key, data_views)
+
+    return data_views
+
+
 # Post delete handler for clearing the dataview cache
 def clear_cache(sender, instance, **kwargs):
     # clear cache
     safe_delete('{}{}'.format(XFORM_LINKED_DATAVIEWS, instance.xform.pk))
+    safe_delete('{}{}'.format(XFORM_MATERIALIZED_DATAVIEWS, instance.xform_id))
 
 
 # Post Save handler for clearing dataview cache on serialized fields
@@ -333,10 +441,29 @@ def clear_dataview_cache(sender, instance, **kwargs):
     safe_delete('{}{}'.format(DATAVIEW_COUNT, instance.xform.pk))
     safe_delete(
         '{}{}'.format(DATAVIEW_LAST_SUBMISSION_TIME, instance.xform.pk))
+    safe_delete('{}{}'.format(XFORM_MATERIALIZED_DATAVIEWS, instance.xform_id))
+
+
+# Post save handler for keeping materialized dataviews up to date
+def refresh_materialized_dataviews(sender, instance, **kwargs):
+    for data_view in get_materialized_dataviews(instance.xform_id):
+        data_view.refresh_materialized_instance(instance)
+
+
+def materialize_new_instances(xform_id, instance_ids):
+    """
+    Adds new submissions that were saved without post_save e.g. in bulk to
+    the materialized dataviews of the form.
+    """
+    for data_view in get_materialized_dataviews(xform_id):
+        data_view._materialize(instance_ids)
 
 
 post_save.connect(clear_dataview_cache, sender=DataView,
                   dispatch_uid='clear_cache')
 
+post_save.connect(refresh_materialized_dataviews, sender=Instance,
+                  dispatch_uid='refresh_materialized_dataviews')
+
 post_delete.connect(clear_cache, sender=DataView,
                     dispatch_uid='clear_xform_cache')
@@ -0,0 +1,19 @@
+from django.db import models
+
+from onadata.apps.logger.models.xform import XForm
+
+
+class FieldCount(models.Model):
+    """
+    The number of submissions of a form with a value of a field, the count
+    of a value can be spread over several rows.
+    """
+
+    xform = models.ForeignKey(XForm)
+    field = models.CharField(max_length=255)
+    value = models.TextField(null=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'logger'
+        index_together = [('xform', 'field')]
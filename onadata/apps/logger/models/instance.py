@@ -2,6 +2,7 @@ import math
 
 from celery import task
 from datetime import datetime
+from hashlib import sha256
 
 from django.contrib.gis.db import models
 from django.db import connection
@@ -20,7 +21,7 @@ from taggit.managers import TaggableManager
 from onadata.apps.logger.models.survey_type import SurveyType
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.models.xform import XFORM_TITLE_LENGTH
-from onadata.apps.logger.xform_instance_parser import XFormInstanceParser,\
+from onadata.apps.logger.xform_instance_parser import get_instance_parser,\
     clean_and_parse_xml, get_uuid_from_xml
 from onadata.libs.utils.common_tags import ATTACHMENTS, BAMBOO_DATASET_ID,\
     DELETEDAT, EDITED, GEOLOCATION, ID, MONGO_STRFTIME, NOTES, \
@@ -29,6 +30,10 @@ from onadata.libs.utils.common_tags import ATTACHMENTS, BAMBOO_DATASET_ID,\
 from onadata.libs.utils.model_tools import set_uuid
 from onadata.libs.data.query import get_numeric_fields
 from onadata.libs.utils.cache_tools import safe_delete
+from onadata.libs.utils.cache_tools import add_to_submission_batch
+from onadata.libs.utils.cache_tools import bump_xform_data_version
+from onadata.libs.utils.cache_tools import get_submission_batch
+from onadata.libs.utils.cache_tools import release_submission_batch
 from onadata.libs.utils.cache_tools import IS_ORG
 from onadata.libs.utils.cache_tools import PROJ_SUB_DATE_CACHE
 from onadata.libs.utils.cache_tools import PROJ_NUM_DATASET_CACHE,\
@@ -38,6 +43,16 @@ from onadata.libs.utils.timing import calculate_duration
 
 ASYNC_POST_SUBMISSION_PROCESSING_ENABLED = \
     getattr(settings, 'ASYNC_POST_SUBMISSION_PROCESSING_ENABLED', False)
+# seconds to collect submissions of a form into one post submission batch,
+# batching is used with async post submission processing when set
+SUBMISSION_BATCH_WINDOW = getattr(settings, 'SUBMISSION_BATCH_WINDOW', 0)
+# batches that did not progress after this many runs skip missing values
+SUBMISSION_BATCH_MAX_RETRIES = 3
+
+
+def is_submission_batching_enabled():
+    return ASYNC_POST_SUBMISSION_PROCESSING_ENABLED and \
+        SUBMISSION_BATCH_WINDOW > 0
 
 
 def get_attachment_url(attachment, suffix=None):
@@ -127,6 +142,14 @@ def submission_time():
     return timezone.now()
 
 
+def get_xml_checksum(xml):
+    """Returns the SHA-256 hex digest of the submission `xml`."""
+    if isinstance(xml, unicode):
+        xml = xml.encode('utf-8')
+
+    return sha256(xml).hexdigest()
+
+
 @task
 @transaction.atomic()
 def update_xform_submission_count(instance_id, created):
@@ -160,8 +183,16 @@ def update_xform_submission_count(instance_id, created):
             safe_delete('{}{}'.format(XFORM_DATA_VERSIONS, instance.xform_id))
             safe_delete('{}{}'.format(DATAVIEW_COUNT, instance.xform_id))
 
+            from onadata.libs.data.query import increment_field_counts
+            increment_field_counts(instance.xform, [instance])
+
 
 def update_xform_submission_count_delete(sender, instance, **kwargs):
+    from onadata.libs.data.query import remove_field_counts
+
+    bump_xform_data_version(instance.xform_id)
+    remove_field_counts(instance)
+
     try:
         xform = XForm.objects.select_for_update().get(pk=instance.xform.pk)
     except XForm.DoesNotExist:
@@ -195,19 +226,6 @@ def update_xform_submission_count_delete(sender, instance, **kwargs):
             xform.save()
 
 
-@task
-def save_full_json(instance_id, created):
-    """set json data, ensure the primary key is part of the json data"""
-    if created:
-        try:
-            instance = Instance.objects.get(pk=instance_id)
-        except Instance.DoesNotExist:
-            pass
-        else:
-            instance.json = instance.get_full_dict()
-            instance.save(update_fields=['json'])
-
-
 @task
 def update_project_date_modified(instance_id, created):
     # update the date modified field of the project which will change
@@ -222,6 +240,74 @@ def update_project_date_modified(instance_id, created):
         instance.xform.project.save(update_fields=['date_modified'])
 
 
+def process_submissions(xform_id, submissions):
+    """
+    Runs the post submission processing of the (instance id, created) pairs
+    of a form in bulk: the submission counters are incremented once and the
+    project is touched once.
+    """
+    from onadata.apps.restservice.utils import call_services
+    from onadata.libs.data.query import increment_field_counts
+    from onadata.libs.utils.osm import save_osm_data
+
+    created_ids = set([pk for pk, created in submissions if created])
+    instances = list(Instance.objects.select_related(
+        'xform__project', 'user'
+    ).filter(pk__in=set([pk for pk, created in submissions])))
+
+    if not instances:
+        return
+
+    created = [i for i in instances if i.pk in created_ids]
+    xform = instances[0].xform
+
+    with transaction.atomic():
+        if created:
+            cursor = connection.cursor()
+            cursor.execute(
+                'UPDATE logger_xform SET '
+                'num_of_submissions = num_of_submissions + %s, '
+                'last_submission_time = GREATEST(last_submission_time, %s) '
+                'WHERE id = %s',
+                [len(created), max([i.date_created for i in created]),
+                 xform_id]
+            )
+            cursor.execute(
+                'UPDATE main_userprofile SET '
+                'num_of_submissions = num_of_submissions + %s '
+                'WHERE user_id = %s',
+                [len(created), xform.user_id]
+            )
+
+        xform.project.save(update_fields=['date_modified'])
+
+    safe_delete('{}{}'.format(XFORM_DATA_VERSIONS, xform_id))
+    safe_delete('{}{}'.format(DATAVIEW_COUNT, xform_id))
+    increment_field_counts(xform, created)
+
+    call_services(created)
+
+    for instance in created:
+        save_osm_data(instance.pk)
+
+
+@task
+def process_submission_batch(xform_id, retries=0):
+    """Processes the submissions queued for the form since the last batch"""
+    done, submissions = get_submission_batch(
+        xform_id, skip_missing=retries >= SUBMISSION_BATCH_MAX_RETRIES)
+
+    try:
+        process_submissions(xform_id, submissions)
+    finally:
+        pending = release_submission_batch(xform_id, done)
+
+    if pending:
+        process_submission_batch.apply_async(
+            args=[xform_id, 0 if submissions else retries + 1],
+            countdown=SUBMISSION_BATCH_WINDOW)
+
+
 def convert_to_serializable_date(date):
     if hasattr(date, 'isoformat'):
         return date.isoformat()
@@ -292,14 +378,17 @@ class InstanceBaseClass(object):
         doc = self.get_dict()
 
         if self.id:
+            # nothing relates to a submission that is being inserted
+            adding = self._state.adding
             doc.update({
                 UUID: self.uuid,
                 ID: self.id,
                 BAMBOO_DATASET_ID: self.xform.bamboo_dataset,
-                ATTACHMENTS: _get_attachments_from_instance(self),
+                ATTACHMENTS: [] if adding
+                else _get_attachments_from_instance(self),
                 STATUS: self.status,
-                TAGS: list(self.tags.names()),
-                NOTES: self.get_notes(),
+                TAGS: [] if adding else list(self.tags.names()),
+                NOTES: [] if adding else self.get_notes(),
                 VERSION: self.version,
                 DURATION: self.get_duration(),
                 XFORM_ID_STRING: self._parser.get_xform_id_string(),
@@ -308,7 +397,7 @@ class InstanceBaseClass(object):
                 SUBMITTED_BY: self.user.username if self.user else None
             })
 
-            for osm in self.osm_data.all():
+            for osm in [] if adding else self.osm_data.all():
                 doc.update(osm.get_tags_with_prefix())
 
             if isinstance(self.deleted_at, datetime):
@@ -332,7 +421,7 @@ class InstanceBaseClass(object):
 
     def _set_parser(self):
         if not hasattr(self, "_parser"):
-            self._parser = XFormInstanceParser(self.xml, self.xform)
+            self._parser = get_instance_parser(self.xml, self.xform)
 
     def _set_survey_type(self):
         self.survey_type, created = \
@@ -412,6 +501,8 @@ class Instance(models.Model, InstanceBaseClass):
                               default=u'submitted_via_web')
     uuid = models.CharField(max_length=249, default=u'')
     version = models.CharField(max_length=XFORM_TITLE_LENGTH, null=True)
+    # digest of the xml, duplicate submissions are found by it
+    checksum = models.CharField(max_length=64, null=True, blank=True)
 
     # store a geographic objects associated with this instance
     geom = models.GeometryCollectionField(null=True)
@@ -421,6 +512,9 @@ class Instance(models.Model, InstanceBaseClass):
     class Meta:
         app_label = 'logger'
         unique_together = ('xform', 'uuid')
+        # keyset pagination seeks on these within a form
+        index_together = [('xform', 'id'), ('xform', 'date_modified', 'id'),
+                          ('xform', 'checksum')]
 
     @classmethod
     def set_deleted_at(cls, instance_id, deleted_at=timezone.now()):
@@ -431,6 +525,27 @@ class Instance(models.Model, InstanceBaseClass):
         else:
             instance.set_deleted(deleted_at)
 
+    def _set_id(self):
+        """
+        Allocates the primary key of a new submission so that its full json
+        is written by the INSERT.
+        """
+        cursor = connection.cursor()
+        cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))",
+                       [self._meta.db_table])
+        self.id = cursor.fetchone()[0]
+
+    def _set_checksum(self):
+        self.checksum = get_xml_checksum(self.xml)
+
+    def _check_submission_time(self):
+        # date_created of a new submission is set when it is inserted
+        submission_date = self.date_created.strftime(MONGO_STRFTIME)
+
+        if self.json.get(SUBMISSION_TIME) != submission_date:
+            self.json[SUBMISSION_TIME] = submission_date
+            Instance.objects.filter(pk=self.pk).update(json=self.json)
+
     def _check_active(self, force):
         """Check that form is active and raise exception if not.
 
@@ -447,13 +562,24 @@ class Instance(models.Model, InstanceBaseClass):
 
         self._check_active(force)
 
+        adding = self.pk is None
+        if adding:
+            self._set_id()
+            kwargs['force_insert'] = True
+
         self._set_geom()
+        # the json as last saved, to tell which values an update changed
+        self._previous_json = self.json
         self._set_json()
         self._set_survey_type()
         self._set_uuid()
+        self._set_checksum()
         self.version = self.xform.version
         super(Instance, self).save(*args, **kwargs)
 
+        if adding:
+            self._check_submission_time()
+
     def set_deleted(self, deleted_at=timezone.now()):
         self.deleted_at = deleted_at
         self.save()
@@ -463,13 +589,21 @@ class Instance(models.Model, InstanceBaseClass):
 
 
 def post_save_submission(sender, instance=None, created=False, **kwargs):
-    if ASYNC_POST_SUBMISSION_PROCESSING_ENABLED:
+    bump_xform_data_version(instance.xform_id)
+
+    if not created:
+        from onadata.libs.data.query import update_field_counts
+        update_field_counts(instance, getattr(instance, '_previous_json', {}))
+
+    if is_submission_batching_enabled():
+        if add_to_submission_batch(instance.xform_id, (instance.pk, created)):
+            process_submission_batch.apply_async(
+                args=[instance.xform_id], countdown=SUBMISSION_BATCH_WINDOW)
+    elif ASYNC_POST_SUBMISSION_PROCESSING_ENABLED:
         update_xform_submission_count.apply_async(args=[instance.pk, created])
-        save_full_json.apply_async(args=[instance.pk, created])
         update_project_date_modified.apply_async(args=[instance.pk, created])
     else:
         update_xform_submission_count(instance.pk, created)
-        save_full_json(instance.pk, created)
         update_project_date_modified(instance.pk, created)
 
 
@@ -537,7 +671,7 @@ class InstanceHistory(models.Model, InstanceBaseClass):
 
     def _set_parser(self):
         if not hasattr(self, "_parser"):
-            self._parser = XFormInstanceParser(
+            self._parser = get_instance_parser(
                 self.xml, self.xform_instance.xform
             )
 
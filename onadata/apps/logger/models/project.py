@@ -1,6 +1,6 @@
 from django.db import models
 from django.db.models import Prefetch
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
@@ -9,6 +9,7 @@ from guardian.models import GroupObjectPermissionBase
 from guardian.shortcuts import assign_perm, get_perms_for_model
 from taggit.managers import TaggableManager
 
+from onadata.apps.main.signals import clear_obj_perms_cache
 from onadata.libs.models.base_model import BaseModel
 from onadata.libs.utils.common_tags import OWNER_TEAM_NAME
 
@@ -123,3 +124,17 @@ class ProjectGroupObjectPermission(GroupObjectPermissionBase):
     """Guardian model to create direct foreign keys."""
 
     content_object = models.ForeignKey(Project)
+
+
+post_save.connect(
+    clear_obj_perms_cache, sender=ProjectUserObjectPermission,
+    dispatch_uid='project_user_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=ProjectUserObjectPermission,
+    dispatch_uid='project_user_obj_perms_post_delete')
+post_save.connect(
+    clear_obj_perms_cache, sender=ProjectGroupObjectPermission,
+    dispatch_uid='project_group_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=ProjectGroupObjectPermission,
+    dispatch_uid='project_group_obj_perms_post_delete')
@@ -13,7 +13,9 @@ from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.urlresolvers import reverse
 from django.db.models.signals import post_save, post_delete, pre_save
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils.encoding import smart_str
 from django.utils.translation import ugettext_lazy, ugettext as _
 
 from guardian.models import UserObjectPermissionBase
@@ -31,12 +33,19 @@ from xml.dom import Node
 from onadata.apps.logger.xform_instance_parser import XLSFormError
 from onadata.apps.logger.xform_instance_parser import clean_and_parse_xml
 from onadata.apps.main.models import MetaData
+from onadata.apps.main.signals import clear_obj_perms_cache
 from onadata.libs.models.base_model import BaseModel
 from onadata.libs.utils.cache_tools import (
     IS_ORG,
     PROJ_FORMS_CACHE,
     PROJ_NUM_DATASET_CACHE,
     PROJ_SUB_DATE_CACHE,
+    XFORM_FIELD_COUNTS,
+    XFORM_SURVEY_CACHE,
+    XFORM_SURVEY_CACHE_TIMEOUT,
+    LRUCache,
+    bump_xform_list_form_version,
+    bump_xform_list_versions,
     safe_delete)
 from onadata.libs.utils.common_tags import UUID, SUBMISSION_TIME, TAGS, NOTES,\
     VERSION, DURATION, SUBMITTED_BY, KNOWN_MEDIA_TYPES
@@ -47,8 +56,18 @@ QUESTION_TYPES_TO_EXCLUDE = [
     u'note',
 ]
 XFORM_TITLE_LENGTH = 255
+# the fields shown in the OpenRosa form list
+XFORM_LIST_FIELDS = frozenset([
+    'deleted_at', 'description', 'downloadable', 'id_string', 'shared',
+    'title', 'user', 'xml'])
+# the fields that decide which form lists a form is in
+XFORM_LISTED_FIELDS = ('deleted_at', 'downloadable', 'shared', 'user_id')
 title_pattern = re.compile(r"<h:title>([^<]+)</h:title>")
 
+# compiled surveys of the most recently used forms of this process, keyed by
+# the form's pk and the hash of its json
+survey_cache = LRUCache(getattr(settings, 'XFORM_SURVEY_CACHE_SIZE', 100))
+
 
 def _encode_for_mongo(key):
     return reduce(lambda s, c: re.sub(c[0], base64.b64encode(c[1]), s),
@@ -59,6 +78,32 @@ def question_types_to_exclude(_type):
     return _type in QUESTION_TYPES_TO_EXCLUDE
 
 
+def _index_survey(survey):
+    """
+    Returns the survey with the indexes of its elements that forms look up
+    often.
+    """
+    elements = list(survey.iter_descendants())
+    elements_by_type = {}
+    elements_by_xpath = {}
+
+    for e in elements:
+        elements_by_type.setdefault(e.type, []).append(e)
+        elements_by_xpath[e.get_abbreviated_xpath()] = e
+
+    return {
+        'survey': survey,
+        'elements': elements,
+        'elements_by_type': elements_by_type,
+        'elements_by_xpath': elements_by_xpath,
+        'geopoint_xpaths': [e.get_abbreviated_xpath() for e in elements
+                            if e.bind.get(u'type') == u'geopoint'],
+        'media_xpaths': [e.get_abbreviated_xpath() for m in KNOWN_MEDIA_TYPES
+                         for e in elements_by_type.get(m, [])],
+        'xpaths': {},
+    }
+
+
 def upload_to(instance, filename):
     return os.path.join(
         instance.user.username,
@@ -265,21 +310,82 @@ class XFormMixin(object):
 
         return id_string
 
+    def _build_survey(self):
+        try:
+            builder = SurveyElementBuilder()
+            return builder.create_survey_element_from_json(self.json)
+        except ValueError:
+            xml = bytes(bytearray(self.xml, encoding='utf-8'))
+            return create_survey_element_from_xml(xml)
+
+    def _get_survey_key(self):
+        return (self.pk, md5(smart_str(self.json)).hexdigest())
+
+    def _load_survey_entry(self):
+        """
+        Returns the indexed survey from the process cache, the compiled
+        survey from the shared cache or builds it.
+        """
+        key = self._get_survey_key()
+        entry = survey_cache.get(key)
+
+        if entry is None:
+            shared_key = '{}{}-{}'.format(XFORM_SURVEY_CACHE, *key)
+            try:
+                survey = cache.get(shared_key)
+            except Exception:
+                # a survey pickled by another version of pyxform
+                survey = None
+
+            if survey is None:
+                survey = self._build_survey()
+                try:
+                    cache.set(shared_key, survey, XFORM_SURVEY_CACHE_TIMEOUT)
+                except Exception:
+                    # the survey could not be pickled
+                    pass
+
+            entry = _index_survey(survey)
+            survey_cache.set(key, entry)
+
+        self._survey_key = key
+
+        return entry
+
+    def _get_survey_entry(self):
+        if not hasattr(self, '_survey_entry'):
+            if hasattr(self, '_survey') or self.pk is None:
+                # surveys set on or built for unsaved forms are not cached
+                self._survey_entry = _index_survey(
+                    getattr(self, '_survey', None) or self._build_survey())
+            else:
+                self._survey_entry = self._load_survey_entry()
+
+        return self._survey_entry
+
+    def _clear_survey_cache(self):
+        """Drops the compiled survey of a form whose json has changed."""
+        key = getattr(self, '_survey_key', None)
+
+        if key is None or key != self._get_survey_key():
+            if key is not None:
+                survey_cache.delete(key)
+                safe_delete('{}{}-{}'.format(XFORM_SURVEY_CACHE, *key))
+
+            for attr in ['_survey', '_survey_entry', '_survey_key',
+                         '_survey_elements_with_choices']:
+                if hasattr(self, attr):
+                    delattr(self, attr)
+
     def get_survey(self):
         if not hasattr(self, "_survey"):
-            try:
-                builder = SurveyElementBuilder()
-                self._survey = \
-                    builder.create_survey_element_from_json(self.json)
-            except ValueError:
-                xml = bytes(bytearray(self.xml, encoding='utf-8'))
-                self._survey = create_survey_element_from_xml(xml)
+            self._survey = self._get_survey_entry()['survey']
         return self._survey
 
     survey = property(get_survey)
 
     def get_survey_elements(self):
-        return self.survey.iter_descendants()
+        return iter(self._get_survey_entry()['elements'])
 
     def get_survey_element(self, name_or_xpath):
         """Searches survey element by xpath first,
@@ -331,10 +437,7 @@ class XFormMixin(object):
         ]
 
     def geopoint_xpaths(self):
-        survey_elements = self.get_survey_elements()
-
-        return [e.get_abbreviated_xpath() for e in survey_elements
-                if e.bind.get(u'type') == u'geopoint']
+        return list(self._get_survey_entry()['geopoint_xpaths'])
 
     def xpath_of_first_geopoint(self):
         geo_xpaths = self.geopoint_xpaths()
@@ -347,6 +450,14 @@ class XFormMixin(object):
         Return a list of XPaths for this survey that will be used as
         headers for the csv export.
         """
+        if survey_element is None and result is None and not prefix:
+            xpaths = self._get_survey_entry()['xpaths']
+            if repeat_iterations not in xpaths:
+                xpaths[repeat_iterations] = self.xpaths(
+                    prefix, self.survey, [], repeat_iterations)
+
+            return list(xpaths[repeat_iterations])
+
         if survey_element is None:
             survey_element = self.survey
         elif question_types_to_exclude(survey_element.type):
@@ -421,16 +532,11 @@ class XFormMixin(object):
         return [remove_first_index(header) for header in self.get_headers()]
 
     def get_element(self, abbreviated_xpath):
-        if not hasattr(self, "_survey_elements"):
-            self._survey_elements = {}
-            for e in self.get_survey_elements():
-                self._survey_elements[e.get_abbreviated_xpath()] = e
-
         def remove_all_indices(xpath):
             return re.sub(r"\[\d+\]", u"", xpath)
 
         clean_xpath = remove_all_indices(abbreviated_xpath)
-        return self._survey_elements.get(clean_xpath)
+        return self._get_survey_entry()['elements_by_xpath'].get(clean_xpath)
 
     def get_default_language(self):
         if not hasattr(self, '_default_language'):
@@ -553,8 +659,8 @@ class XFormMixin(object):
             self.has_start_time = False
 
     def get_survey_elements_of_type(self, element_type):
-        return [e for e in self.get_survey_elements()
-                if e.type == element_type]
+        return list(
+            self._get_survey_entry()['elements_by_type'].get(element_type, []))
 
     def get_survey_elements_with_choices(self):
         if not hasattr(self, '_survey_elements_with_choices'):
@@ -570,13 +676,7 @@ class XFormMixin(object):
         return self._survey_elements_with_choices
 
     def get_media_survey_xpaths(self):
-        return [
-            e.get_abbreviated_xpath() for e in sum(
-                [self.get_survey_elements_of_type(m)
-                 for m in KNOWN_MEDIA_TYPES],
-                []
-            )
-        ]
+        return list(self._get_survey_entry()['media_xpaths'])
 
     def _check_version_set(self, survey):
         """
@@ -673,6 +773,16 @@ class XForm(XFormMixin, BaseModel):
             ("delete_submission", _(u"Can delete submissions from form")),
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        xform = super(XForm, cls).from_db(db, field_names, values)
+        # to tell whether a save adds the form to form lists
+        xform._listed_values = dict(
+            (name, value) for name, value in zip(field_names, values)
+            if name in XFORM_LISTED_FIELDS)
+
+        return xform
+
     def file_name(self):
         return self.id_string + ".xml"
 
@@ -769,6 +879,11 @@ class XForm(XFormMixin, BaseModel):
         if 'skip_xls_read' in kwargs:
             del kwargs['skip_xls_read']
 
+        if update_fields is None or 'json' in update_fields:
+            self._clear_survey_cache()
+            # the counted fields and how they are grouped may have changed
+            safe_delete('{}{}-state'.format(XFORM_FIELD_COUNTS, self.pk))
+
         super(XForm, self).save(*args, **kwargs)
 
     def __unicode__(self):
@@ -922,6 +1037,106 @@ class XFormGroupObjectPermission(GroupObjectPermissionBase):
     content_object = models.ForeignKey(XForm)
 
 
+post_save.connect(
+    clear_obj_perms_cache, sender=XFormUserObjectPermission,
+    dispatch_uid='xform_user_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=XFormUserObjectPermission,
+    dispatch_uid='xform_user_obj_perms_post_delete')
+post_save.connect(
+    clear_obj_perms_cache, sender=XFormGroupObjectPermission,
+    dispatch_uid='xform_group_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=XFormGroupObjectPermission,
+    dispatch_uid='xform_group_obj_perms_post_delete')
+
+
+def get_xform_user_ids(xform):
+    """Returns the ids of the owner and of the users with permissions on
+    `xform` directly or through a team."""
+    user_ids = set(XFormUserObjectPermission.objects.filter(
+        content_object=xform).values_list('user_id', flat=True))
+    group_ids = XFormGroupObjectPermission.objects.filter(
+        content_object=xform).values_list('group_id', flat=True)
+    user_ids.update(User.groups.through.objects.filter(
+        group_id__in=group_ids).values_list('user_id', flat=True))
+    user_ids.add(xform.user_id)
+
+    return user_ids
+
+
+def _get_xform_list_user_ids(xform, created):
+    """
+    Returns the ids of the users whose form lists `xform` may have been
+    added to, the lists it is in already change with its version.
+    """
+    if created:
+        # the users it is shared with follow with their permissions
+        return [xform.user_id]
+
+    loaded = getattr(xform, '_listed_values', {})
+    if len(loaded) < len(XFORM_LISTED_FIELDS) or \
+            (xform.downloadable and not loaded['downloadable']) or \
+            (xform.deleted_at is None and loaded['deleted_at']) or \
+            xform.user_id != loaded['user_id']:
+        return get_xform_user_ids(xform)
+
+    if xform.shared and not loaded['shared']:
+        # public forms are listed to others in the owner's form list
+        return [xform.user_id]
+
+    return []
+
+
+def clear_xform_list_cache(sender, instance=None, created=False, **kwargs):
+    """Invalidates the cached form lists that a form that was changed is or
+    may now be in."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not XFORM_LIST_FIELDS.intersection(update_fields):
+        return
+
+    bump_xform_list_form_version(instance.pk)
+    user_ids = _get_xform_list_user_ids(instance, created)
+    if user_ids:
+        bump_xform_list_versions(user_ids)
+    instance._listed_values = dict(
+        (name, getattr(instance, name)) for name in XFORM_LISTED_FIELDS)
+
+
+def clear_deleted_xform_list_cache(sender, instance=None, **kwargs):
+    """Invalidates the cached form lists that a deleted form is in."""
+    bump_xform_list_form_version(instance.pk)
+
+
+def clear_xform_list_perms_cache(sender, instance=None, **kwargs):
+    """Invalidates the cached form lists of the user or the team members
+    whose permissions on a form changed."""
+    if hasattr(instance, 'user_id'):
+        bump_xform_list_versions([instance.user_id])
+    else:
+        bump_xform_list_versions(User.groups.through.objects.filter(
+            group_id=instance.group_id).values_list('user_id', flat=True))
+
+
+post_save.connect(clear_xform_list_cache, sender=XForm,
+                  dispatch_uid='xform_list_cache_post_save')
+post_delete.connect(clear_deleted_xform_list_cache, sender=XForm,
+                    dispatch_uid='xform_list_cache_post_delete')
+
+post_save.connect(
+    clear_xform_list_perms_cache, sender=XFormUserObjectPermission,
+    dispatch_uid='xform_user_obj_perms_list_cache_post_save')
+post_delete.connect(
+    clear_xform_list_perms_cache, sender=XFormUserObjectPermission,
+    dispatch_uid='xform_user_obj_perms_list_cache_post_delete')
+post_save.connect(
+    clear_xform_list_perms_cache, sender=XFormGroupObjectPermission,
+    dispatch_uid='xform_group_obj_perms_list_cache_post_save')
+post_delete.connect(
+    clear_xform_list_perms_cache, sender=XFormGroupObjectPermission,
+    dispatch_uid='xform_group_obj_perms_list_cache_post_delete')
+
+
 def update_xform_uuid(username, id_string, new_uuid):
     xform = XForm.objects.get(user__username=username, id_string=id_string)
     # check for duplicate uuid
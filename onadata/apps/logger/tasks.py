@@ -26,3 +26,41 @@ def import_instance_async(username, xform_path, photos, osm_files, status):
 
         for i in images:
             i.close()
+
+
+@task(ignore_result=True)
+def create_thumbnails_async(attachment_id):
+    from onadata.apps.logger.models import Attachment
+    from onadata.libs.utils.image_tools import create_thumbnails
+
+    attachment = Attachment.objects.filter(pk=attachment_id).first()
+    if attachment:
+        create_thumbnails(attachment)
+
+
+@task(ignore_result=True)
+def update_json_indexes_async(xform_id, fields=None, gin=False, drop=None):
+    """
+    Drops the json indexes `drop` and indexes `fields` of the form, and the
+    whole json when `gin` is set, concurrently so that it must run out of a
+    transaction.
+    """
+    from onadata.apps.logger.models import XForm
+    from onadata.libs.utils.json_index_tools import create_json_gin_index, \
+        create_json_index, drop_json_index
+
+    xform = XForm.objects.filter(pk=xform_id).first()
+    if xform:
+        for name in drop or []:
+            drop_json_index(xform, name)
+        for field in fields or []:
+            create_json_index(xform, field)
+        if gin:
+            create_json_gin_index(xform)
+
+
+@task(ignore_result=True)
+def build_field_counts_async(xform_id):
+    from onadata.libs.data.query import build_field_counts
+
+    build_field_counts(xform_id)
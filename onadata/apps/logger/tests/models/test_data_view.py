@@ -7,7 +7,8 @@ from onadata.apps.api.tests.viewsets.test_abstract_viewset import\
     TestAbstractViewSet
 from onadata.apps.logger.models.data_view import (
     append_where_list,
-    DataView)
+    DataView,
+    DataViewInstance)
 
 
 class TestDataView(TestBase):
@@ -196,3 +197,50 @@ class TestIntegratedDataView(TestAbstractViewSet):
                                                                 self.count)]
 
         self.assertTrue(self.is_sorted_desc([r.get("age") for r in records]))
+
+    def test_materialized_dataview(self):
+        records = DataView.query_data(self.data_view)
+
+        self.data_view.materialized = True
+        self.data_view.save()
+
+        self.assertEqual(
+            DataViewInstance.objects.filter(data_view=self.data_view).count(),
+            3)
+        (sql, columns, params) = DataView.generate_query_string(
+            self.data_view,
+            self.start_index,
+            self.limit,
+            self.last_submission_time,
+            self.all_data,
+            self.sort)
+        self.assertIn(u"logger_dataviewinstance", sql)
+        self.assertEqual(DataView.query_data(self.data_view), records)
+        self.assertEqual(
+            list(DataView.query_data(self.data_view, stream=True)), records)
+
+        # deleted submissions are removed from the materialized dataview
+        instance = self.xform.instances.get(pk=records[0]['_id'])
+        self.assertTrue(self.data_view.has_instance(instance))
+        instance.set_deleted()
+        self.assertFalse(self.data_view.has_instance(instance))
+        self.assertEqual(DataView.query_data(self.data_view, count=True),
+                         [{'count': 2}])
+
+        # a submission saved again is materialized once
+        instance = self.xform.instances.get(pk=records[1]['_id'])
+        instance.save()
+        instance.save()
+        self.assertEqual(
+            DataViewInstance.objects.filter(data_view=self.data_view,
+                                            instance=instance).count(), 1)
+
+        self.data_view.materialized = False
+        self.data_view.save()
+        self.assertFalse(
+            DataViewInstance.objects.filter(data_view=self.data_view).exists())
+
+        # the cached materialized dataviews of the form are cleared
+        instance.save()
+        self.assertFalse(
+            DataViewInstance.objects.filter(data_view=self.data_view).exists())
@@ -1,18 +1,29 @@
 import os
 
+from cStringIO import StringIO
 from datetime import datetime
 from datetime import timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import utc
 from django_digest.test import DigestAuth
 from mock import patch
 
 from onadata.apps.main.tests.test_base import TestBase
+from onadata.apps.logger.management.commands.add_instance_checksums import \
+    CHECKSUM_INDEX, create_checksum_index
 from onadata.apps.logger.models import XForm, Instance
 from onadata.apps.logger.models.instance import get_id_string_from_xml_str
+from onadata.apps.logger.models.instance import get_xml_checksum
+from onadata.apps.logger.models.instance import process_submission_batch
+from onadata.apps.logger.models.instance import process_submissions
 from onadata.apps.viewer.models.parsed_instance import (
     ParsedInstance, query_data)
+from onadata.libs.utils.cache_tools import add_to_submission_batch
+from onadata.libs.utils.cache_tools import get_xform_data_version
 from onadata.libs.utils.common_tags import MONGO_STRFTIME, SUBMISSION_TIME,\
-    XFORM_ID_STRING, SUBMITTED_BY
+    XFORM_ID_STRING, SUBMITTED_BY, ID
 
 
 class TestInstance(TestBase):
@@ -209,3 +220,94 @@ class TestInstance(TestBase):
         self.assertEqual(self.xform.instances.count(), 4)
         self.assertEqual(len(data), 3)
         self.assertNotIn(atime, data)
+
+    @patch('onadata.apps.logger.models.instance.process_submissions')
+    def test_process_submission_batch(self, mock_process):
+        self._publish_transportation_form()
+        xform_id = self.xform.pk
+
+        self.assertTrue(add_to_submission_batch(xform_id, (1, True)))
+        # the batch is already scheduled
+        self.assertFalse(add_to_submission_batch(xform_id, (2, False)))
+
+        process_submission_batch(xform_id)
+        mock_process.assert_called_once_with(xform_id, [(1, True),
+                                                        (2, False)])
+
+        # the next submission starts a new batch
+        self.assertTrue(add_to_submission_batch(xform_id, (3, True)))
+        process_submission_batch(xform_id)
+        mock_process.assert_called_with(xform_id, [(3, True)])
+
+    def test_process_submissions(self):
+        self._publish_transportation_form_and_submit_instance()
+        instance = self.xform.instances.first()
+        self.xform.refresh_from_db()
+        num_of_submissions = self.xform.num_of_submissions
+
+        process_submissions(self.xform.pk, [(instance.pk, True)])
+
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.num_of_submissions,
+                         num_of_submissions + 1)
+
+    @patch('django.utils.timezone.now')
+    def test_new_submission_json_is_written_once(self, mock_time):
+        # the json and the INSERT take the submission time from the same clock
+        # reading, a second boundary between two readings would add an UPDATE
+        mock_time.return_value = datetime.utcnow().replace(tzinfo=utc)
+        self._publish_transportation_form()
+
+        with CaptureQueriesContext(connection) as context:
+            self._submit_transport_instance()
+
+        instance = self.xform.instances.first()
+        self.assertEqual(instance.json[ID], instance.pk)
+        self.assertEqual(instance.json[SUBMISSION_TIME],
+                         instance.date_created.strftime(MONGO_STRFTIME))
+        self.assertEqual(
+            len([q for q in context.captured_queries
+                 if q['sql'].startswith('INSERT INTO "logger_instance"')]), 1)
+        self.assertEqual(
+            [q for q in context.captured_queries
+             if q['sql'].startswith('UPDATE "logger_instance"')], [])
+
+    def test_duplicate_submission_is_found_by_checksum(self):
+        self._publish_transportation_form_and_submit_instance()
+        instance = self.xform.instances.get()
+        self.assertEqual(instance.checksum, get_xml_checksum(instance.xml))
+
+        # only the checksum matches the resubmitted xml
+        Instance.objects.filter(pk=instance.pk).update(uuid=u'other')
+        self._submit_transport_instance()
+        self.assertEqual(self.xform.instances.count(), 1)
+
+    def test_add_instance_checksums(self):
+        self._publish_transportation_form_and_submit_instance()
+        Instance.objects.update(checksum=None)
+
+        call_command('add_instance_checksums', stdout=StringIO())
+
+        instance = self.xform.instances.get()
+        self.assertEqual(instance.checksum, get_xml_checksum(instance.xml))
+
+        # the index left to the command on large tables is built once
+        cursor = connection.cursor()
+        cursor.execute('DROP INDEX IF EXISTS {}'.format(CHECKSUM_INDEX))
+        self.assertTrue(create_checksum_index(cursor))
+        self.assertFalse(create_checksum_index(cursor))
+
+    @patch('onadata.libs.utils.cache_tools.transaction.on_commit')
+    def test_data_version_is_bumped_again_on_commit(self, on_commit):
+        self._publish_transportation_form()
+        version = get_xform_data_version(self.xform.pk)
+
+        self._submit_transport_instance()
+        self.assertNotEqual(get_xform_data_version(self.xform.pk), version)
+        self.assertTrue(on_commit.called)
+
+        # data read before the commit is not cached under the final version
+        version = get_xform_data_version(self.xform.pk)
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertNotEqual(get_xform_data_version(self.xform.pk), version)
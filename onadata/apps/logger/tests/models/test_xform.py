@@ -1,3 +1,4 @@
+import json
 import os
 
 from pyxform.tests_v1.pyxform_test_case import PyxformTestCase
@@ -114,3 +115,24 @@ class TestXForm(PyxformTestCase, TestBase):
 
         fruitb_o = xform.get_survey_element("b/fruitb/orange")
         self.assertEqual(fruitb_o.get_abbreviated_xpath(), "b/fruitb/orange")
+
+    def test_survey_is_cached_per_form_version(self):
+        self._publish_transportation_form()
+        xform = XForm.objects.get(pk=self.xform.pk)
+        other_xform = XForm.objects.get(pk=self.xform.pk)
+
+        self.assertIs(xform.survey, other_xform.survey)
+        self.assertEqual(xform.get_survey_elements_of_type('select one'),
+                         other_xform.get_survey_elements_of_type('select one'))
+
+        # changing the form's json drops its compiled survey
+        survey_json = json.loads(xform.json)
+        survey_json['title'] = u'Transport'
+        xform.json = json.dumps(survey_json)
+        xform.save()
+
+        self.assertIsNot(xform.survey, other_xform.survey)
+        self.assertEqual(xform.survey.get('title'), u'Transport')
+        self.assertEqual(
+            XForm.objects.get(pk=self.xform.pk).survey.get('title'),
+            u'Transport')
@@ -5,7 +5,7 @@ from xml.dom import minidom
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.logger.xform_instance_parser import XFormInstanceParser,\
-    xpath_from_xml_node
+    xpath_from_xml_node, LxmlXFormInstanceParser, InstanceMultipleNodeError
 from onadata.apps.logger.xform_instance_parser import get_uuid_from_xml,\
     get_meta_from_xml, get_deprecated_uuid_from_xml
 from onadata.libs.utils.common_tags import XFORM_ID_STRING
@@ -172,3 +172,58 @@ class TestXFormInstanceParser(TestBase):
         self.assertContains(self.response,
                             "Multiple nodes with the same name",
                             status_code=400)
+
+    def test_lxml_parser_parity(self):
+        """The lxml parser reads the parity corpus as the minidom parser"""
+        self._publish_and_submit_new_repeats()
+        fixtures = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "fixtures")
+        corpus = [
+            os.path.join(fixtures, "new_repeats", "instances",
+                         "new_repeats_2012-07-05-14-33-53.xml"),
+            os.path.join(fixtures, "tutorial", "instances",
+                         "tutorial_2012-06-27_11-27-53_w_uuid_edited.xml"),
+            os.path.join(fixtures, "tutorial", "instances",
+                         "tutorial_unicode_submission.xml"),
+        ]
+        parity = os.path.join(fixtures, "new_repeats", "instances", "parity")
+        corpus += [os.path.join(parity, f) for f in sorted(os.listdir(parity))]
+
+        for path in corpus:
+            with open(path) as xml_file:
+                xml = xml_file.read()
+            parser = XFormInstanceParser(xml, self.xform)
+            lxml_parser = LxmlXFormInstanceParser(xml, self.xform)
+
+            self.assertEqual(lxml_parser.to_dict(), parser.to_dict(), path)
+            self.assertEqual(lxml_parser.to_flat_dict(),
+                             parser.to_flat_dict(), path)
+            self.assertEqual(lxml_parser.get_attributes(),
+                             parser.get_attributes(), path)
+            self.assertEqual(lxml_parser.get_root_node_name(),
+                             parser.get_root_node_name(), path)
+            self.assertEqual(lxml_parser.get_root_node().toxml(),
+                             parser.get_root_node().toxml(), path)
+
+        with open(os.path.join(fixtures, "new_repeats", "instances",
+                               "multiple_nodes_error.xml")) as xml_file:
+            xml = xml_file.read()
+        with self.assertRaises(InstanceMultipleNodeError):
+            LxmlXFormInstanceParser(xml, self.xform)
+
+    def test_lxml_parser_does_not_expand_entities(self):
+        self._publish_and_submit_new_repeats()
+        path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "fixtures",
+            "new_repeats", "instances", "entities.xml")
+        with open(path) as xml_file:
+            xml = xml_file.read()
+
+        lxml_parser = LxmlXFormInstanceParser(xml, self.xform)
+        flat_dict = lxml_parser.to_flat_dict()
+
+        self.assertNotIn(u"info/name", flat_dict)
+        self.assertNotIn(u"info/age", flat_dict)
+        self.assertEqual(flat_dict[u"web_browsers"], u"chrome")
+        self.assertNotIn(u"root:", repr(lxml_parser.to_dict()))
+        self.assertNotIn(u"expanded", repr(lxml_parser.to_dict()))
@@ -1,8 +1,13 @@
 import re
 import dateutil.parser
+from io import BytesIO
 from xml.dom import minidom, Node
+from xml.parsers.expat import ExpatError
+
+from django.conf import settings
 from django.utils.encoding import smart_unicode, smart_str
 from django.utils.translation import ugettext as _
+from lxml import etree
 
 from onadata.libs.utils.common_tags import XFORM_ID_STRING
 
@@ -129,10 +134,14 @@ def get_deprecated_uuid_from_xml(xml):
     return None
 
 
-def clean_and_parse_xml(xml_string):
+def clean_xml(xml_string):
     clean_xml_str = xml_string.strip()
     clean_xml_str = re.sub(ur">\s+<", u"><", smart_unicode(clean_xml_str))
-    xml_obj = minidom.parseString(smart_str(clean_xml_str))
+    return smart_str(clean_xml_str)
+
+
+def clean_and_parse_xml(xml_string):
+    xml_obj = minidom.parseString(clean_xml(xml_string))
     return xml_obj
 
 
@@ -272,6 +281,100 @@ def _get_all_attributes(node):
             yield pair
 
 
+def _lxml_node_name(node):
+    """Returns the qualified name of an lxml element as minidom names it."""
+    name = node.tag.rsplit('}', 1)[-1]
+
+    return u'%s:%s' % (node.prefix, name) if node.prefix else unicode(name)
+
+
+def _lxml_attributes(node):
+    """Yields the attributes of an lxml element as minidom names them."""
+    prefixes = dict([(uri, prefix) for prefix, uri in node.nsmap.items()])
+    prefixes[u'http://www.w3.org/XML/1998/namespace'] = u'xml'
+
+    for key, value in node.attrib.items():
+        if key.startswith('{'):
+            uri, name = key[1:].split('}', 1)
+            key = u'%s:%s' % (prefixes[uri], name) if prefixes.get(uri) \
+                else name
+        yield unicode(key), unicode(value)
+
+
+def _iterparse_xml(xml_str, repeats):
+    """
+    Reads the document with lxml's iterparse and returns what
+    _xml_node_to_dict returns for its document element, the name of the
+    document element and the attributes _get_all_attributes returns.
+
+    Elements are discarded once they are read so memory does not grow with
+    the size of repeat groups. Entities are neither loaded nor expanded, a
+    node holding an entity reference has no value.
+    """
+    repeats = set(repeats)
+    attributes = []
+    namespaces = []
+    # [name, xpath, value, has child elements] of the open elements
+    stack = []
+    root_name = result = None
+
+    try:
+        for event, item in etree.iterparse(
+                BytesIO(clean_xml(xml_str)),
+                events=('start-ns', 'start', 'end'),
+                resolve_entities=False, no_network=True, load_dtd=False):
+            if event == 'start-ns':
+                prefix, uri = item
+                namespaces.append(
+                    (u'xmlns:%s' % prefix if prefix else u'xmlns',
+                     unicode(uri)))
+            elif event == 'start':
+                name = _lxml_node_name(item)
+                if not stack:
+                    root_name, xpath = name, u''
+                elif len(stack) == 1:
+                    xpath = name
+                else:
+                    xpath = u'%s/%s' % (stack[-1][1], name)
+                if stack:
+                    stack[-1][3] = True
+
+                attributes.extend(namespaces)
+                attributes.extend(_lxml_attributes(item))
+                namespaces = []
+                stack.append([name, xpath, {}, False])
+            else:
+                name, xpath, value, has_children = stack.pop()
+                if not has_children and len(item) == 0:
+                    # a leaf node, None when there is no data
+                    value = None if item.text is None else \
+                        unicode(item.text)
+                elif value == {}:
+                    value = None
+
+                item.clear()
+                while item.getprevious() is not None:
+                    del item.getparent()[0]
+
+                if value is None:
+                    continue
+
+                if not stack:
+                    result = {name: value}
+                elif xpath in repeats:
+                    stack[-1][2].setdefault(name, []).append(value)
+                elif name not in stack[-1][2]:
+                    stack[-1][2][name] = value
+                else:
+                    raise InstanceMultipleNodeError(
+                        _(u"Multiple nodes with the same name '%s'"
+                          u" while not a repeat" % name))
+    except etree.XMLSyntaxError as e:
+        raise ExpatError(unicode(e))
+
+    return result, root_name, attributes
+
+
 class XFormInstanceParser(object):
 
     def __init__(self, xml_str, data_dictionary):
@@ -281,9 +384,7 @@ class XFormInstanceParser(object):
     def parse(self, xml_str):
         self._xml_obj = clean_and_parse_xml(xml_str)
         self._root_node = self._xml_obj.documentElement
-        repeats = [e.get_abbreviated_xpath()
-                   for e in self.dd.get_survey_elements_of_type(u"repeat")]
-        self._dict = _xml_node_to_dict(self._root_node, repeats)
+        self._dict = _xml_node_to_dict(self._root_node, self._get_repeats())
         self._flat_dict = {}
         if self._dict is None:
             raise InstanceEmptyError
@@ -291,6 +392,13 @@ class XFormInstanceParser(object):
             self._flat_dict[u"/".join(path[1:])] = value
         self._set_attributes()
 
+    def _get_repeats(self):
+        return [e.get_abbreviated_xpath()
+                for e in self.dd.get_survey_elements_of_type(u"repeat")]
+
+    def _get_all_attributes(self):
+        return _get_all_attributes(self._root_node)
+
     def get_root_node(self):
         return self._root_node
 
@@ -311,7 +419,7 @@ class XFormInstanceParser(object):
 
     def _set_attributes(self):
         self._attributes = {}
-        all_attributes = list(_get_all_attributes(self._root_node))
+        all_attributes = list(self._get_all_attributes())
         for key, value in all_attributes:
             # commented since enketo forms may have the template attribute in
             # multiple xml tags and I dont see the harm in overiding
@@ -336,16 +444,107 @@ class XFormInstanceParser(object):
         return result
 
 
+class LxmlXFormInstanceParser(XFormInstanceParser):
+    """
+    Produces the same dict, flat dict and attributes as XFormInstanceParser
+    with lxml's iterparse instead of a minidom document.
+
+    Text mixed with CDATA sections is read as a whole, XFormInstanceParser
+    only keeps the CDATA section.
+    """
+
+    def parse(self, xml_str):
+        self._xml_str = xml_str
+        self._dict, self._root_node_name, self._all_attributes = \
+            _iterparse_xml(xml_str, self._get_repeats())
+        self._flat_dict = {}
+        if self._dict is None:
+            raise InstanceEmptyError
+        for path, value in _flatten_dict_nest_repeats(self._dict, []):
+            self._flat_dict[u"/".join(path[1:])] = value
+        self._set_attributes()
+
+    def _get_all_attributes(self):
+        return self._all_attributes
+
+    def get_root_node(self):
+        # the minidom document is only built when the node is asked for
+        if not hasattr(self, '_root_node'):
+            self._root_node = \
+                clean_and_parse_xml(self._xml_str).documentElement
+
+        return self._root_node
+
+    def get_root_node_name(self):
+        return self._root_node_name
+
+
+def _remove_empty_values(value):
+    """
+    Drops the empty values of a submission dict the way empty XML nodes are
+    dropped when a submission is parsed.
+    """
+    if isinstance(value, dict):
+        return dict([(k, _remove_empty_values(v)) for k, v in value.items()
+                     if v not in [None, u'']])
+    elif isinstance(value, list):
+        return [_remove_empty_values(v) for v in value
+                if v not in [None, u'']]
+
+    return value
+
+
+class DictInstanceParser(XFormInstanceParser):
+    """
+    Produces the dict and flat dict of a submission from the dict of the
+    submission e.g. a CSV row, without writing it to XML and parsing it back.
+    """
+
+    def __init__(self, submission_dict, data_dictionary):
+        self.dd = data_dictionary
+        self._attributes = {u'id': data_dictionary.id_string}
+        self.parse(submission_dict)
+
+    def parse(self, submission_dict):
+        self._dict = _remove_empty_values(submission_dict)
+        if not self._dict:
+            raise InstanceEmptyError
+        self._root_node_name = self._dict.keys()[0]
+        self._flat_dict = {}
+        for path, value in _flatten_dict_nest_repeats(self._dict, []):
+            self._flat_dict[u"/".join(path[1:])] = value
+
+    def get_root_node_name(self):
+        return self._root_node_name
+
+
+INSTANCE_PARSERS = {
+    'minidom': XFormInstanceParser,
+    'lxml': LxmlXFormInstanceParser,
+}
+
+
+def get_instance_parser(xml_str, data_dictionary):
+    """
+    Returns a parser of the submission using the XFORM_INSTANCE_PARSER
+    setting, one of minidom (the default) or lxml.
+    """
+    parser_class = INSTANCE_PARSERS[
+        getattr(settings, 'XFORM_INSTANCE_PARSER', 'minidom')]
+
+    return parser_class(xml_str, data_dictionary)
+
+
 def xform_instance_to_dict(xml_str, data_dictionary):
-    parser = XFormInstanceParser(xml_str, data_dictionary)
+    parser = get_instance_parser(xml_str, data_dictionary)
     return parser.to_dict()
 
 
 def xform_instance_to_flat_dict(xml_str, data_dictionary):
-    parser = XFormInstanceParser(xml_str, data_dictionary)
+    parser = get_instance_parser(xml_str, data_dictionary)
     return parser.to_flat_dict()
 
 
 def parse_xform_instance(xml_str, data_dictionary):
-    parser = XFormInstanceParser(xml_str, data_dictionary)
+    parser = get_instance_parser(xml_str, data_dictionary)
     return parser.get_flat_dict_with_attributes()
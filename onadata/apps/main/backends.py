@@ -1,5 +1,9 @@
 from django.contrib.auth.models import User
 from django.contrib.auth.backends import ModelBackend as DjangoModelBackend
+from guardian.backends import ObjectPermissionBackend as \
+    GuardianObjectPermissionBackend
+from guardian.backends import check_object_support
+from guardian.exceptions import WrongAppError
 
 
 class ModelBackend(DjangoModelBackend):
@@ -11,3 +15,38 @@ class ModelBackend(DjangoModelBackend):
                 return user
         except User.DoesNotExist:
             return None
+
+
+class ObjectPermissionBackend(GuardianObjectPermissionBackend):
+    """
+    Guardian's object permission backend with the permissions of a user read
+    once per user object and kept in the cache between requests.
+    """
+
+    def has_perm(self, user_obj, perm, obj=None):
+        from onadata.libs.permissions import get_perms_checker
+
+        if not check_object_support(obj):
+            return False
+
+        checker = get_perms_checker(user_obj)
+        if checker is None:
+            return False
+
+        if '.' in perm:
+            app_label, perm = perm.split('.')
+            if app_label != obj._meta.app_label:
+                raise WrongAppError(
+                    "Passed perm has app label of '%s' and given obj has "
+                    "'%s'" % (app_label, obj._meta.app_label))
+
+        return checker.has_perm(perm, obj)
+
+    def get_all_permissions(self, user_obj, obj=None):
+        from onadata.libs.permissions import get_perms_checker
+
+        checker = get_perms_checker(user_obj)
+        if not check_object_support(obj) or checker is None:
+            return set()
+
+        return checker.get_perms(obj)
@@ -15,7 +15,8 @@ from django.db import models, IntegrityError
 from django.conf import settings
 from hashlib import md5
 
-from onadata.libs.utils.cache_tools import safe_delete, XFORM_METADATA_CACHE
+from onadata.libs.utils.cache_tools import safe_delete, XFORM_METADATA_CACHE,\
+    bump_xform_manifest_version
 from onadata.libs.utils.common_tags import TEXTIT, GOOGLE_SHEET_DATA_TYPE, \
     XFORM_META_PERMS
 
@@ -413,6 +414,9 @@ def clear_cached_metadata_instance_object(
     safe_delete('{}{}'.format(
         XFORM_METADATA_CACHE, instance.object_id))
 
+    if instance.data_type == 'media':
+        bump_xform_manifest_version(instance.object_id)
+
 
 def update_attached_object(sender, instance=None, created=False, **kwargs):
     if instance:
@@ -1,15 +1,18 @@
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import JSONField
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.utils.translation import ugettext_lazy
 from guardian.shortcuts import get_perms_for_model, assign_perm
 from guardian.models import UserObjectPermissionBase
 from guardian.models import GroupObjectPermissionBase
+from guardian.models import GroupObjectPermission, UserObjectPermission
 from rest_framework.authtoken.models import Token
 from onadata.libs.utils.country_field import COUNTRIES
 from onadata.libs.utils.gravatar import get_gravatar_img_link, gravatar_exists
 from onadata.apps.main.signals import set_api_permissions
+from onadata.apps.main.signals import clear_obj_perms_cache
+from onadata.apps.main.signals import clear_user_perms_cache
 
 
 class UserProfile(models.Model):
@@ -90,3 +93,32 @@ class UserProfileUserObjectPermission(UserObjectPermissionBase):
 class UserProfileGroupObjectPermission(GroupObjectPermissionBase):
     """Guardian model to create direct foreign keys."""
     content_object = models.ForeignKey(UserProfile)
+
+
+post_save.connect(
+    clear_obj_perms_cache, sender=UserProfileUserObjectPermission,
+    dispatch_uid='user_profile_user_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=UserProfileUserObjectPermission,
+    dispatch_uid='user_profile_user_obj_perms_post_delete')
+post_save.connect(
+    clear_obj_perms_cache, sender=UserProfileGroupObjectPermission,
+    dispatch_uid='user_profile_group_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=UserProfileGroupObjectPermission,
+    dispatch_uid='user_profile_group_obj_perms_post_delete')
+post_save.connect(
+    clear_obj_perms_cache, sender=UserObjectPermission,
+    dispatch_uid='user_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=UserObjectPermission,
+    dispatch_uid='user_obj_perms_post_delete')
+post_save.connect(
+    clear_obj_perms_cache, sender=GroupObjectPermission,
+    dispatch_uid='group_obj_perms_post_save')
+post_delete.connect(
+    clear_obj_perms_cache, sender=GroupObjectPermission,
+    dispatch_uid='group_obj_perms_post_delete')
+
+m2m_changed.connect(clear_user_perms_cache, sender=User.groups.through,
+                    dispatch_uid='user_groups_perms_cache')
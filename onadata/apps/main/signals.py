@@ -2,3 +2,39 @@ def set_api_permissions(sender, instance=None, created=False, **kwargs):
     from onadata.libs.utils.user_auth import set_api_permissions_for_user
     if created:
         set_api_permissions_for_user(instance)
+
+
+def clear_obj_perms_cache(sender, instance=None, **kwargs):
+    """Invalidates the cached permissions on the object of a guardian object
+    permission that was added or removed."""
+    from django.contrib.contenttypes.models import ContentType
+    from onadata.libs.utils.cache_tools import bump_obj_perms_version
+
+    if sender.objects.is_generic():
+        bump_obj_perms_version(instance.content_type_id, instance.object_pk)
+    else:
+        model = sender._meta.get_field('content_object').rel.to
+        bump_obj_perms_version(ContentType.objects.get_for_model(model).pk,
+                               instance.content_object_id)
+
+
+def clear_user_perms_cache(sender, instance=None, action=None, reverse=False,
+                           pk_set=None, **kwargs):
+    """Invalidates the cached object permissions and form lists of users
+    whose teams changed."""
+    from onadata.libs.utils.cache_tools import bump_user_perms_version
+    from onadata.libs.utils.cache_tools import bump_xform_list_versions
+
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = instance.user_set.values_list('pk', flat=True)
+    else:
+        user_ids = pk_set
+
+    for user_id in user_ids:
+        bump_user_perms_version(user_id)
+    bump_xform_list_versions(user_ids)
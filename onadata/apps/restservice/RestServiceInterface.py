@@ -1,3 +1,25 @@
+import httplib2
+
+
 class RestServiceInterface(object):
-    def send(self, url, data=None):
+    # whether get_batch_request can send many submissions in one request
+    supports_batch = False
+
+    def get_request(self, url, submission_instance):
+        """
+        Returns the keyword arguments of the httplib2 request that sends the
+        submission to the service.
+        """
         raise NotImplementedError
+
+    def get_batch_request(self, url, submission_instances):
+        """
+        Returns the keyword arguments of the httplib2 request that sends all
+        the submissions to the service.
+        """
+        raise NotImplementedError
+
+    def send(self, url, submission_instance, http=None):
+        http = http or httplib2.Http()
+
+        return http.request(**self.get_request(url, submission_instance))
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0030_fieldcount'),
+        ('restservice', '0002_auto_20160524_0458'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingDelivery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(db_index=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('instance', models.ForeignKey(to='logger.Instance')),
+                ('restservice', models.ForeignKey(to='restservice.RestService')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='pendingdelivery',
+            unique_together=set([('restservice', 'instance')]),
+        ),
+    ]
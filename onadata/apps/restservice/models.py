@@ -5,6 +5,7 @@ from django.db import models
 from django.db.models.signals import post_delete
 from django.utils.translation import ugettext_lazy
 
+from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models import MetaData
 from onadata.apps.restservice import SERVICE_CHOICES
@@ -41,6 +42,24 @@ class RestService(models.Model):
         return sv.verbose_name
 
 
+class PendingDelivery(models.Model):
+    """A submission that failed to reach a rest service and is retried."""
+
+    class Meta:
+        app_label = 'restservice'
+        unique_together = ('restservice', 'instance')
+
+    restservice = models.ForeignKey(RestService)
+    instance = models.ForeignKey(Instance)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(db_index=True)
+    error = models.TextField(blank=True, default=u'')
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __unicode__(self):
+        return u"%s - %s" % (self.restservice, self.instance_id)
+
+
 def delete_metadata(sender, instance, **kwargs):
     if instance.name in [TEXTIT, GOOGLE_SHEET]:
         MetaData.objects.filter(
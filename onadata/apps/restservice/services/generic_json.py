@@ -1,4 +1,3 @@
-import httplib2
 import json
 
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
@@ -7,11 +6,17 @@ from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
 class ServiceDefinition(RestServiceInterface):
     id = u'json'
     verbose_name = u'JSON POST'
+    supports_batch = True
 
-    def send(self, url, submission_instance):
-        post_data = json.dumps(submission_instance.json)
+    def _get_json_request(self, url, data):
         headers = {"Content-Type": "application/json"}
-        http = httplib2.Http()
-        resp, content = http.request(uri=url, method='POST',
-                                     headers=headers,
-                                     body=post_data)
+
+        return {'uri': url, 'method': 'POST', 'headers': headers,
+                'body': json.dumps(data)}
+
+    def get_request(self, url, submission_instance):
+        return self._get_json_request(url, submission_instance.json)
+
+    def get_batch_request(self, url, submission_instances):
+        return self._get_json_request(
+            url, [instance.json for instance in submission_instances])
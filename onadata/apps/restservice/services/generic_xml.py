@@ -1,5 +1,3 @@
-import httplib2
-
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
 
 
@@ -7,8 +5,8 @@ class ServiceDefinition(RestServiceInterface):
     id = u'xml'
     verbose_name = u'XML POST'
 
-    def send(self, url, submission_instance):
+    def get_request(self, url, submission_instance):
         headers = {"Content-Type": "application/xml"}
-        http = httplib2.Http()
-        resp, content = http.request(
-            url, method="POST", body=submission_instance.xml, headers=headers)
+
+        return {'uri': url, 'method': 'POST', 'headers': headers,
+                'body': submission_instance.xml}
@@ -1,4 +1,3 @@
-import httplib2
 import json
 from six import string_types
 
@@ -12,9 +11,10 @@ class ServiceDefinition(RestServiceInterface):
     id = TEXTIT
     verbose_name = u'TextIt POST'
 
-    def send(self, url, submission_instance):
+    def get_request(self, url, submission_instance):
         """
-        Sends the submission to the configured rest service
+        Returns the request that sends the submission to the configured rest
+        service
         :param url:
         :param submission_instance:
         :return:
@@ -31,11 +31,9 @@ class ServiceDefinition(RestServiceInterface):
         }
         headers = {"Content-Type": "application/json",
                    "Authorization": "Token {}".format(token)}
-        http = httplib2.Http()
 
-        resp, content = http.request(uri=url, method='POST',
-                                     headers=headers,
-                                     body=json.dumps(post_data))
+        return {'uri': url, 'method': 'POST', 'headers': headers,
+                'body': json.dumps(post_data)}
 
     def clean_keys_of_slashes(self, record):
         """
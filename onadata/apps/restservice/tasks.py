@@ -1,6 +1,6 @@
 from celery import task
 
-from onadata.apps.restservice.utils import call_service
+from onadata.apps.restservice.utils import call_service, retry_deliveries
 
 
 @task()
@@ -16,3 +16,8 @@ def call_service_async(instance_pk):
         pass
     else:
         call_service(instance)
+
+
+@task(ignore_result=True)
+def retry_deliveries_async():
+    retry_deliveries()
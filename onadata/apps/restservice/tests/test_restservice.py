@@ -1,9 +1,10 @@
 import os
 import time
-from mock import patch
+from mock import MagicMock, patch
 
 from django.core.urlresolvers import reverse
 from django.test.utils import override_settings
+from django.utils import timezone
 
 from onadata.apps.main.views import show
 from onadata.apps.main.tests.test_base import TestBase
@@ -11,8 +12,9 @@ from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models import MetaData
 from onadata.apps.restservice.views import add_service, delete_service
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
-from onadata.apps.restservice.models import RestService
+from onadata.apps.restservice.models import PendingDelivery, RestService
 from onadata.apps.restservice.services.textit import ServiceDefinition
+from onadata.apps.restservice.utils import retry_deliveries
 
 
 class RestServiceTest(TestBase):
@@ -147,6 +149,81 @@ class RestServiceTest(TestBase):
         self.assertFalse(mock_http.called)
         self.assertEquals(mock_http.call_count, 0)
 
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch('httplib2.Http')
+    def test_failed_delivery_is_retried(self, mock_http):
+        RestService.objects.create(service_url='http://example.com/',
+                                   xform=self.xform, name='generic_json')
+        mock_http.return_value.request.return_value = (
+            MagicMock(status=500), '')
+        xml_submission = os.path.join(self.this_directory,
+                                      u'fixtures',
+                                      u'dhisform_submission1.xml')
+        self._make_submission(xml_submission)
+
+        failed = PendingDelivery.objects.get(
+            instance=self.xform.instances.last())
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.error, u'HTTP 500')
+        self.assertEqual(mock_http.return_value.request.call_count, 1)
+
+        # not due yet
+        retry_deliveries()
+        self.assertEqual(mock_http.return_value.request.call_count, 1)
+
+        PendingDelivery.objects.filter(pk=failed.pk).update(
+            next_attempt=timezone.now())
+        mock_http.return_value.request.return_value = (
+            MagicMock(status=200), '')
+        retry_deliveries()
+        self.assertEqual(mock_http.return_value.request.call_count, 2)
+        self.assertFalse(PendingDelivery.objects.filter(pk=failed.pk).exists())
+
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch('httplib2.Http')
+    def test_failed_retry_is_not_saved_once_deleted(self, mock_http):
+        RestService.objects.create(service_url='http://example.com/',
+                                   xform=self.xform, name='generic_json')
+        mock_http.return_value.request.return_value = (
+            MagicMock(status=500), '')
+        xml_submission = os.path.join(self.this_directory,
+                                      u'fixtures',
+                                      u'dhisform_submission1.xml')
+        self._make_submission(xml_submission)
+        failed = PendingDelivery.objects.get(
+            instance=self.xform.instances.last())
+        PendingDelivery.objects.filter(pk=failed.pk).update(
+            next_attempt=timezone.now())
+
+        def delete_pending(**kwargs):
+            # e.g. the rest service is deleted while the retry is sent
+            PendingDelivery.objects.filter(pk=failed.pk).delete()
+            return MagicMock(status=500), ''
+
+        mock_http.return_value.request.side_effect = delete_pending
+        retry_deliveries()
+        self.assertFalse(PendingDelivery.objects.filter(pk=failed.pk).exists())
+
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch('onadata.apps.viewer.models.parsed_instance.save_osm_data_async')
+    @patch.object(RestService, 'get_service_definition',
+                  side_effect=ImportError('No module named missing'))
+    def test_broken_service_is_a_failed_delivery(self, mock_definition,
+                                                 mock_save_osm_data):
+        RestService.objects.create(service_url='http://example.com/',
+                                   xform=self.xform, name='generic_json')
+        xml_submission = os.path.join(self.this_directory,
+                                      u'fixtures',
+                                      u'dhisform_submission1.xml')
+        self._make_submission(xml_submission)
+
+        failed = PendingDelivery.objects.get(
+            instance=self.xform.instances.last())
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn(u'ImportError', failed.error)
+        # the submission is still processed
+        mock_save_osm_data.assert_called_once_with(failed.instance_id)
+
     def test_clean_keys_of_slashes(self):
         service = ServiceDefinition()
 
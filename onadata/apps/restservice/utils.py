@@ -1,17 +1,290 @@
-from onadata.apps.restservice.models import RestService
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from multiprocessing.pool import ThreadPool
+from urlparse import urlparse
+
+import httplib2
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from onadata.apps.restservice.models import PendingDelivery, RestService
 from onadata.libs.utils.common_tags import GOOGLE_SHEET
 
+# the number of hosts that are sent to at the same time
+RESTSERVICE_WORKERS = getattr(settings, 'RESTSERVICE_WORKERS', 4)
+RESTSERVICE_TIMEOUT = getattr(settings, 'RESTSERVICE_TIMEOUT', 30)
+# the most requests per second sent to one service, None for no limit
+RESTSERVICE_RATE_LIMIT = getattr(settings, 'RESTSERVICE_RATE_LIMIT', None)
+# the number of submissions sent in one request to services that accept a
+# list of submissions e.g. generic_json
+RESTSERVICE_BATCH_SIZE = getattr(settings, 'RESTSERVICE_BATCH_SIZE', 1)
+RESTSERVICE_MAX_ATTEMPTS = getattr(settings, 'RESTSERVICE_MAX_ATTEMPTS', 8)
+# seconds before the first retry of a failed delivery, doubled on each retry
+RESTSERVICE_RETRY_DELAY = getattr(settings, 'RESTSERVICE_RETRY_DELAY', 60)
+RESTSERVICE_RETRY_LIMIT = 1000
+
+
+class Delivery(object):
+    """The submissions sent to a rest service in one request."""
+
+    def __init__(self, restservice, instances, request=None, service=None,
+                 error=None):
+        self.restservice = restservice
+        self.instances = instances
+        # the httplib2 request arguments, None for services that only
+        # implement send
+        self.request = request
+        self.service = service
+        self.error = error
+
+    @property
+    def host(self):
+        url = urlparse(self.request['uri'])
+
+        return url.scheme, url.netloc
+
+
+def _get_deliveries(restservice, instances):
+    """
+    Builds the requests that send `instances` to the rest service, the
+    submissions are read here so that the requests can be sent from other
+    threads.
+    """
+    url = restservice.service_url
+    try:
+        service = restservice.get_service_definition()()
+    except Exception as e:
+        # e.g. the module of the service can not be imported, the
+        # submissions are retried like those of a failed request
+        return [Delivery(restservice, instances, error=repr(e))]
+
+    batch_size = RESTSERVICE_BATCH_SIZE if service.supports_batch else 1
+    deliveries = []
+
+    for i in xrange(0, len(instances), batch_size):
+        batch = instances[i:i + batch_size]
+        try:
+            if batch_size > 1:
+                request = service.get_batch_request(url, batch)
+            else:
+                request = service.get_request(url, batch[0])
+        except NotImplementedError:
+            deliveries.append(Delivery(restservice, batch, service=service))
+        except Exception as e:
+            deliveries.append(Delivery(restservice, batch, error=repr(e)))
+        else:
+            deliveries.append(Delivery(restservice, batch, request=request))
+
+    return deliveries
+
+
+def _send_to_host(deliveries):
+    """
+    Sends the requests to one host one after the other over one connection,
+    no more than RESTSERVICE_RATE_LIMIT requests per second to a service.
+    """
+    http = httplib2.Http(timeout=RESTSERVICE_TIMEOUT)
+    last_sent = {}
+
+    for delivery in deliveries:
+        if RESTSERVICE_RATE_LIMIT:
+            wait = last_sent.get(delivery.restservice.pk, 0) + \
+                1.0 / RESTSERVICE_RATE_LIMIT - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            last_sent[delivery.restservice.pk] = time.time()
+
+        try:
+            resp, content = http.request(**delivery.request)
+        except Exception as e:
+            delivery.error = repr(e)
+        else:
+            if resp.status >= 400:
+                delivery.error = u"HTTP %s" % resp.status
+
+
+def _send_deliveries(deliveries):
+    """
+    Sends the deliveries, the requests to different hosts are sent at the
+    same time by up to RESTSERVICE_WORKERS threads.
+    """
+    hosts = defaultdict(list)
+
+    for delivery in deliveries:
+        if delivery.error:
+            continue
+        if delivery.request is None:
+            try:
+                delivery.service.send(delivery.restservice.service_url,
+                                      delivery.instances[0])
+            except Exception as e:
+                delivery.error = repr(e)
+        else:
+            hosts[delivery.host].append(delivery)
+
+    if len(hosts) > 1 and RESTSERVICE_WORKERS > 1:
+        pool = ThreadPool(min(len(hosts), RESTSERVICE_WORKERS))
+        try:
+            pool.map(_send_to_host, hosts.values())
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for host_deliveries in hosts.values():
+            _send_to_host(host_deliveries)
+
+
+def _get_retry_delay(attempts):
+    return RESTSERVICE_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def _save_failures(deliveries, pending=None):
+    """
+    Queues the submissions of failed deliveries for a retry with exponential
+    backoff, a submission is dropped after RESTSERVICE_MAX_ATTEMPTS attempts.
+
+    The `pending` deliveries that were retried are only updated while they
+    are still leased to this run, one that was deleted in the meantime e.g.
+    with its submission is not saved again.
+
+    Returns the number of seconds to the next retry, None if there is none.
+    """
+    pending = pending or {}
+    now = timezone.now()
+    next_retry = None
+
+    for delivery in deliveries:
+        if not delivery.error:
+            continue
+
+        for instance in delivery.instances:
+            key = (delivery.restservice.pk, instance.pk)
+            failed = pending.get(key) or PendingDelivery(
+                restservice=delivery.restservice, instance=instance)
+            failed.attempts += 1
+            failed.error = delivery.error
+
+            if failed.attempts >= RESTSERVICE_MAX_ATTEMPTS:
+                logging.error(
+                    u"Giving up sending submission %s to %s: %s" % (
+                        instance.pk, delivery.restservice.service_url,
+                        delivery.error))
+                if failed.pk:
+                    PendingDelivery.objects.filter(
+                        pk=failed.pk, next_attempt=failed.next_attempt
+                    ).delete()
+                continue
+
+            delay = _get_retry_delay(failed.attempts)
+            if failed.pk:
+                PendingDelivery.objects.filter(
+                    pk=failed.pk, next_attempt=failed.next_attempt
+                ).update(attempts=failed.attempts, error=failed.error,
+                         next_attempt=now + timedelta(seconds=delay))
+            else:
+                failed.next_attempt = now + timedelta(seconds=delay)
+                failed.save()
+            next_retry = delay if next_retry is None \
+                else min(next_retry, delay)
+
+    return next_retry
+
+
+def _schedule_retry(countdown):
+    from onadata.apps.restservice.tasks import retry_deliveries_async
+
+    retry_deliveries_async.apply_async(countdown=countdown)
+
+
+def call_services(submission_instances):
+    """
+    Sends new submissions of one form to the rest services of the form,
+    failed deliveries are retried later.
+    """
+    if not submission_instances:
+        return
 
-def call_service(submission_instance):
     # lookup service which is not google sheet service
     services = RestService.objects.filter(
-        xform_id=submission_instance.xform_id).exclude(name=GOOGLE_SHEET)
-    # call service send with url and data parameters
-    for sv in services:
-        # TODO: Queue service
-        try:
-            service = sv.get_service_definition()()
-            service.send(sv.service_url, submission_instance)
-        except:
-            # TODO: Handle gracefully | requeue/resend
-            pass
+        xform_id=submission_instances[0].xform_id).exclude(name=GOOGLE_SHEET)
+    deliveries = []
+
+    for restservice in services:
+        deliveries.extend(_get_deliveries(restservice, submission_instances))
+
+    if deliveries:
+        _send_deliveries(deliveries)
+        next_retry = _save_failures(deliveries)
+
+        if next_retry is not None:
+            _schedule_retry(next_retry)
+
+
+def call_service(submission_instance):
+    call_services([submission_instance])
+
+
+def retry_deliveries():
+    """
+    Sends the submissions whose delivery failed and are due for a retry.
+    """
+    now = timezone.now()
+    due = list(PendingDelivery.objects.filter(next_attempt__lte=now)
+               .order_by('next_attempt')
+               .values_list('pk', flat=True)[:RESTSERVICE_RETRY_LIMIT])
+
+    if not due:
+        return
+
+    # the deliveries are leased for as long as sending every one of them
+    # one after the other may take, other workers do not retry them
+    # meanwhile, those that are still due when claimed are retried here
+    seconds = len(due) * RESTSERVICE_TIMEOUT
+    if RESTSERVICE_RATE_LIMIT:
+        seconds += len(due) / float(RESTSERVICE_RATE_LIMIT)
+    lease = now + timedelta(seconds=seconds)
+    cursor = connection.cursor()
+    cursor.execute(
+        "UPDATE restservice_pendingdelivery SET next_attempt = %s "
+        "WHERE id = ANY(%s) AND next_attempt <= %s RETURNING id",
+        [lease, due, now])
+    claimed = PendingDelivery.objects.filter(
+        pk__in=[row[0] for row in cursor.fetchall()]
+    ).select_related('restservice__xform', 'instance__xform')
+    pending = {}
+    services = {}
+    instances = defaultdict(list)
+
+    for failed in claimed:
+        if failed.instance.deleted_at is not None:
+            failed.delete()
+            continue
+
+        pending[(failed.restservice_id, failed.instance_id)] = failed
+        services[failed.restservice_id] = failed.restservice
+        instances[failed.restservice_id].append(failed.instance)
+
+    deliveries = []
+    for restservice_id, restservice in services.items():
+        deliveries.extend(
+            _get_deliveries(restservice, instances[restservice_id]))
+
+    if not deliveries:
+        return
+
+    _send_deliveries(deliveries)
+
+    sent = [pending[(delivery.restservice.pk, instance.pk)].pk
+            for delivery in deliveries if not delivery.error
+            for instance in delivery.instances]
+    PendingDelivery.objects.filter(pk__in=sent, next_attempt=lease).delete()
+
+    next_retry = _save_failures(deliveries, pending)
+    if len(due) == RESTSERVICE_RETRY_LIMIT:
+        next_retry = 0
+
+    if next_retry is not None:
+        _schedule_retry(next_retry)
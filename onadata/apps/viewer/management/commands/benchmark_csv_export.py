@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+import copy
+import resource
+import time
+from collections import OrderedDict
+from itertools import chain
+from multiprocessing import Process, Queue
+from optparse import make_option
+from tempfile import NamedTemporaryFile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _, ugettext_lazy
+
+from onadata.apps.logger.models.xform import XForm
+from onadata.libs.utils.csv_builder import CSVDataFrameBuilder, write_to_csv
+
+DEFAULT_COUNTS = '100000,1000000'
+
+
+def synthetic_records(template, count):
+    """Yields `count` copies of the `template` submission."""
+    for i in xrange(1, count + 1):
+        record = copy.deepcopy(template)
+        record['_id'] = i
+        yield record
+
+
+def run_export(xform, template, count, streaming, queue):
+    builder = CSVDataFrameBuilder(xform.user.username, xform.id_string,
+                                  xform=xform, include_images=False)
+    builder.ordered_columns = OrderedDict()
+    builder._build_ordered_columns(builder.dd.survey, builder.ordered_columns)
+    start = time.time()
+
+    if streaming:
+        builder._add_select_multiple_and_gps_columns()
+        if builder._get_repeat_xpaths():
+            builder._discover_repeat_columns(
+                synthetic_records(template, count))
+        data = builder._iter_format_for_dataframe(
+            synthetic_records(template, count))
+    else:
+        data = builder._format_for_dataframe(
+            synthetic_records(template, count))
+
+    columns = list(chain.from_iterable(
+        [[xpath] if cols is None else cols
+         for xpath, cols in builder.ordered_columns.iteritems()]))
+    columns += builder.ADDITIONAL_COLUMNS
+
+    with NamedTemporaryFile(suffix='.csv') as temp_file:
+        write_to_csv(temp_file.name, data, columns)
+
+    queue.put((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               time.time() - start))
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy("Measure the peak memory of a CSV export of "
+                         "synthetic submissions copied from a form's latest "
+                         "submission")
+    args = '<xform_id>'
+    option_list = BaseCommand.option_list + (
+        make_option('-c', '--counts', default=DEFAULT_COUNTS,
+                    help=ugettext_lazy("Comma separated number of "
+                                       "submissions to export")),
+    )
+
+    def handle(self, *args, **kwargs):
+        if not args:
+            raise CommandError(_(u"Provide the form id"))
+        try:
+            xform = XForm.objects.get(pk=args[0])
+        except XForm.DoesNotExist:
+            raise CommandError(_(u"Form %s does not exist") % args[0])
+
+        instance = xform.instances.filter(deleted_at=None).last()
+        if instance is None:
+            raise CommandError(_(u"Form %s has no submissions") % args[0])
+
+        template = instance.json
+        counts = [int(c) for c in kwargs.get('counts').split(',')]
+
+        for count in counts:
+            for streaming in [False, True]:
+                # run each export in its own process so that peak memory
+                # of one run does not hide that of the next
+                queue = Queue()
+                process = Process(target=run_export,
+                                  args=(xform, template, count, streaming,
+                                        queue))
+                process.start()
+                max_rss, duration = queue.get()
+                process.join()
+                self.stdout.write(
+                    u"%(count)d submissions, %(mode)s: peak memory "
+                    u"%(rss).1f MB in %(duration).1fs" % {
+                        'count': count,
+                        'mode': 'streaming' if streaming else 'list',
+                        'rss': max_rss / 1024.0,
+                        'duration': duration})
@@ -13,6 +13,8 @@ from onadata.libs.utils.common_tags import OSM
 from onadata.libs.utils import async_status
 
 EXPORT_QUERY_KEY = 'query'
+# options key of the state an incremental export is updated from
+INCREMENTAL_EXPORT_KEY = 'incremental'
 
 
 def export_delete_callback(sender, **kwargs):
@@ -2,11 +2,14 @@ import datetime
 import json
 import six
 import types
+import uuid
 
 from dateutil import parser
 from django.conf import settings
+from django.db.models.sql.datastructures import EmptyResultSet
 from django.db import connection
 from django.db import models
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.utils.translation import ugettext as _
 from django.db.models.query import EmptyQuerySet
@@ -14,6 +17,8 @@ from django.db.models.query import EmptyQuerySet
 from onadata.apps.logger.models.note import Note
 from onadata.apps.logger.models.instance import _get_attachments_from_instance
 from onadata.apps.logger.models.instance import Instance
+from onadata.apps.logger.models.instance import \
+    is_submission_batching_enabled
 from onadata.apps.logger.models.xform import _encode_for_mongo
 
 from onadata.libs.models.sorting import (
@@ -23,8 +28,10 @@ from onadata.libs.utils.common_tags import ID, UUID, ATTACHMENTS, GEOLOCATION,\
     SUBMISSION_TIME, MONGO_STRFTIME, BAMBOO_DATASET_ID, DELETEDAT, TAGS,\
     NOTES, SUBMITTED_BY, VERSION, DURATION, EDITED
 from onadata.libs.utils.osm import save_osm_data_async
+from onadata.libs.utils.cache_tools import record_filter_fields
 from onadata.libs.utils.model_tools import queryset_iterator
 from onadata.libs.utils.mongo import _is_invalid_for_mongo
+from onadata.apps.viewer.parsed_instance_tools import get_query_fields
 from onadata.apps.viewer.parsed_instance_tools import get_where_clause
 from onadata.apps.viewer.parsed_instance_tools import NONE_JSON_FIELDS
 
@@ -77,10 +84,36 @@ def _parse_sort_fields(fields):
         yield NONE_JSON_FIELDS.get(field, field)
 
 
-def _query_iterator(sql, fields=None, params=[], count=False):
+def _named_cursor_rows(sql, params, batchsize=None):
+    """
+    Yields rows from a named (server-side) PostgreSQL cursor, fetching
+    `batchsize` rows at a time so that only one batch is held in memory.
+
+    Named cursors only live within a transaction hence the atomic block.
+    """
+    batchsize = batchsize or settings.PARSED_INSTANCE_DEFAULT_BATCHSIZE
+
+    with transaction.atomic():
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(
+            name=u'onadata_%s' % uuid.uuid4().hex)
+        cursor.itersize = batchsize
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batchsize)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+
+def _query_iterator(sql, fields=None, params=[], count=False, stream=False,
+                    batchsize=None):
     if not sql:
         raise ValueError(_(u"Bad SQL: %s" % sql))
-    cursor = connection.cursor()
     sql_params = fields + params if fields is not None else params
 
     if count:
@@ -88,17 +121,41 @@ def _query_iterator(sql, fields=None, params=[], count=False):
         # is less hacky
         sql = u"SELECT COUNT(*) FROM (" + sql + ") AS CQ"
         fields = [u'count']
+        stream = False
 
-    cursor.execute(sql, [unicode(i) for i in sql_params])
+    sql_params = [unicode(i) for i in sql_params]
+
+    if stream:
+        rows = _named_cursor_rows(sql, sql_params, batchsize)
+    else:
+        cursor = connection.cursor()
+        cursor.execute(sql, sql_params)
+        rows = cursor.fetchall()
 
     if fields is None:
-        for row in cursor.fetchall():
+        for row in rows:
             yield row[0]
     else:
-        for row in cursor.fetchall():
+        for row in rows:
             yield dict(zip(fields, row))
 
 
+def queryset_json_iterator(queryset, batchsize=None):
+    """
+    Returns a generator of the submission json of an Instance queryset that
+    is read through a server-side cursor in batches of `batchsize`.
+    """
+    if queryset.model is Instance:
+        queryset = queryset.values_list('json', flat=True)
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return (i for i in [])
+
+    return _query_iterator(sql, params=list(params), stream=True,
+                           batchsize=batchsize)
+
+
 def get_etag_hash_from_query(queryset, sql=None, params=None):
     """Returns md5 hash from the date_modified field or
     """
@@ -163,13 +220,53 @@ def _get_sort_fields(sort):
     return [i for i in _parse_sort_fields(sort)]
 
 
+def _model_order_by(sort_list):
+    order_by = []
+
+    for field in sort_list:
+        column = Instance._meta.get_field(field.lstrip('-')).column
+        order_by.append(
+            u"%s %s" % (column, u"DESC" if field.startswith('-') else u"ASC"))
+
+    return u"ORDER BY {}".format(u",".join(order_by))
+
+
+def _get_keyset_columns(keyset):
+    return [k.lstrip('-') for k in keyset]
+
+
+def _keyset_where(keyset):
+    columns = [Instance._meta.get_field(k.lstrip('-')).column for k in keyset]
+
+    return u"(%s) %s (%s)" % (
+        u",".join(columns), u"<" if keyset[0].startswith('-') else u">",
+        u",".join([u"%s" for i in columns]))
+
+
 def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
-                        end=None, start_index=None, limit=None, count=None):
+                        end=None, start_index=None, limit=None, count=None,
+                        keyset=None, after=None):
+    """
+    Returns the sql, params and queryset for the submissions of `xform`.
+
+    `keyset` is a list of Instance fields e.g. ['date_modified', 'id'] to
+    order and seek on, the records then continue after the key values in
+    `after` instead of skipping `start_index` rows and the keyset columns are
+    selected after each record.
+    """
     records = _get_instances(xform, start, end)
     params = []
+    sort_requested = sort is not None
     sort = _get_sort_fields(sort)
     sql = ""
 
+    if not count:
+        # counted for the indexes of the fields filtered on most
+        instance_fields = [f.name for f in Instance._meta.get_fields()]
+        record_filter_fields(xform.pk, get_query_fields(query) + [
+            s.lstrip('-') for s in sort
+            if s.lstrip('-') not in instance_fields])
+
     known_integers = [
         get_name_from_survey_element(e)
         for e in xform.get_survey_elements_of_type('integer')]
@@ -178,8 +275,18 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
     if fields and isinstance(fields, six.string_types):
         fields = json.loads(fields)
 
+    if keyset and not count:
+        sort = keyset
+        sort_requested = True
+        start_index = None
+        if after is not None:
+            where = where + [_keyset_where(keyset)]
+            where_params = where_params + list(after)
+
     if fields:
         field_list = [u"json->%s" for i in fields]
+        if keyset and not count:
+            field_list += _get_keyset_columns(keyset)
         sql = u"SELECT %s FROM logger_instance" % u",".join(field_list)
 
         sql_where = u""
@@ -191,7 +298,11 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
         params = [xform.pk] + where_params
     else:
 
-        records = records.values_list('json', flat=True)
+        if keyset and not count:
+            records = records.values_list(
+                'json', *_get_keyset_columns(keyset))
+        else:
+            records = records.values_list('json', flat=True)
         if where_params:
             records = records.extra(where=where, params=where_params)
 
@@ -205,6 +316,8 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
             sql = u"%s %s" % (sql, json_order_by(sort))
         elif not fields:
             records = records.order_by(*sort)
+        elif sort_requested:
+            sql = u"%s %s" % (sql, _model_order_by(sort))
 
     records, sql, params = _start_index_limit(
         records, sql, fields, params, sort, start_index, limit
@@ -213,23 +326,64 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
     return sql, params, records
 
 
+def _keyset_query_iterator(sql, fields, params, keyset):
+    """
+    Yields (record, key values) tuples, the key values are the trailing
+    columns selected in keyset mode.
+    """
+    cursor = connection.cursor()
+    sql_params = fields + params if fields else params
+    key_count = len(_get_keyset_columns(keyset))
+
+    cursor.execute(sql, [unicode(i) for i in sql_params])
+
+    for row in cursor.fetchall():
+        record, keys = row[:-key_count], row[-key_count:]
+        yield (dict(zip(fields, record)) if fields else record[0]), keys
+
+
 def query_data(xform, query=None, fields=None, sort=None, start=None,
-               end=None, start_index=None, limit=None, count=None):
+               end=None, start_index=None, limit=None, count=None,
+               stream=False, batchsize=None, keyset=None, after=None):
+    """
+    Returns the submissions of `xform` matching the given filters.
+
+    When `stream` is True, rows are read in batches of `batchsize` (defaults
+    to PARSED_INSTANCE_DEFAULT_BATCHSIZE) through a server-side cursor and a
+    generator is always returned, keeping memory usage flat regardless of the
+    number of submissions.
+
+    When `keyset` is set, a generator of (record, key values) tuples is
+    returned, see get_sql_with_params.
+    """
 
     sql, params, records = get_sql_with_params(
-        xform, query, fields, sort, start, end, start_index, limit, count
+        xform, query, fields, sort, start, end, start_index, limit, count,
+        keyset, after
     )
     if fields and isinstance(fields, six.string_types):
         fields = json.loads(fields)
+
+    if keyset and not count:
+        if not fields:
+            sql, params = records.query.sql_with_params()
+            params = list(params)
+
+        return _keyset_query_iterator(sql, fields, params, keyset)
+
     sort = _get_sort_fields(sort)
     if (ParsedInstance._has_json_fields(sort) or fields) and sql:
-        records = _query_iterator(sql, fields, params, count)
+        records = _query_iterator(sql, fields, params, count, stream=stream,
+                                  batchsize=batchsize)
 
     if count and isinstance(records, types.GeneratorType):
         return [i for i in records]
     elif count:
         return [{"count": records.count()}]
 
+    if stream and not isinstance(records, types.GeneratorType):
+        records = queryset_json_iterator(records, batchsize)
+
     return records
 
 
@@ -355,7 +509,8 @@ def post_save_submission(sender, **kwargs):
     parsed_instance = kwargs.get('instance')
     created = kwargs.get('created')
 
-    if created:
+    # batched submissions are sent to services with their batch
+    if created and not is_submission_batching_enabled():
         if ASYNC_POST_SUBMISSION_PROCESSING_ENABLED:
             call_service_async.apply_async(
                 args=[parsed_instance.instance_id],
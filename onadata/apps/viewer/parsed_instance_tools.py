@@ -94,3 +94,28 @@ def get_where_clause(query, form_integer_fields=[]):
         where_params = [query]
 
     return where, where_params
+
+
+def get_query_fields(query):
+    """
+    Returns the json fields a query, as taken by get_where_clause, filters
+    on.
+    """
+    try:
+        if isinstance(query, six.string_types):
+            query = json.loads(query)
+    except ValueError:
+        return []
+
+    if isinstance(query, list):
+        query = query[0] if query else None
+    if not isinstance(query, dict):
+        return []
+
+    fields = [key for key in query
+              if not key.startswith('$') and key not in NONE_JSON_FIELDS]
+    for item in query.get('$or') or []:
+        if isinstance(item, dict):
+            fields += item.keys()
+
+    return fields
@@ -360,6 +360,23 @@ def create_google_sheet_export(username, id_string, export_id, **options):
         return gen_export.id
 
 
+@task(ignore_result=True)
+def create_linked_dataset_csv_async(metadata_id, params):
+    from onadata.apps.main.models.meta_data import MetaData
+    from onadata.libs.utils.linked_dataset_tools import (
+        create_linked_dataset_csv, get_linked_dataset,
+        get_linked_dataset_options)
+
+    metadata = MetaData.objects.filter(pk=metadata_id).first()
+    xform, dataview, name = get_linked_dataset(
+        metadata.data_value if metadata else None)
+
+    if xform is not None:
+        create_linked_dataset_csv(
+            metadata, xform, dataview,
+            get_linked_dataset_options(xform, dataview, params))
+
+
 @task()
 def delete_export(export_id):
     try:
@@ -370,3 +387,12 @@ def delete_export(export_id):
         export.delete()
         return True
     return False
+
+
+@task()
+def get_export_chunk_rows(export_builder, ids, media_xpaths):
+    """
+    Returns the rows of a chunk of a partitioned export, for exports that
+    are built in a worker which can not start processes of its own.
+    """
+    return export_builder.get_chunk_rows(ids, media_xpaths)
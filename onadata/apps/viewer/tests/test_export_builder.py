@@ -1,3 +1,4 @@
+import copy
 import csv
 import datetime
 import os
@@ -9,6 +10,7 @@ import zipfile
 from collections import OrderedDict
 from django.conf import settings
 from django.core.files.temp import NamedTemporaryFile
+from mock import patch
 from openpyxl import load_workbook
 from pyxform.builder import create_survey_from_xls
 from savReaderWriter import SavReader
@@ -19,6 +21,7 @@ from onadata.apps.viewer.models.data_dictionary import DataDictionary
 from onadata.apps.viewer.models.parsed_instance import _encode_for_mongo
 from onadata.apps.viewer.tests.export_helpers import viewer_fixture_path
 from onadata.libs.utils.export_builder import dict_to_joined_export
+from onadata.libs.utils.export_builder import PartitionedRecords
 from onadata.libs.utils.export_tools import ExportBuilder, get_columns_with_hxl
 from onadata.libs.utils.csv_builder import CSVDataFrameBuilder
 from onadata.libs.utils.csv_builder import get_labels_from_columns
@@ -343,6 +346,49 @@ class TestExportBuilder(TestBase):
 
         shutil.rmtree(temp_dir)
 
+    def test_partitioned_rows_keep_global_numbering(self):
+        survey = self._create_childrens_survey()
+        export_builder = ExportBuilder()
+        export_builder.set_survey(survey)
+        data = [copy.deepcopy(self.data[0]) for i in range(5)]
+        data[2].pop('children')
+
+        rows = [(section['name'], row) for section, row in
+                export_builder.iter_rows(copy.deepcopy(data), [])]
+
+        records = PartitionedRecords([[0], [1, 2], [3, 4]], 1)
+        with patch.object(ExportBuilder, '_get_chunk_records',
+                          side_effect=lambda ids: [copy.deepcopy(data[i])
+                                                   for i in ids]):
+            partitioned_rows = [
+                (section['name'], row) for section, row in
+                export_builder.iter_rows(records, [])]
+
+        self.assertEqual(partitioned_rows, rows)
+        self.assertEqual(
+            [row['_index'] for name, row in rows
+             if name == 'children/cartoons'], range(1, 17))
+
+    def test_partitioned_rows_skip_missing_records(self):
+        survey = self._create_childrens_survey()
+        export_builder = ExportBuilder()
+        export_builder.set_survey(survey)
+        data = [copy.deepcopy(self.data[0]) for i in range(5)]
+
+        rows = [(section['name'], row) for section, row in
+                export_builder.iter_rows(copy.deepcopy(data[:4]), [])]
+
+        # the submission 1 was deleted once the ids were read
+        records = PartitionedRecords([[0, 1], [2], [3, 4]], 1)
+        with patch.object(ExportBuilder, '_get_chunk_records',
+                          side_effect=lambda ids: [copy.deepcopy(data[i])
+                                                   for i in ids if i != 1]):
+            partitioned_rows = [
+                (section['name'], row) for section, row in
+                export_builder.iter_rows(records, [])]
+
+        self.assertEqual(partitioned_rows, rows)
+
     def test_decode_mongo_encoded_section_names(self):
         data = {
             'main_section': [1, 2, 3, 4],
@@ -1,4 +1,7 @@
+import types
+
 from onadata.apps.viewer.models.parsed_instance import get_where_clause
+from onadata.apps.viewer.models.parsed_instance import query_data
 
 from onadata.apps.main.tests.test_base import TestBase
 
@@ -21,3 +24,28 @@ class TestParsedInstance(TestBase):
         where, where_params = get_where_clause(query)
         self.assertEqual(where, [u"json::text ~* cast(%s as text)"])
         self.assertEqual(where_params, [11])
+
+    def test_query_data_stream(self):
+        self._publish_transportation_form()
+        self._make_submissions()
+        instances = self.xform.instances.order_by('pk')
+
+        records = query_data(self.xform, stream=True, batchsize=1)
+        self.assertIsInstance(records, types.GeneratorType)
+        self.assertEqual(sorted([r['_id'] for r in records]),
+                         [i.pk for i in instances])
+
+        # json field sort and fields
+        records = query_data(self.xform, sort='{"_id": -1}',
+                             fields='["_id"]', stream=True, batchsize=2)
+        self.assertEqual([r['_id'] for r in records],
+                         [i.pk for i in instances.reverse()])
+
+        # start and limit
+        records = query_data(self.xform, start_index=1, limit=2,
+                             sort='{"_id": 1}', stream=True)
+        self.assertEqual([r['_id'] for r in records],
+                         [i.pk for i in instances[1:3]])
+
+        count = query_data(self.xform, stream=True, count=True)
+        self.assertEqual(count[0]['count'], instances.count())
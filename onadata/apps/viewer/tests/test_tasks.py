@@ -1,9 +1,11 @@
 from celery import current_app
 from django.conf import settings
+from mock import patch
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.viewer.models.export import Export
-from onadata.apps.viewer.tasks import create_async_export
+from onadata.apps.viewer.tasks import (
+    create_async_export, create_csv_zip_export, get_export_chunk_rows)
 
 
 class TestExportTasks(TestBase):
@@ -38,3 +40,26 @@ class TestExportTasks(TestBase):
             self.assertTrue(export.id)
             self.assertIn("username", options)
             self.assertEquals(options.get("id_string"), self.xform.id_string)
+
+    @patch('onadata.libs.utils.export_tools.EXPORT_PARTITION_SIZE', 1)
+    @patch('onadata.libs.utils.export_tools.EXPORT_PARTITION_PROCESSES', 2)
+    @patch('onadata.libs.utils.export_builder.current_process')
+    def test_partitioned_export_in_worker(self, mock_current_process):
+        # celery prefork workers are daemon processes
+        mock_current_process.return_value.daemon = True
+        self._publish_transportation_form()
+        self._make_submissions()
+        count = self.xform.instances.count()
+        export = Export.objects.create(
+            xform=self.xform, export_type=Export.CSV_ZIP_EXPORT)
+
+        with patch.object(get_export_chunk_rows, 'apply_async',
+                          wraps=get_export_chunk_rows.apply_async) as mock:
+            create_csv_zip_export.delay(
+                self.user.username, self.xform.id_string, export.id,
+                group_delimiter='/', split_select_multiples=True)
+
+        # a subtask per chunk of one submission
+        self.assertEqual(mock.call_count, count)
+        export = Export.objects.get(pk=export.pk)
+        self.assertEqual(export.internal_status, Export.SUCCESSFUL)
@@ -14,7 +14,7 @@ from django.core.files.storage import get_storage_class
 from django.core.urlresolvers import reverse
 from django.http import (
     HttpResponseForbidden, HttpResponseRedirect, HttpResponseNotFound,
-    HttpResponseBadRequest, HttpResponse
+    HttpResponseBadRequest, HttpResponse, StreamingHttpResponse
 )
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
@@ -22,7 +22,6 @@ from django.shortcuts import render
 from django.utils.translation import ugettext as _
 from django.views.decorators.http import require_POST
 from savReaderWriter import SPSSIOError
-from wsgiref.util import FileWrapper
 
 from onadata.apps.main.models import UserProfile, MetaData, TokenStorageModel
 from onadata.apps.logger.models import Attachment
@@ -39,12 +38,13 @@ from onadata.libs.utils.export_tools import (
     newest_export_for,
     str_to_bool)
 from onadata.libs.utils.image_tools import image_url
+from onadata.libs.utils.media_tools import get_file_response
 from onadata.libs.utils.google import google_flow
 from onadata.libs.utils.log import audit_log, Actions
 from onadata.libs.utils.logger_tools import response_with_mimetype_and_name,\
     generate_content_disposition_header
-from onadata.libs.utils.viewer_tools import create_attachments_zipfile,\
-    export_def_from_filename, get_form
+from onadata.libs.utils.viewer_tools import export_def_from_filename,\
+    get_form, iter_attachments_zip
 from onadata.libs.utils.user_auth import has_permission, get_xform_and_perms,\
     helper_auth_helper
 from xls_writer import XlsWriter
@@ -597,36 +597,29 @@ def zip_export(request, username, id_string):
         id_string = None
 
     attachments = Attachment.objects.filter(instance__xform=xform)
-    zip_file = None
-
-    try:
-        zip_file = create_attachments_zipfile(attachments)
-        audit = {
-            "xform": xform.id_string,
-            "export_type": Export.ZIP_EXPORT
-        }
-        audit_log(
-            Actions.EXPORT_CREATED, request.user, owner,
-            _("Created ZIP export on '%(id_string)s'.") %
-            {
-                'id_string': xform.id_string,
-            }, audit, request)
-        # log download as well
-        audit_log(
-            Actions.EXPORT_DOWNLOADED, request.user, owner,
-            _("Downloaded ZIP export on '%(id_string)s'.") %
-            {
-                'id_string': xform.id_string,
-            }, audit, request)
-        if request.GET.get('raw'):
-            id_string = None
+    audit = {
+        "xform": xform.id_string,
+        "export_type": Export.ZIP_EXPORT
+    }
+    audit_log(
+        Actions.EXPORT_CREATED, request.user, owner,
+        _("Created ZIP export on '%(id_string)s'.") %
+        {
+            'id_string': xform.id_string,
+        }, audit, request)
+    # log download as well
+    audit_log(
+        Actions.EXPORT_DOWNLOADED, request.user, owner,
+        _("Downloaded ZIP export on '%(id_string)s'.") %
+        {
+            'id_string': xform.id_string,
+        }, audit, request)
 
-        response = response_with_mimetype_and_name('zip', id_string)
-        response.write(FileWrapper(zip_file))
-        response['Content-Length'] = zip_file.tell()
-        zip_file.seek(0)
-    finally:
-        zip_file and zip_file.close()
+    # the zip is sent as it is written
+    response = StreamingHttpResponse(iter_attachments_zip(attachments),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = generate_content_disposition_header(
+        id_string, 'zip')
 
     return response
 
@@ -753,14 +746,15 @@ def attachment_url(request, size='medium'):
     attachment = result[0]
 
     if size == 'original' and no_redirect == 'true':
-        response = response_with_mimetype_and_name(
-            attachment.mimetype,
-            attachment.name,
-            extension=attachment.extension,
-            file_path=attachment.media_file.name
-        )
-
-        return response
+        try:
+            return get_file_response(
+                request, attachment.media_file.name,
+                attachment.mimetype,
+                content_disposition=generate_content_disposition_header(
+                    attachment.name, attachment.extension))
+        except (IOError, OSError):
+            return HttpResponseNotFound(
+                _(u"The requested file could not be found."))
     if not attachment.mimetype.startswith('image'):
         return redirect(attachment.media_file.url)
     try:
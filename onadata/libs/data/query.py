@@ -1,8 +1,19 @@
+import json
+from collections import Counter
+from datetime import datetime
+
 from django.conf import settings
-from django.db import connection
+from django.core.cache import cache
+from django.db import DataError, connection, transaction
+from django.db.models import Max, Sum
 
-from onadata.libs.utils.common_tags import SUBMISSION_TIME
+from onadata.libs.utils.cache_tools import XFORM_FIELD_COUNTS
+from onadata.libs.utils.common_tags import CHART_FIELDS, DELETEDAT, \
+    SUBMISSION_TIME
 from onadata.apps.logger.models.data_view import DataView
+from onadata.apps.logger.models.instance import \
+    ASYNC_POST_SUBMISSION_PROCESSING_ENABLED
+from onadata.apps.logger.models.field_count import FieldCount
 
 
 def _dictfetchall(cursor):
@@ -157,12 +168,281 @@ def get_field_records(field, xform):
     return [float(i[0]) for i in result if i[0] is not None]
 
 
+def _date_value_sql(value_sql):
+    return "to_char(to_date(%s, 'YYYY-MM-DD'), 'YYYY-MM-DD')" % value_sql
+
+
+def _get_counted_fields(xform):
+    """Returns the fields of the form whose value counts are kept."""
+    return [SUBMISSION_TIME] + [e.get_abbreviated_xpath()
+                                for e in xform.survey_elements
+                                if e.type in CHART_FIELDS]
+
+
+def _get_count_value(record, field, date_fields):
+    """
+    Returns the value of `field` in the submission json `record` the way
+    _postgres_count_group groups it.
+    """
+    value = record.get(field)
+
+    if value is None:
+        return None
+    if not isinstance(value, basestring):
+        value = json.dumps(value)
+    if field in date_fields:
+        try:
+            value = datetime.strptime(value[:10], '%Y-%m-%d')\
+                .strftime('%Y-%m-%d')
+        except ValueError:
+            value = value[:10]
+
+    return value
+
+
+def _field_counts_key(xform_id, name='state'):
+    return '{}{}-{}'.format(XFORM_FIELD_COUNTS, xform_id, name)
+
+
+def clear_field_counts(xform_id):
+    """Marks the value counts of the form as stale, a rebuild is queued when
+    they are next read."""
+    cache.delete(_field_counts_key(xform_id))
+
+
+def _build_field_counts(xform):
+    """
+    Counts the values of every counted field of the form, a field whose
+    values cannot be grouped e.g. an invalid date is left out.
+
+    Returns the state of the counts once the rebuild has committed, None
+    when a submission up to the last counted id committed after the rebuild
+    read the submissions, it is then counted by neither and the counts are
+    left to be rebuilt.
+    """
+    fields = _get_counted_fields(xform)
+    date_fields = get_date_fields(xform)
+    key = _field_counts_key(xform.pk)
+    last_id = xform.instances.aggregate(Max('id'))['id__max'] or 0
+    # the counts that increment_field_counts adds from now on are kept
+    last_count_id = FieldCount.objects.filter(xform=xform)\
+        .aggregate(Max('id'))['id__max'] or 0
+    building = {'last_id': last_id, 'fields': fields, 'building': True}
+
+    # submissions after last_id are counted by increment_field_counts from
+    # now on, the counts are only read once the state is published
+    cache.set(key, building, 60 * 60)
+
+    state = {'last_id': last_id, 'fields': list(fields)}
+    counted = None
+    isolate = not connection.in_atomic_block
+    try:
+        with transaction.atomic():
+            cursor = connection.cursor()
+            if isolate:
+                # every field is counted from the same snapshot
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            FieldCount.objects.filter(xform=xform,
+                                      id__lte=last_count_id).delete()
+
+            for field in fields:
+                value_sql = "json->>%s"
+                if field in date_fields:
+                    value_sql = _date_value_sql(value_sql)
+                sql = "INSERT INTO logger_fieldcount (xform_id, field, "\
+                    "value, count) SELECT %s, %s, " + value_sql + ", "\
+                    "COUNT(*) FROM logger_instance WHERE xform_id = %s AND "\
+                    "deleted_at IS NULL AND id <= %s GROUP BY 3 "\
+                    "RETURNING count"
+                try:
+                    with transaction.atomic():
+                        cursor.execute(
+                            sql, [xform.pk, field, field, xform.pk, last_id])
+                        if field == SUBMISSION_TIME:
+                            counted = sum(r[0] for r in cursor.fetchall())
+                except DataError:
+                    state['fields'] = [f for f in state['fields']
+                                       if f != field]
+    except Exception:
+        cache.delete(key)
+        raise
+
+    # ids are allocated before the submissions commit, one that was not
+    # committed when the rebuild read the submissions may be below last_id
+    if counted is not None and counted != xform.instances.filter(
+            id__lte=last_id, deleted_at__isnull=True).count():
+        cache.delete(key)
+        return None
+
+    # the counts were cleared while being built
+    if cache.get(key) != building:
+        return None
+
+    cache.set(key, state, None)
+
+    return state
+
+
+def build_field_counts(xform_id):
+    """Rebuilds the value counts of the form queued by _get_field_counts."""
+    from onadata.apps.logger.models.xform import XForm
+
+    try:
+        xform = XForm.objects.filter(pk=xform_id).first()
+        if xform:
+            _build_field_counts(xform)
+    finally:
+        cache.delete(_field_counts_key(xform_id, 'lock'))
+
+
+def _get_field_counts(xform, field, name):
+    """
+    Returns the number of submissions with each value of `field` from the
+    FieldCount store, None when the values of the field are not counted.
+
+    Counts that are missing are rebuilt by a task that is queued here, the
+    submissions are grouped by the query until they are published.
+    """
+    state = cache.get(_field_counts_key(xform.pk))
+
+    if state is None:
+        # only one rebuild of the form is queued at a time
+        if cache.add(_field_counts_key(xform.pk, 'lock'), True, 60 * 60):
+            from onadata.apps.logger.tasks import build_field_counts_async
+            build_field_counts_async.delay(xform.pk)
+        return None
+
+    if state.get('building') or field not in state['fields']:
+        return None
+
+    counts = FieldCount.objects.filter(xform=xform, field=field)\
+        .values('value').annotate(total=Sum('count')).filter(total__gt=0)
+
+    return [{name: c['value'], 'count': c['total']} for c in counts]
+
+
+def _add_field_counts(xform_id, counts):
+    """
+    Adds the Counter `counts` of (field, value) pairs, negative to take
+    submissions out, to the FieldCount store, one update per distinct value.
+    """
+    cursor = connection.cursor()
+    for (field, value), count in counts.iteritems():
+        if not count:
+            continue
+        cursor.execute(
+            "UPDATE logger_fieldcount SET count = count + %s WHERE id = ("
+            "SELECT id FROM logger_fieldcount WHERE xform_id = %s AND "
+            "field = %s AND value IS NOT DISTINCT FROM %s LIMIT 1)",
+            [count, xform_id, field, value])
+        if not cursor.rowcount:
+            FieldCount.objects.create(xform_id=xform_id, field=field,
+                                      value=value, count=count)
+
+
+def _count_values(counts, record, fields, date_fields, count=1):
+    for field in fields:
+        counts[(field, _get_count_value(record, field, date_fields))] += count
+
+
+def increment_field_counts(xform, instances):
+    """
+    Adds the values of the new submissions `instances` of the form to the
+    FieldCount store.
+    """
+    state = cache.get(_field_counts_key(xform.pk))
+
+    if state is None:
+        return
+
+    date_fields = get_date_fields(xform)
+    counts = Counter()
+    for instance in instances:
+        if instance.pk > state['last_id'] and instance.deleted_at is None:
+            _count_values(counts, instance.json, state['fields'],
+                          date_fields)
+
+    _add_field_counts(xform.pk, counts)
+
+
+def _get_counted_state(instance):
+    """
+    Returns the state of the value counts of the form of `instance` when
+    changes of the submission can be applied to them, clears the counts
+    when they can not and returns None.
+    """
+    state = cache.get(_field_counts_key(instance.xform_id))
+
+    if state is None:
+        return None
+
+    # a rebuild may have read the submission already, and new submissions
+    # are only counted once they are processed which may not have happened
+    # yet when it is deferred
+    if state.get('building') or (instance.pk > state['last_id'] and
+                                 ASYNC_POST_SUBMISSION_PROCESSING_ENABLED):
+        clear_field_counts(instance.xform_id)
+        return None
+
+    return state
+
+
+def update_field_counts(instance, previous_json):
+    """
+    Applies an update of a submission to the value counts of its form, the
+    values it had are taken out and the values it has are added, those of a
+    deleted submission are only taken out.
+    """
+    if not previous_json:
+        # the values it had are not known
+        clear_field_counts(instance.xform_id)
+        return
+
+    state = _get_counted_state(instance)
+
+    if state is None:
+        return
+
+    date_fields = get_date_fields(instance.xform)
+    counts = Counter()
+    if previous_json.get(DELETEDAT) is None:
+        _count_values(counts, previous_json, state['fields'], date_fields,
+                      -1)
+    if instance.deleted_at is None:
+        _count_values(counts, instance.json, state['fields'], date_fields)
+
+    _add_field_counts(instance.xform_id, counts)
+
+
+def remove_field_counts(instance):
+    """Takes the values of a submission being deleted out of the counts."""
+    if instance.deleted_at is not None:
+        return
+
+    state = _get_counted_state(instance)
+
+    if state is None:
+        return
+
+    counts = Counter()
+    _count_values(counts, instance.json, state['fields'],
+                  get_date_fields(instance.xform), -1)
+
+    _add_field_counts(instance.xform_id, counts)
+
+
 def get_form_submissions_grouped_by_field(xform, field, name=None,
                                           data_view=None):
     """Number of submissions grouped by field"""
     if not name:
         name = field
 
+    if data_view is None:
+        counts = _get_field_counts(xform, field, name)
+        if counts is not None:
+            return counts
+
     return _execute_query(_postgres_count_group(field, name, xform, data_view))
 
 
@@ -1,6 +1,21 @@
 import numpy as np
+from django.core.cache import cache
+from django.db import DataError, connection, transaction
+
 from onadata.apps.api.tools import DECIMAL_PRECISION
 from onadata.libs.data.query import get_field_records, get_numeric_fields
+from onadata.libs.utils.cache_tools import (
+    XFORM_STATS_CACHE, XFORM_STATS_CACHE_TIMEOUT, get_xform_data_version)
+
+# the aggregates computed for each numeric field in one query
+SQL_STATS = [
+    ('count', u"COUNT({})"),
+    ('min', u"MIN({})"),
+    ('max', u"MAX({})"),
+    ('mean', u"AVG({})"),
+    ('median', u"percentile_cont(0.5) WITHIN GROUP (ORDER BY {})"),
+    ('mode', u"mode() WITHIN GROUP (ORDER BY {})"),
+]
 
 
 def _chk_asarray(a, axis):
@@ -41,67 +56,161 @@ def get_mode(values, axis=0):
     return mostfrequent, oldcounts
 
 
+# the result, or error, of each statistic when a field has no values
+EMPTY_STATS = {
+    'min': lambda: np.min([]),
+    'max': lambda: np.max([]),
+    'mean': lambda: np.mean([]),
+    'median': lambda: np.median([]),
+    'mode': lambda: get_mode(np.array([]))[0],
+}
+
+
+def _get_sql_stats(xform, fields):
+    """
+    Returns the statistics of the numeric `fields` of the form computed by
+    Postgres in a single pass over the submissions.
+    """
+    value = u"CAST(json->>%s AS DOUBLE PRECISION)"
+    selects = [sql.format(value) for field in fields
+               for name, sql in SQL_STATS]
+    params = [field for field in fields for name, sql in SQL_STATS]
+    sql = u"SELECT {} FROM logger_instance WHERE xform_id = %s AND "\
+        u"deleted_at IS NULL".format(u", ".join(selects))
+
+    cursor = connection.cursor()
+    cursor.execute(sql, params + [xform.pk])
+    row = cursor.fetchone()
+    size = len(SQL_STATS)
+
+    return {
+        field: dict(zip([name for name, sql in SQL_STATS],
+                        row[i * size:(i + 1) * size]))
+        for i, field in enumerate(fields)}
+
+
+def _get_numpy_stats(xform, fields):
+    """Returns the statistics of `fields` reading each field only once."""
+    data = {}
+    for field in fields:
+        a = np.array(get_field_records(field, xform))
+        data[field] = {'count': len(a)}
+        if len(a):
+            data[field].update({
+                'min': np.min(a),
+                'max': np.max(a),
+                'mean': np.mean(a),
+                'median': np.median(a),
+                'mode': get_mode(a)[0][0],
+            })
+
+    return data
+
+
+def _get_stats(xform, fields):
+    try:
+        # a savepoint so that the transaction is usable after an error
+        with transaction.atomic():
+            return _get_sql_stats(xform, fields)
+    except DataError:
+        # a value is not a number, numpy raises a ValueError for it
+        return _get_numpy_stats(xform, fields)
+
+
+def get_field_stats(xform, field=None):
+    """
+    Returns a dict of the count, min, max, mean, median and mode by field of
+    the numeric fields of the form, cached per form data version.
+    """
+    fields = get_numeric_fields(xform)
+    key = '{}{}-{}'.format(XFORM_STATS_CACHE, xform.pk,
+                           get_xform_data_version(xform.pk))
+    data = cache.get(key)
+
+    if data is None or sorted(data) != sorted(fields):
+        data = _get_stats(xform, fields) if fields else {}
+        cache.set(key, data, XFORM_STATS_CACHE_TIMEOUT)
+
+    if field and field not in data:
+        return _get_numpy_stats(xform, [field])
+
+    return data
+
+
+def _get_stat(data, field, name):
+    if not data[field]['count']:
+        return EMPTY_STATS[name]()
+
+    return data[field][name]
+
+
 def get_median_for_field(field, xform):
-    return np.median(get_field_records(field, xform))
+    return _get_stat(get_field_stats(xform, field), field, 'median')
 
 
 def get_median_for_numeric_fields_in_form(xform, field=None):
     data = {}
+    stats = get_field_stats(xform, field)
     for field_name in [field] if field else get_numeric_fields(xform):
-        median = get_median_for_field(field_name, xform)
+        median = _get_stat(stats, field_name, 'median')
         data.update({field_name: median})
     return data
 
 
 def get_mean_for_field(field, xform):
-    return np.mean(get_field_records(field, xform))
+    return _get_stat(get_field_stats(xform, field), field, 'mean')
 
 
 def get_mean_for_numeric_fields_in_form(xform, field):
     data = {}
+    stats = get_field_stats(xform, field)
     for field_name in [field] if field else get_numeric_fields(xform):
-        mean = get_mean_for_field(field_name, xform)
+        mean = _get_stat(stats, field_name, 'mean')
         data.update({field_name: round(mean, DECIMAL_PRECISION)})
     return data
 
 
 def get_mode_for_field(field, xform):
-    a = np.array(get_field_records(field, xform))
-    m, count = get_mode(a)
-    return m
+    return _get_stat(get_field_stats(xform, field), field, 'mode')
 
 
 def get_mode_for_numeric_fields_in_form(xform, field=None):
     data = {}
+    stats = get_field_stats(xform, field)
     for field_name in [field] if field else get_numeric_fields(xform):
-        mode = get_mode_for_field(field_name, xform)
+        mode = _get_stat(stats, field_name, 'mode')
         data.update({field_name: round(mode, DECIMAL_PRECISION)})
     return data
 
 
-def get_min_max_range_for_field(field, xform):
-    a = np.array(get_field_records(field, xform))
-    _max = np.max(a)
-    _min = np.min(a)
+def _get_min_max_range(stats, field):
+    _max = _get_stat(stats, field, 'max')
+    _min = _get_stat(stats, field, 'min')
     _range = _max - _min
     return _min, _max, _range
 
 
+def get_min_max_range_for_field(field, xform):
+    return _get_min_max_range(get_field_stats(xform, field), field)
+
+
 def get_min_max_range(xform, field=None):
     data = {}
+    stats = get_field_stats(xform, field)
     for field_name in [field] if field else get_numeric_fields(xform):
-        _min, _max, _range = get_min_max_range_for_field(field_name, xform)
+        _min, _max, _range = _get_min_max_range(stats, field_name)
         data[field_name] = {'max': _max, 'min': _min, 'range': _range}
     return data
 
 
 def get_all_stats(xform, field=None):
     data = {}
+    stats = get_field_stats(xform, field)
     for field_name in [field] if field else get_numeric_fields(xform):
-        _min, _max, _range = get_min_max_range_for_field(field_name, xform)
-        mode = get_mode_for_field(field_name, xform)
-        mean = get_mean_for_field(field_name, xform)
-        median = get_median_for_field(field_name, xform)
+        _min, _max, _range = _get_min_max_range(stats, field_name)
+        mode = _get_stat(stats, field_name, 'mode')
+        mean = _get_stat(stats, field_name, 'mean')
+        median = _get_stat(stats, field_name, 'median')
         data[field_name] = {
             'mean': round(mean, DECIMAL_PRECISION),
             'median': median,
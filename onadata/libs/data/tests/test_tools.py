@@ -2,12 +2,14 @@ from datetime import datetime, timedelta
 from django.utils.timezone import utc
 import os
 
+from django.core.cache import cache
 from mock import patch
 
+from onadata.apps.logger.models.field_count import FieldCount
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.libs.data.query import get_form_submissions_grouped_by_field,\
-    get_date_fields, get_field_records
+    get_date_fields, get_field_records, _field_counts_key
 
 
 class TestTools(TestBase):
@@ -59,6 +61,81 @@ class TestTools(TestBase):
             self.assertEqual(result[field], str(now.date()))
             self.assertEqual(result[count_key], count)
 
+    @patch('django.utils.timezone.now')
+    def test_get_form_submissions_grouped_by_field_counts(self, mock_time):
+        mock_time.return_value = datetime.utcnow().replace(tzinfo=utc)
+        field = '_submission_time'
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at)
+
+        result = get_form_submissions_grouped_by_field(self.xform, field)
+        self.assertEqual(result[0]['count'], 3)
+        self.assertTrue(
+            FieldCount.objects.filter(xform=self.xform, field=field).exists())
+
+        # a new submission is added to the counts
+        self._submit_transport_instance(3)
+        result = get_form_submissions_grouped_by_field(self.xform, field)
+        self.assertEqual(result[0]['count'], 4)
+
+        # a deleted submission is taken out of the counts
+        self.xform.instances.last().set_deleted()
+        result = get_form_submissions_grouped_by_field(self.xform, field)
+        self.assertEqual(result[0]['count'], 3)
+
+    @patch('django.utils.timezone.now')
+    def test_field_counts_follow_edits_and_deletes(self, mock_time):
+        mock_time.return_value = datetime.utcnow().replace(tzinfo=utc)
+        field = '_submission_time'
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at)
+        today = str(mock_time.return_value.date())
+        get_form_submissions_grouped_by_field(self.xform, field)
+        state = cache.get(_field_counts_key(self.xform.pk))
+
+        with patch('onadata.apps.logger.tasks.build_field_counts_async')\
+                as mock_build:
+            # an edit moves the submission from its old value to its new one
+            instance = self.xform.instances.order_by('pk').first()
+            instance.date_created = datetime(2014, 1, 1, tzinfo=utc)
+            instance.save()
+            result = get_form_submissions_grouped_by_field(self.xform, field)
+            self.assertEqual(dict((r[field], r['count']) for r in result),
+                             {today: 2, '2014-01-01': 1})
+
+            # a deleted submission is taken out
+            self.xform.instances.order_by('pk').last().delete()
+            result = get_form_submissions_grouped_by_field(self.xform, field)
+            self.assertEqual(dict((r[field], r['count']) for r in result),
+                             {today: 1, '2014-01-01': 1})
+
+            # the counts were kept up to date, not rebuilt
+            self.assertFalse(mock_build.delay.called)
+            self.assertEqual(cache.get(_field_counts_key(self.xform.pk)),
+                             state)
+
+    @patch('django.utils.timezone.now')
+    def test_field_counts_are_not_read_while_built(self, mock_time):
+        mock_time.return_value = datetime.utcnow().replace(tzinfo=utc)
+        field = '_submission_time'
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at)
+
+        # counts that are being built are not read, the submissions are
+        # grouped by the query instead
+        cache.set(_field_counts_key(self.xform.pk),
+                  {'last_id': 0, 'fields': [field], 'building': True})
+        result = get_form_submissions_grouped_by_field(self.xform, field)
+        self.assertEqual(result[0]['count'], 3)
+        self.assertFalse(
+            FieldCount.objects.filter(xform=self.xform, field=field).exists())
+
+        cache.delete(_field_counts_key(self.xform.pk))
+        result = get_form_submissions_grouped_by_field(self.xform, field)
+        self.assertEqual(result[0]['count'], 3)
+        self.assertNotIn('building', cache.get(
+            _field_counts_key(self.xform.pk)))
+
     @patch('django.utils.timezone.now')
     def test_get_form_submissions_two_xforms(self, mock_time):
         mock_time.return_value = datetime.utcnow().replace(tzinfo=utc)
@@ -5,10 +5,13 @@ CACHE_MIXIN_SECONDS = 60
 
 
 class CacheControlMixin(object):
+    # streamed responses e.g. exports are not cached unless this is set
+    cache_streaming_responses = False
 
     def finalize_response(self, request, response, *args, **kwargs):
-        if request.method == 'GET' and not response.streaming and \
-                response.status_code in [200, 201, 202]:
+        if request.method == 'GET' and \
+                (not response.streaming or self.cache_streaming_responses) \
+                and response.status_code in [200, 201, 202, 206]:
             max_age = CACHE_MIXIN_SECONDS
 
             if hasattr(settings, 'CACHE_MIXIN_SECONDS'):
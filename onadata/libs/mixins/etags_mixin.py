@@ -1,5 +1,10 @@
 from hashlib import md5
 
+from rest_framework import status
+
+from onadata.libs.utils.cache_tools import get_xform_data_version
+from onadata.libs.utils.media_tools import etag_matches
+
 MODELS_WITH_DATE_MODIFIED = ('XForm', 'Instance', 'Project', 'Attachment',
                              'MetaData', 'Note', 'OrganizationProfile',
                              'UserProfile', 'Team')
@@ -19,8 +24,31 @@ class ETagsMixin(object):
         if etag_hash:
             self.headers.update({'ETag': etag_hash})
 
+    def get_data_etag_hash(self, xform):
+        """
+        Returns an etag for the submissions of `xform` in this request, built
+        from the form's data version instead of the submissions themselves.
+        """
+        request = self.request
+
+        return md5(u'{}-{}-{}-{}-{}-{}'.format(
+            xform.pk, get_xform_data_version(xform.pk), xform.date_modified,
+            request.user.pk, request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', u'')
+        ).encode('utf-8')).hexdigest()
+
+    def is_not_modified(self, request, etag_hash):
+        """
+        Returns True when the If-None-Match header of the request matches
+        `etag_hash`.
+        """
+        return etag_matches(request, etag_hash)
+
     def finalize_response(self, request, response, *args, **kwargs):
-        if request.method == 'GET' and not response.streaming and \
+        if request.method == 'GET' and \
+                response.status_code == status.HTTP_304_NOT_MODIFIED:
+            self.set_etag_header(None, getattr(self, 'etag_hash', None))
+        elif request.method == 'GET' and not response.streaming and \
                 response.status_code in [200, 201, 202]:
             etag_value = None
             if hasattr(self, 'etag_data') and self.etag_data:
@@ -1,7 +1,170 @@
+import base64
+import json
+
+from django.utils.translation import ugettext as _
+from rest_framework.exceptions import ParseError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from onadata.libs.models.sorting import sort_from_mongo_sort_str
 
 
 class StandardPageNumberPagination(PageNumberPagination):
     page_size = 1000
     page_size_query_param = 'page_size'
     max_page_size = 10000
+
+
+class KeysetPagination(object):
+    """
+    Opt-in keyset (seek) pagination.
+
+    The first page is requested with ``keyset=id`` or ``keyset=date_modified``
+    (prefix with ``-`` for descending order), the ``Link`` header of each page
+    points to the next page through an opaque ``cursor`` that holds the key of
+    the last record returned. Pages are fetched with a ``WHERE (key) > (last)``
+    condition instead of ``OFFSET`` so every page costs the same.
+
+    The order can also be given with ``sort`` on the keyed columns e.g.
+    ``sort={"_id": -1}`` or ``sort={"date_modified": 1}``, all in the same
+    direction.
+    """
+    cursor_query_param = 'cursor'
+    keyset_query_param = 'keyset'
+    page_size = StandardPageNumberPagination.page_size
+    page_size_query_param = StandardPageNumberPagination.page_size_query_param
+    max_page_size = StandardPageNumberPagination.max_page_size
+    keysets = {
+        'id': ['id'],
+        'date_modified': ['date_modified', 'id'],
+    }
+    # the sort fields of the keyed columns
+    sort_fields = {
+        '_id': 'id',
+        'id': 'id',
+        '_date_modified': 'date_modified',
+        'date_modified': 'date_modified',
+    }
+
+    def is_requested(self, request):
+        return self.cursor_query_param in request.query_params or \
+            self.keyset_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(
+                request.query_params.get(self.page_size_query_param))
+        except (TypeError, ValueError):
+            return self.page_size
+
+        if page_size < 1:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_sort_keyset(self, sort):
+        """
+        Returns the keyset `sort` orders by, raises ParseError when it sorts
+        on other columns or in more than one direction.
+        """
+        try:
+            fields = sort_from_mongo_sort_str(sort)
+        except (TypeError, ValueError):
+            raise ParseError(_(u"Invalid sort %(sort)s" % {'sort': sort}))
+
+        columns = []
+        for field in fields:
+            column = self.sort_fields.get(field.lstrip('-'))
+            if column is None:
+                raise ParseError(
+                    _(u"Keyset pagination can only sort on %(fields)s" % {
+                        'fields': u", ".join(sorted(self.sort_fields))}))
+            if column not in columns:
+                columns.append(column)
+
+        descending = set(field.startswith('-') for field in fields)
+        if len(descending) > 1:
+            raise ParseError(_(u"Keyset pagination sorts all fields in the "
+                               u"same direction"))
+
+        for key, keyset in self.keysets.items():
+            if columns in [keyset, keyset[:1]]:
+                return u'-' + key if True in descending else key
+
+        raise ParseError(_(u"Keyset pagination can only sort on %(keys)s" % {
+            'keys': u", ".join(sorted(self.keysets))}))
+
+    def get_keyset(self, request, sort=None):
+        """
+        Returns the list of key columns and the key values of the last record
+        of the previous page, the values are None for the first page.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        if cursor:
+            return self.decode_cursor(cursor)
+
+        key = request.query_params.get(self.keyset_query_param)
+        if sort:
+            sort_key = self.get_sort_keyset(sort)
+            if key and key != sort_key:
+                raise ParseError(_(u"The keyset %(key)s does not match the "
+                                   u"sort %(sort)s" % {'key': key,
+                                                       'sort': sort}))
+            key = sort_key
+
+        key = key or 'id'
+        descending = key.startswith('-')
+        columns = self.keysets.get(key.lstrip('-'))
+
+        if columns is None:
+            raise ParseError(_(u"Invalid keyset %(key)s, use one of %(keys)s"
+                               % {'key': key,
+                                  'keys': u", ".join(sorted(self.keysets))}))
+
+        return [u'-' + c if descending else c for c in columns], None
+
+    def encode_cursor(self, keyset, values):
+        values = [v.isoformat() if hasattr(v, 'isoformat') else v
+                  for v in values]
+
+        return base64.urlsafe_b64encode(
+            json.dumps({'k': keyset, 'v': values}))
+
+    def decode_cursor(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(str(cursor)))
+            keyset, values = data['k'], data['v']
+        except (TypeError, ValueError, KeyError):
+            raise ParseError(_(u"Invalid cursor"))
+
+        if keyset not in [[p + c for c in columns]
+                          for columns in self.keysets.values()
+                          for p in [u'', u'-']] or \
+                not isinstance(values, list) or \
+                len(values) != len(keyset):
+            raise ParseError(_(u"Invalid cursor"))
+
+        return keyset, values
+
+    def get_next_link(self, request, keyset, values):
+        url = request.build_absolute_uri()
+        url = remove_query_param(url, self.keyset_query_param)
+
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(keyset, values))
+
+    def paginate_records(self, request, records, keyset, page_size):
+        """
+        Splits the (record, key values) pairs of a page fetched with one extra
+        record into the page records and the next page link.
+        """
+        records = list(records)
+        next_link = None
+
+        if len(records) > page_size:
+            records = records[:page_size]
+            next_link = self.get_next_link(
+                request, keyset, list(records[-1][1]))
+
+        return [record for record, keys in records], next_link
@@ -3,11 +3,21 @@ import six
 
 from collections import defaultdict
 
+from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.utils.encoding import force_text
+from guardian.backends import check_user_support
+from guardian.core import ObjectPermissionChecker
 from guardian.shortcuts import (
-    assign_perm,
     remove_perm,
     get_perms,
     get_users_with_perms)
+from guardian.utils import (
+    get_group_obj_perms_model,
+    get_identity,
+    get_user_obj_perms_model)
 
 
 from onadata.apps.api.models import OrganizationProfile
@@ -15,6 +25,14 @@ from onadata.apps.main.models.user_profile import UserProfile
 from onadata.apps.logger.models import Project
 from onadata.apps.logger.models import XForm
 from onadata.libs.exceptions import NoRecordsPermission
+from onadata.libs.utils.cache_tools import (
+    USER_OBJ_PERMS_CACHE,
+    USER_OBJ_PERMS_CACHE_TIMEOUT,
+    bump_obj_perms_version,
+    bump_xform_data_version,
+    bump_xform_list_versions,
+    get_perms_versions,
+    perms_changes)
 
 # Userprofile Permissions
 CAN_ADD_USERPROFILE = 'add_userprofile'
@@ -62,6 +80,192 @@ CAN_CHANGE_DATADICTIONARY = 'change_datadictionary'
 CAN_DELETE_DATADICTIONARY = 'delete_datadictionary'
 
 
+def assign_roles(obj, roles):
+    """
+    Gives each user or team the role on `obj` in `roles`, a dict of user or
+    team to Role class, all keys are either users or teams.
+
+    The current permissions on `obj` are compared with the ones of the roles,
+    the permissions outside the roles are removed with one delete and the
+    missing ones added with one bulk insert.
+    """
+    if not roles:
+        return
+
+    user, group = get_identity(next(iter(roles)))
+    if group is None:
+        model, field = get_user_obj_perms_model(obj), 'user'
+    else:
+        model, field = get_group_obj_perms_model(obj), 'group'
+
+    content_type = ContentType.objects.get_for_model(obj)
+    if model.objects.is_generic():
+        obj_kwargs = {'content_type': content_type,
+                      'object_pk': force_text(obj.pk)}
+    else:
+        obj_kwargs = {'content_object': obj}
+
+    wanted = dict(
+        (identity.pk, set(role.class_to_permissions[type(obj)]))
+        for identity, role in roles.items())
+    current = defaultdict(set)
+    removed = []
+    obj_perms = model.objects\
+        .filter(**dict(obj_kwargs, **{field + '__in': list(roles)}))\
+        .values_list('pk', field + '_id', 'permission__codename')
+
+    changed = set()
+
+    for pk, identity_id, codename in obj_perms:
+        if codename in wanted[identity_id]:
+            current[identity_id].add(codename)
+        else:
+            removed.append(pk)
+            changed.add(identity_id)
+
+    if removed:
+        model.objects.filter(pk__in=removed).delete()
+
+    added = [(identity, codename) for identity in roles
+             for codename in wanted[identity.pk] - current[identity.pk]]
+
+    if added:
+        permissions = dict(
+            (p.codename, p) for p in Permission.objects.filter(
+                content_type=content_type,
+                codename__in=set(codename for i, codename in added)))
+        model.objects.bulk_create([
+            model(permission=permissions[codename],
+                  **dict(obj_kwargs, **{field: identity}))
+            for identity, codename in added])
+
+    if removed or added:
+        bump_obj_perms_version(content_type.pk, obj.pk)
+
+    if isinstance(obj, XForm):
+        # the submissions a user can see depend on the role
+        bump_xform_data_version(obj.pk)
+
+        # the forms listed to the users or teams whose role changed
+        changed.update(identity.pk for identity, codename in added)
+        if group is None:
+            bump_xform_list_versions(changed)
+        elif changed:
+            bump_xform_list_versions(User.groups.through.objects.filter(
+                group_id__in=changed).values_list('user_id', flat=True))
+
+
+class CachedObjectPermissionChecker(ObjectPermissionChecker):
+    """
+    A guardian ObjectPermissionChecker for a user that also keeps the
+    permissions it reads in the cache.
+
+    The cached permissions are versioned per object and per user, the
+    versions change when a permission on the object or the teams of the
+    user change.
+    """
+
+    def __init__(self, user_or_group=None):
+        super(CachedObjectPermissionChecker, self).__init__(user_or_group)
+        self._perms_changes = perms_changes.count
+
+    def _get_cache_key(self, local_key, obj_version, user_version):
+        return '{}{}-{}-{}-{}-{}'.format(
+            USER_OBJ_PERMS_CACHE, self.user.pk, local_key[0], local_key[1],
+            obj_version, user_version)
+
+    def _check_perms_changes(self):
+        if perms_changes.count != self._perms_changes:
+            # permissions were changed by this process since they were read
+            self._obj_perms_cache = {}
+            self._perms_changes = perms_changes.count
+
+    def get_perms(self, obj):
+        self._check_perms_changes()
+
+        if self.get_local_cache_key(obj) not in self._obj_perms_cache:
+            self.prefetch_perms([obj])
+
+        return super(CachedObjectPermissionChecker, self).get_perms(obj)
+
+    def prefetch_perms(self, objects):
+        """
+        Reads the permissions on `objects`, all of the same model, that are
+        not in the cache in one query for user permissions and one for team
+        permissions.
+        """
+        self._check_perms_changes()
+
+        if self.user is None or not self.user.is_active or \
+                self.user.is_superuser:
+            return super(CachedObjectPermissionChecker, self)\
+                .prefetch_perms(objects)
+
+        objects = dict((self.get_local_cache_key(obj), obj)
+                       for obj in objects)
+        local_keys = [key for key in objects
+                      if key not in self._obj_perms_cache]
+        if not local_keys:
+            return True
+
+        user_version, obj_versions = get_perms_versions(self.user.pk,
+                                                        local_keys)
+        cache_keys = dict(
+            (local_key, self._get_cache_key(local_key, obj_version,
+                                            user_version))
+            for local_key, obj_version in zip(local_keys, obj_versions))
+        cached = cache.get_many(cache_keys.values())
+        missing = []
+
+        for local_key in local_keys:
+            if cache_keys[local_key] in cached:
+                self._obj_perms_cache[local_key] = \
+                    cached[cache_keys[local_key]]
+            else:
+                # objects without permissions are not set by guardian
+                self._obj_perms_cache[local_key] = []
+                missing.append(local_key)
+
+        if missing:
+            super(CachedObjectPermissionChecker, self)\
+                .prefetch_perms([objects[key] for key in missing])
+            cache.set_many(
+                dict((cache_keys[key], self._obj_perms_cache[key])
+                     for key in missing), USER_OBJ_PERMS_CACHE_TIMEOUT)
+
+        return True
+
+
+def get_perms_checker(user):
+    """
+    Returns the permission checker kept on the `user` object, the permissions
+    it reads are reused for as long as the object lives e.g. for a request.
+
+    Returns None when guardian does not check permissions of the user.
+    """
+    checker = getattr(user, '_perms_checker', None)
+
+    if checker is None:
+        supported, identity = check_user_support(user)
+        checker = CachedObjectPermissionChecker(identity) if supported \
+            else False
+        user._perms_checker = checker
+
+    return checker or None
+
+
+def prefetch_perms(user, objects):
+    """
+    Reads the permissions of `user` on `objects`, all of the same model, at
+    once so that checking them one by one does not run a query each.
+    """
+    checker = get_perms_checker(user)
+    objects = list(objects)
+
+    if checker and objects:
+        checker.prefetch_perms(objects)
+
+
 class Role(object):
     class_to_permissions = None
     permissions = None
@@ -74,10 +278,12 @@ class Role(object):
 
     @classmethod
     def add(cls, user, obj):
-        cls._remove_obj_permissions(user, obj)
-        for codename, klass in cls.permissions:
-            if type(obj) == klass:
-                assign_perm(codename, user, obj)
+        cls.bulk_add([user], obj)
+
+    @classmethod
+    def bulk_add(cls, users, obj):
+        """Gives all `users`, or all teams, this role on `obj`."""
+        assign_roles(obj, dict((user, cls) for user in users))
 
     @classmethod
     def has_role(cls, permissions, obj):
@@ -9,6 +9,7 @@ from django.contrib.sites.models import Site
 from django.utils.translation import ugettext as _
 from django_digest.backend.db import update_partial_digests
 from django.db import IntegrityError, transaction
+from django.db.models import Manager
 from registration.models import RegistrationProfile
 from rest_framework import serializers
 from onadata.apps.api.models.temp_token import TempToken
@@ -17,6 +18,7 @@ from onadata.apps.main.forms import RegistrationFormUserProfile
 from onadata.apps.main.models import UserProfile
 from onadata.libs.serializers.fields.json_field import JsonField
 from onadata.libs.permissions import CAN_VIEW_PROFILE, is_organization
+from onadata.libs.permissions import prefetch_perms
 from onadata.libs.authentication import expired
 from onadata.libs.utils.cache_tools import IS_ORG
 
@@ -45,6 +47,19 @@ def _get_first_last_names(name, limit=30):
     return first_name, last_name
 
 
+class UserProfileListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        request = self.context.get('request')
+
+        if request:
+            # the permissions on each profile decide whether its email shows
+            data = list(data.all() if isinstance(data, Manager) else data)
+            prefetch_perms(request.user, data)
+
+        return super(UserProfileListSerializer, self).to_representation(data)
+
+
 class UserProfileSerializer(serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(
         view_name='userprofile-detail', lookup_field='user')
@@ -77,6 +92,7 @@ class UserProfileSerializer(serializers.HyperlinkedModelSerializer):
                   'last_name', 'email', 'city', 'country', 'organization',
                   'website', 'twitter', 'gravatar', 'require_auth', 'user',
                   'metadata', 'joined_on', 'name')
+        list_serializer_class = UserProfileListSerializer
 
     def get_is_org(self, obj):
         if obj:
@@ -15,6 +15,7 @@ from onadata.libs.serializers.tag_list_serializer import TagListSerializer
 from onadata.libs.serializers.metadata_serializer import MetaDataSerializer
 from onadata.libs.serializers.dataview_serializer import DataViewSerializer
 from onadata.libs.utils.decorators import check_obj
+from onadata.libs.utils.linked_dataset_tools import get_linked_dataset_hash
 from onadata.libs.utils.viewer_tools import enketo_url, EnketoError
 from onadata.libs.utils.viewer_tools import get_form_url
 from onadata.apps.main.views import get_enketo_preview_url
@@ -350,6 +351,14 @@ class XFormManifestSerializer(serializers.Serializer):
 
     @check_obj
     def get_hash(self, obj):
+        if obj.is_linked_dataset:
+            request = self.context.get('request')
+            group_delimiter = self.context.get(GROUP_DELIMETER_TAG)
+            params = {GROUP_DELIMETER_TAG: group_delimiter} \
+                if group_delimiter else {}
+
+            return get_linked_dataset_hash(obj, request.user, params)
+
         return u"%s" % (obj.file_hash or 'md5:')
 
     @check_obj
@@ -1,16 +1,23 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from guardian.shortcuts import get_users_with_perms
+from mock import patch
 
 from onadata.apps.api import tools
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.libs.permissions import (
+    assign_roles,
     get_object_users_with_permissions,
     ManagerRole,
     CAN_ADD_XFORM_TO_PROFILE,
+    CAN_EXPORT_XFORM,
+    CAN_VIEW_XFORM,
     ReadOnlyRole,
     OwnerRole,
     EditorRole,
     ReadOnlyRoleNoDownload)
+from onadata.libs.utils.cache_tools import get_perms_versions
 
 
 def perms_for(user, obj):
@@ -84,6 +91,60 @@ class TestPermissions(TestBase):
         self.assertTrue(EditorRole.has_role(
             perms_for(alice, self.xform), self.xform))
 
+    def test_assign_roles(self):
+        self._publish_transportation_form()
+        alice = self._create_user('alice', 'alice')
+        bob = self._create_user('bob', 'bob')
+        ManagerRole.add(alice, self.xform)
+
+        assign_roles(self.xform, {alice: ReadOnlyRole, bob: EditorRole})
+
+        self.assertFalse(ManagerRole.user_has_role(alice, self.xform))
+        self.assertTrue(ReadOnlyRole.user_has_role(alice, self.xform))
+        self.assertEqual(sorted(perms_for(alice, self.xform)),
+                         sorted(ReadOnlyRole.class_to_permissions[
+                             type(self.xform)]))
+        self.assertTrue(EditorRole.user_has_role(bob, self.xform))
+
+        # only the current permissions are read when nothing changed
+        with self.assertNumQueries(1):
+            assign_roles(self.xform, {alice: ReadOnlyRole, bob: EditorRole})
+
+    def test_object_permissions_are_cached(self):
+        self._publish_transportation_form()
+        alice = self._create_user('alice', 'alice')
+        ReadOnlyRole.add(alice, self.xform)
+
+        self.assertTrue(alice.has_perm(CAN_VIEW_XFORM, self.xform))
+        with self.assertNumQueries(0):
+            self.assertTrue(alice.has_perm(CAN_EXPORT_XFORM, self.xform))
+
+        # another request reads the permissions from the cache
+        alice = User.objects.get(pk=alice.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(alice.has_perm(CAN_VIEW_XFORM, self.xform))
+
+        ReadOnlyRoleNoDownload.add(alice, self.xform)
+        self.assertTrue(alice.has_perm(CAN_VIEW_XFORM, self.xform))
+        self.assertFalse(alice.has_perm(CAN_EXPORT_XFORM, self.xform))
+
+    @patch('onadata.libs.utils.cache_tools.transaction.on_commit')
+    def test_permissions_version_is_bumped_again_on_commit(self, on_commit):
+        self._publish_transportation_form()
+        alice = self._create_user('alice', 'alice')
+        content_type = ContentType.objects.get_for_model(self.xform)
+        objects = [(content_type.pk, self.xform.pk)]
+
+        ReadOnlyRole.add(alice, self.xform)
+        self.assertTrue(on_commit.called)
+
+        # permissions read before the commit are not cached under the final
+        # version
+        versions = get_perms_versions(alice.pk, objects)
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertNotEqual(get_perms_versions(alice.pk, objects), versions)
+
     def test_get_object_users_with_permission(self):
         alice = self._create_user('alice', 'alice')
         org_user = tools.create_organization("modilabs", alice).user
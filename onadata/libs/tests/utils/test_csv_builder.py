@@ -1,5 +1,7 @@
 import csv
 import os
+import types
+from collections import OrderedDict
 from tempfile import NamedTemporaryFile
 
 from django.utils.dateparse import parse_datetime
@@ -619,3 +621,33 @@ class TestCSVDataFrameBuilder(TestBase):
         # close and delete file
         csv_file.close()
         os.unlink(temp_file.name)
+
+    def test_csv_export_streams_records(self):
+        self._publish_nested_repeats_form()
+        self._submit_fixture_instance(
+            "nested_repeats", "01", submission_time=self._submission_time)
+        self._submit_fixture_instance(
+            "nested_repeats", "02", submission_time=self._submission_time)
+        csv_df_builder = CSVDataFrameBuilder(self.user.username,
+                                             self.xform.id_string,
+                                             include_images=False)
+        # only the outer repeat is a key at the top level of a record
+        self.assertEqual(csv_df_builder._get_repeat_xpaths(),
+                         [u'kids/kids_details'])
+
+        cursor = csv_df_builder._query_data(stream=True)
+        self.assertIsInstance(cursor, types.GeneratorType)
+        data = csv_df_builder._iter_format_for_dataframe(cursor)
+        self.assertIsInstance(data, types.GeneratorType)
+        self.assertEqual(len([record for record in data]), 2)
+
+        # repeat columns are discovered before any row is written
+        csv_df_builder.ordered_columns = OrderedDict()
+        csv_df_builder._build_ordered_columns(
+            csv_df_builder.dd.survey, csv_df_builder.ordered_columns)
+        csv_df_builder._discover_repeat_columns(
+            csv_df_builder._query_data(
+                fields='["kids/kids_details"]', stream=True))
+        self.assertIn(
+            u'kids/kids_details[3]/kids_name',
+            csv_df_builder.ordered_columns[u'kids/kids_details'])
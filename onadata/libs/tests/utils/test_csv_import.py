@@ -2,10 +2,13 @@ import mock
 import os
 import re
 from cStringIO import StringIO
+from datetime import datetime
 from django.conf import settings
+from django.utils.timezone import utc
 from onadata.libs.utils import csv_import
 from onadata.apps.logger.models import XForm
 from onadata.apps.logger.models import Instance
+from onadata.apps.logger.models.data_view import DataView, DataViewInstance
 from onadata.apps.main.tests.test_base import TestBase
 
 
@@ -194,3 +197,66 @@ class CSVImportTestCase(TestBase):
         instance = self.xform.instances.last()
         # repeats should be 6
         self.assertEqual(6, len(instance.json.get('children')))
+
+    def test_submit_csv_in_bulk(self):
+        xls_file_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
+                                     "tests", "fixtures", "tutorial.xls")
+        self._publish_xls_file(xls_file_path)
+        self.xform = XForm.objects.get()
+
+        with mock.patch.object(csv_import, 'CSV_IMPORT_BATCH_SIZE', 4):
+            result = csv_import.submit_csv(self.user.username, self.xform,
+                                           self.good_csv, bulk=True)
+
+        self.assertEqual(result.get('additions'), 9)
+        self.assertEqual(self.xform.instances.count(), 9)
+        self.assertEqual(
+            self.xform.instances.filter(user=self.user).count(), 8)
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.num_of_submissions, 9)
+
+        # the json built from the rows is the json parsed from the xml
+        for instance in self.xform.instances.all():
+            self.assertEqual(instance.json, instance.get_full_dict())
+            self.assertIsNotNone(instance.parsed_instance)
+
+        # the submission time is the one of the row
+        instance = self.xform.instances.get(
+            uuid='685dd371-4831-4fdc-a205-f285337dd98d')
+        self.assertEqual(instance.date_created,
+                         datetime(2014, 9, 4, 12, 8, 4, tzinfo=utc))
+        self.assertEqual(instance.json['_submission_time'],
+                         '2014-09-04T12:08:04')
+
+    def test_submit_csv_in_bulk_updates_materialized_dataviews(self):
+        xls_file_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
+                                     "tests", "fixtures", "tutorial.xls")
+        self._publish_xls_file(xls_file_path)
+        self.xform = XForm.objects.get()
+        data_view = DataView.objects.create(
+            name='all', xform=self.xform, project=self.xform.project,
+            columns=['name', 'age'], materialized=True)
+
+        csv_import.submit_csv(self.user.username, self.xform, self.good_csv,
+                              bulk=True)
+
+        self.assertEqual(
+            DataViewInstance.objects.filter(data_view=data_view).count(), 9)
+
+    def test_csv_with_repeats_import_in_bulk(self):
+        self.xls_file_path = os.path.join(
+            self.this_directory, 'fixtures',
+            'csv_export', 'tutorial_w_repeats.xls'
+        )
+        repeats_csv = open(os.path.join(
+            self.this_directory, 'fixtures',
+            'csv_export', 'tutorial_w_repeats_import.csv')
+        )
+        self._publish_xls_file(self.xls_file_path)
+        self.xform = XForm.objects.get()
+        csv_import.submit_csv(self.user.username, self.xform, repeats_csv,
+                              bulk=True)
+
+        instance = self.xform.instances.get()
+        self.assertEqual(6, len(instance.json.get('children')))
+        self.assertEqual(instance.json, instance.get_full_dict())
@@ -4,11 +4,13 @@ from django.core.files.storage import default_storage
 from django.contrib.sites.models import Site
 from pyxform.tests_v1.pyxform_test_case import PyxformTestCase
 from django.core.files.temp import NamedTemporaryFile
+from mock import patch
 
 from savReaderWriter import SavWriter
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.viewer.models.export import Export
+from onadata.apps.viewer.models.export import INCREMENTAL_EXPORT_KEY
 from onadata.libs.utils.export_builder import encode_if_str
 from onadata.libs.utils.export_tools import generate_export
 from onadata.libs.utils.export_tools import generate_osm_export
@@ -234,6 +236,48 @@ class TestExportTools(PyxformTestCase, TestBase):
         self.assertTrue(export.is_successful)
         self.assertNotEqual(export_id, export.pk)
 
+    @patch('onadata.libs.utils.export_tools.INCREMENTAL_EXPORTS', True)
+    def test_incremental_csv_export(self):
+        export_type = "csv"
+        options = {"group_delimiter": "/",
+                   "remove_group_name": False,
+                   "split_select_multiples": True}
+        self._publish_transportation_form()
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at)
+        self._submit_transport_instance_w_uuid(
+            "transport_2011-07-25_19-05-36")
+
+        export = generate_export(export_type, self.xform, None, options)
+        state = export.options[INCREMENTAL_EXPORT_KEY]
+        self.assertEqual(state['last_id'],
+                         self.xform.instances.latest('id').pk)
+
+        # delete one submission, remove one from the database, edit one and
+        # add another
+        instances = self.xform.instances.order_by('id')
+        instances[0].set_deleted()
+        instances[1].delete()
+        self._submit_transport_instance_w_uuid(
+            "transport_2011-07-25_19-05-36-edited")
+        self._submit_transport_instance(3)
+
+        with patch('onadata.libs.utils.csv_builder.CSVDataFrameBuilder'
+                   '.export_to') as mock_export_to:
+            export = generate_export(export_type, self.xform, None, options)
+            self.assertFalse(mock_export_to.called)
+        self.assertEqual(export.options[INCREMENTAL_EXPORT_KEY]['last_id'],
+                         self.xform.instances.latest('id').pk)
+
+        with patch('onadata.libs.utils.export_tools.INCREMENTAL_EXPORTS',
+                   False):
+            full_export = generate_export(export_type, self.xform, None,
+                                          options)
+
+        with default_storage.open(export.filepath) as f, \
+                default_storage.open(full_export.filepath) as f2:
+            self.assertEqual(f.read(), f2.read())
+
     def test_kml_exports(self):
         export_type = "kml"
         options = {"group_delimiter": "/",  "remove_group_name": False,
@@ -1,7 +1,16 @@
+import os
+
 import requests
+from django.conf import settings
+from django.core.files.base import File
 from httmock import urlmatch, HTTMock
+from mock import patch
 
-from onadata.libs.utils.image_tools import resize
+from onadata.apps.logger.models import Attachment, Instance
+from onadata.libs.utils.image_tools import get_thumbnail_sizes, image_url
+from onadata.libs.utils.image_tools import create_thumbnails, resize
+from onadata.libs.utils.cache_tools import (
+    ATTACHMENT_THUMBNAILS, ATTACHMENT_THUMBNAILS_FAILURE_TIMEOUT)
 from onadata.apps.main.tests.test_base import TestBase
 
 
@@ -21,3 +30,43 @@ class TestImageTools(TestBase):
 
         self.assertEqual(io_error.exception.message,
                          u'The image file couldn\'t be identified')
+
+    @patch('onadata.libs.utils.image_tools.resize')
+    def test_thumbnails_are_created_once(self, mock_resize):
+        self._publish_transportation_form_and_submit_instance()
+        media_file = os.path.join(
+            self.this_directory, 'fixtures', 'transportation', 'instances',
+            self.surveys[0], '1335783522563.jpg')
+        attachment = Attachment.objects.create(
+            instance=Instance.objects.all()[0],
+            media_file=File(open(media_file), media_file))
+
+        self.assertIsNone(get_thumbnail_sizes(attachment))
+        small = image_url(attachment, 'small')
+        medium = image_url(attachment, 'medium')
+
+        self.assertEqual(mock_resize.call_count, 1)
+        self.assertEqual(get_thumbnail_sizes(attachment),
+                         settings.THUMB_ORDER)
+        self.assertIn('-small.jpg', small)
+        self.assertIn('-medium.jpg', medium)
+        self.assertNotEqual(image_url(attachment, 'original'), small)
+
+    @patch('onadata.libs.utils.image_tools.cache.set')
+    @patch('onadata.libs.utils.image_tools.resize')
+    def test_failed_thumbnails_are_tried_again(self, mock_resize,
+                                               mock_cache_set):
+        self._publish_transportation_form_and_submit_instance()
+        media_file = os.path.join(
+            self.this_directory, 'fixtures', 'transportation', 'instances',
+            self.surveys[0], '1335783522563.jpg')
+        attachment = Attachment.objects.create(
+            instance=Instance.objects.all()[0],
+            media_file=File(open(media_file), media_file))
+        mock_resize.side_effect = Exception("The image file couldn't be "
+                                            "identified")
+
+        self.assertEqual(create_thumbnails(attachment, force=True), [])
+        mock_cache_set.assert_called_with(
+            '{}{}'.format(ATTACHMENT_THUMBNAILS, attachment.pk), [],
+            ATTACHMENT_THUMBNAILS_FAILURE_TIMEOUT)
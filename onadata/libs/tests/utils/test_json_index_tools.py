@@ -0,0 +1,58 @@
+from django.db import transaction
+from mock import patch
+
+from onadata.apps.logger.tasks import update_json_indexes_async
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.libs.utils import json_index_tools
+from onadata.libs.utils.json_index_tools import create_json_index, \
+    get_json_index_name, get_json_indexes
+
+
+class TestJsonIndexTools(TestBase):
+
+    def setUp(self):
+        super(TestJsonIndexTools, self).setUp()
+        self._publish_transportation_form()
+        self.field = self.xform.get_field_name_xpaths_only()[0]
+
+    def test_update_json_indexes(self):
+        update_json_indexes_async(self.xform.pk, [self.field], True)
+        indexes = get_json_indexes(self.xform)
+        self.assertEqual(len(indexes), 2)
+        self.assertTrue(all(i['valid'] for i in indexes))
+        definitions = u" ".join(i['definition'] for i in indexes)
+        self.assertIn(u"(json ->> '{}'::text)".format(self.field),
+                      definitions)
+        self.assertIn(u"jsonb_path_ops", definitions)
+        self.assertIn(u"WHERE (xform_id = {})".format(self.xform.pk),
+                      definitions)
+
+        # indexes that exist are not created again
+        update_json_indexes_async(self.xform.pk, [self.field], True)
+        self.assertEqual(len(get_json_indexes(self.xform)), 2)
+
+        name = get_json_index_name(self.xform, self.field)
+        update_json_indexes_async(self.xform.pk, drop=[name])
+        self.assertNotIn(name,
+                         [i['name'] for i in get_json_indexes(self.xform)])
+
+    def test_invalid_index_is_rebuilt(self):
+        name = create_json_index(self.xform, self.field)
+
+        # an index left invalid by a failed build is dropped and rebuilt
+        with patch('onadata.libs.utils.json_index_tools.'
+                   '_get_index_validity', return_value=False):
+            with patch('onadata.libs.utils.json_index_tools.'
+                       '_drop_index',
+                       wraps=json_index_tools._drop_index) as mock_drop:
+                self.assertEqual(create_json_index(self.xform, self.field),
+                                 name)
+        mock_drop.assert_called_once_with(name)
+        self.assertEqual(get_json_indexes(self.xform)[0]['name'], name)
+        self.assertTrue(get_json_indexes(self.xform)[0]['valid'])
+
+    def test_no_index_changes_within_transaction(self):
+        with transaction.atomic():
+            with self.assertRaises(ValueError):
+                create_json_index(self.xform, self.field)
+        self.assertEqual(get_json_indexes(self.xform), [])
@@ -0,0 +1,49 @@
+import zipfile
+from cStringIO import StringIO
+from unittest import TestCase
+
+from onadata.libs.utils.zip_tools import IteratorFile, iter_zip, prefetch
+
+
+class TestZipTools(TestCase):
+
+    def test_iter_zip(self):
+        files = [
+            ('a/b.txt', iter(['hello ', 'world'])),
+            ('c.jpg', iter(['\xff\xd8\xff'])),
+            ('empty.csv', iter([])),
+        ]
+        archive = zipfile.ZipFile(StringIO(''.join(iter_zip(files))))
+
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['a/b.txt', 'c.jpg', 'empty.csv'])
+        self.assertEqual(archive.read('a/b.txt'), 'hello world')
+        self.assertEqual(archive.read('c.jpg'), '\xff\xd8\xff')
+        self.assertEqual(archive.read('empty.csv'), '')
+        # already compressed files are not deflated
+        self.assertEqual(archive.getinfo('a/b.txt').compress_type,
+                         zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.getinfo('c.jpg').compress_type,
+                         zipfile.ZIP_STORED)
+
+    def test_iterator_file(self):
+        f = IteratorFile(iter(['ab', 'cde', 'f']))
+
+        self.assertEqual(f.read(3), 'abc')
+        self.assertEqual(f.read(1), 'd')
+        self.assertEqual(f.read(), 'ef')
+        self.assertEqual(f.read(2), '')
+
+    def test_prefetch_keeps_order(self):
+        self.assertEqual(list(prefetch(lambda x: x * 2, range(10), 3)),
+                         [x * 2 for x in range(10)])
+
+    def test_prefetch_cleans_up_when_closed(self):
+        cleaned = []
+        results = prefetch(lambda x: x * 2, range(10), 3, cleaned.append)
+
+        self.assertEqual([next(results), next(results)], [0, 2])
+        results.close()
+
+        # the results processed ahead of the last one yielded
+        self.assertEqual(cleaned, [4, 6, 8])
@@ -1,10 +1,49 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from hashlib import md5
+
 from django.core.cache import cache
+from django.db import transaction
 
 
 def safe_delete(key):
     cache.get(key) and cache.delete(key)
 
 
+class LRUCache(object):
+    """
+    A process local cache that keeps the `size` most recently used values.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
 # Cache names used in project serializer
 PROJ_PERM_CACHE = 'ps-project_permissions-'
 PROJ_NUM_DATASET_CACHE = 'ps-num_datasets-'
@@ -24,4 +63,329 @@ DATAVIEW_COUNT = 'dvs-get_data_count'
 DATAVIEW_LAST_SUBMISSION_TIME = 'dvs-last_submission_time'
 PROJ_TEAM_USERS_CACHE = 'ps-project-team-users'
 XFORM_LINKED_DATAVIEWS = 'xfs-linked_dataviews'
+XFORM_MATERIALIZED_DATAVIEWS = 'xfs-materialized_dataviews-'
 PROJECT_LINKED_DATAVIEWS = 'ps-project-linked_dataviews'
+XFORM_DATA_VERSION = 'xfs-data_version-'
+XFORM_QUERY_COUNT = 'xfs-query_count-'
+XFORM_QUERY_COUNT_TIMEOUT = 24 * 60 * 60
+SUBMISSION_BATCH = 'xfs-submission_batch-'
+XFORM_SURVEY_CACHE = 'xfs-survey-'
+XFORM_SURVEY_CACHE_TIMEOUT = 24 * 60 * 60
+SUBMISSION_BATCH_TIMEOUT = 60 * 60
+XFORM_FILTER_FIELDS = 'xfs-filter_fields-'
+XFORM_STATS_CACHE = 'xfs-stats-'
+XFORM_STATS_CACHE_TIMEOUT = 24 * 60 * 60
+XFORM_FIELD_COUNTS = 'xfs-field_counts-'
+OBJ_PERMS_VERSION = 'perms-obj_version-'
+USER_PERMS_VERSION = 'perms-user_version-'
+USER_OBJ_PERMS_CACHE = 'perms-user_obj-'
+USER_OBJ_PERMS_CACHE_TIMEOUT = 60 * 60
+ATTACHMENT_THUMBNAILS = 'att-thumbnails-'
+ATTACHMENT_THUMBNAILS_LOCK_TIMEOUT = 10 * 60
+# failed thumbnails are tried again once this expires
+ATTACHMENT_THUMBNAILS_FAILURE_TIMEOUT = 10 * 60
+LINKED_DATASET_CSV = 'lds-csv-'
+XFORM_LIST_VERSION = 'xfs-list_version-'
+XFORM_LIST_FORM_VERSION = 'xfs-list_form_version-'
+XFORM_LIST_FORMS = 'xfs-list_forms-'
+XFORM_MANIFEST_VERSION = 'xfs-manifest_version-'
+XFORM_LIST_CACHE = 'xfs-list-'
+XFORM_MANIFEST_CACHE = 'xfs-manifest-'
+XFORM_LIST_CACHE_TIMEOUT = 24 * 60 * 60
+LINKED_DATASET_CSV_LOCK_TIMEOUT = 10 * 60
+# the number of distinct fields counted per form
+XFORM_FILTER_FIELDS_MAX = 100
+
+
+def _seed_version():
+    # seeded from the clock so that a counter that was evicted from the cache
+    # does not hand out versions that were issued before
+    return int(time.time() * 1000000)
+
+
+def _get_version(key):
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, _seed_version(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # the key does not exist
+        cache.add(key, _seed_version(), None)
+
+        return cache.get(key)
+
+
+def _bump_version_on_commit(key):
+    """
+    Bumps the version now and again once the current transaction commits,
+    what requests read and cached before the commit is under the first new
+    version only.
+    """
+    version = _bump_version(key)
+    transaction.on_commit(lambda: _bump_version(key))
+
+    return version
+
+
+def get_xform_data_version(xform_id):
+    """
+    Returns a number that changes whenever a submission of the form is added,
+    edited or deleted.
+    """
+    return _get_version('{}{}'.format(XFORM_DATA_VERSION, xform_id))
+
+
+def bump_xform_data_version(xform_id):
+    return _bump_version_on_commit(
+        '{}{}'.format(XFORM_DATA_VERSION, xform_id))
+
+
+def get_xform_list_version(user_id):
+    """
+    Returns a number that changes whenever a form the user owns or has
+    permissions on changes or the permissions of the user on forms change.
+    """
+    return _get_version('{}{}'.format(XFORM_LIST_VERSION, user_id))
+
+
+def bump_xform_list_versions(user_ids):
+    for user_id in set(user_ids):
+        _bump_version_on_commit('{}{}'.format(XFORM_LIST_VERSION, user_id))
+
+
+def get_xform_list_form_versions(xform_ids):
+    """
+    Returns the list versions of the forms, read from the cache at once, a
+    number that changes whenever a form's listed fields change or it leaves
+    form lists.
+    """
+    keys = ['{}{}'.format(XFORM_LIST_FORM_VERSION, xform_id)
+            for xform_id in xform_ids]
+    versions = cache.get_many(keys)
+
+    return [versions[key] if key in versions else _get_version(key)
+            for key in keys]
+
+
+def bump_xform_list_form_version(xform_id):
+    return _bump_version_on_commit(
+        '{}{}'.format(XFORM_LIST_FORM_VERSION, xform_id))
+
+
+def get_xform_manifest_version(xform_id):
+    """
+    Returns a number that changes whenever the media files of the form
+    change.
+    """
+    return _get_version('{}{}'.format(XFORM_MANIFEST_VERSION, xform_id))
+
+
+def bump_xform_manifest_version(xform_id):
+    return _bump_version_on_commit(
+        '{}{}'.format(XFORM_MANIFEST_VERSION, xform_id))
+
+
+class _PermsChanges(object):
+    """Counts the permission changes made by this process."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def incr(self):
+        with self._lock:
+            self.count += 1
+
+
+perms_changes = _PermsChanges()
+
+
+def _obj_perms_version_key(content_type_id, object_pk):
+    return '{}{}-{}'.format(OBJ_PERMS_VERSION, content_type_id, object_pk)
+
+
+def get_perms_versions(user_id, objects):
+    """
+    Returns the permissions version of the user and the permissions versions
+    of `objects`, a list of (content type id, object pk) pairs, read from the
+    cache at once.
+    """
+    user_key = '{}{}'.format(USER_PERMS_VERSION, user_id)
+    keys = [user_key] + [_obj_perms_version_key(content_type_id, object_pk)
+                         for content_type_id, object_pk in objects]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            versions[key] = _get_version(key)
+
+    return versions[user_key], [versions[key] for key in keys[1:]]
+
+
+def bump_obj_perms_version(content_type_id, object_pk):
+    """Invalidates the cached permissions of all users on an object."""
+    perms_changes.incr()
+
+    return _bump_version_on_commit(
+        _obj_perms_version_key(content_type_id, object_pk))
+
+
+def bump_user_perms_version(user_id):
+    """Invalidates the cached object permissions of a user."""
+    perms_changes.incr()
+
+    return _bump_version_on_commit('{}{}'.format(USER_PERMS_VERSION, user_id))
+
+
+def get_cached_query_count(xform_id, key_data, count):
+    """
+    Returns the result of calling `count`, cached per form data version and
+    `key_data` which should identify the query being counted.
+    """
+    key = '{}{}-{}-{}'.format(
+        XFORM_QUERY_COUNT, xform_id, get_xform_data_version(xform_id),
+        md5(json.dumps(key_data, default=unicode)).hexdigest())
+    value = cache.get(key)
+
+    if value is None:
+        value = count()
+        cache.set(key, value, XFORM_QUERY_COUNT_TIMEOUT)
+
+    return value
+
+
+def _submission_batch_key(xform_id, name):
+    return '{}{}-{}'.format(SUBMISSION_BATCH, xform_id, name)
+
+
+def add_to_submission_batch(xform_id, value):
+    """
+    Queues `value` in the pending submission batch of the form.
+
+    Returns True when the caller holds the batch lock and should schedule
+    the processing of the batch.
+    """
+    seq_key = _submission_batch_key(xform_id, 'seq')
+    cache.add(seq_key, 0, None)
+
+    try:
+        seq = cache.incr(seq_key)
+    except ValueError:
+        # the key was evicted after it was added
+        cache.add(seq_key, 0, None)
+        seq = cache.incr(seq_key)
+
+    cache.set(_submission_batch_key(xform_id, seq), value,
+              SUBMISSION_BATCH_TIMEOUT)
+
+    return cache.add(_submission_batch_key(xform_id, 'lock'), True,
+                     SUBMISSION_BATCH_TIMEOUT)
+
+
+def get_submission_batch(xform_id, skip_missing=False):
+    """
+    Returns the position of the last value read and the values queued since
+    the previous batch.
+
+    Reading stops at the first value that has been counted but not written
+    yet unless `skip_missing` is True.
+    """
+    done = cache.get(_submission_batch_key(xform_id, 'done')) or 0
+    last = cache.get(_submission_batch_key(xform_id, 'seq')) or 0
+
+    if last < done:
+        # the counter was evicted and started again
+        done = 0
+
+    keys = [_submission_batch_key(xform_id, i)
+            for i in xrange(done + 1, last + 1)]
+    found = cache.get_many(keys)
+    values = []
+
+    for key in keys:
+        if key not in found and not skip_missing:
+            break
+        done += 1
+        if key in found:
+            values.append(found[key])
+
+    return done, values
+
+
+def release_submission_batch(xform_id, done):
+    """
+    Marks the values up to position `done` as processed and releases the
+    batch lock.
+
+    Returns True when values are still pending and the caller holds the
+    batch lock again and should schedule another batch.
+    """
+    done_key = _submission_batch_key(xform_id, 'done')
+    previous = cache.get(done_key) or 0
+    lock_key = _submission_batch_key(xform_id, 'lock')
+
+    cache.set(done_key, done, None)
+    cache.delete_many([_submission_batch_key(xform_id, i)
+                       for i in xrange(previous + 1, done + 1)])
+    cache.delete(lock_key)
+
+    seq = cache.get(_submission_batch_key(xform_id, 'seq')) or 0
+
+    return seq > done and \
+        cache.add(lock_key, True, SUBMISSION_BATCH_TIMEOUT)
+
+
+def _filter_field_key(xform_id, field=None):
+    # the key of the count of `field`, of the list of fields when None
+    suffix = 'fields' if field is None \
+        else md5(field.encode('utf-8')).hexdigest()
+
+    return '{}{}-{}'.format(XFORM_FILTER_FIELDS, xform_id, suffix)
+
+
+def record_filter_fields(xform_id, fields):
+    """
+    Counts how often the submissions of the form are filtered or sorted on
+    each of the json `fields`, the counts are approximate.
+    """
+    if not fields:
+        return
+
+    key = _filter_field_key(xform_id)
+    known = cache.get(key) or []
+    new = [f for f in fields if f not in known]
+
+    if new and len(known) < XFORM_FILTER_FIELDS_MAX:
+        # a field added by a concurrent request may be lost, it is added
+        # again the next time it is filtered on
+        known = known + sorted(set(new))[:XFORM_FILTER_FIELDS_MAX -
+                                         len(known)]
+        cache.set(key, known, None)
+
+    for field in fields:
+        if field in known:
+            # the count of each field is incremented atomically
+            field_key = _filter_field_key(xform_id, field)
+            if not cache.add(field_key, 1, None):
+                try:
+                    cache.incr(field_key)
+                except ValueError:
+                    # evicted since it was added
+                    cache.add(field_key, 1, None)
+
+
+def get_filter_field_counts(xform_id):
+    """Returns a dict of the counts of record_filter_fields by field."""
+    fields = cache.get(_filter_field_key(xform_id)) or []
+    keys = dict([(_filter_field_key(xform_id, f), f) for f in fields])
+    counts = cache.get_many(keys.keys())
+
+    return dict([(keys[k], v) for k, v in counts.items()])
@@ -15,8 +15,7 @@ from rest_framework.exceptions import ParseError
 
 
 # list of fields we can chart
-CHART_FIELDS = ['select one', 'integer', 'decimal', 'date', 'datetime',
-                'start', 'end', 'today']
+CHART_FIELDS = common_tags.CHART_FIELDS
 # numeric, categorized
 DATA_TYPE_MAP = {
     'integer': 'numeric',
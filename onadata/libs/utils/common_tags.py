@@ -78,6 +78,9 @@ API_TOKEN = 'api-token'
 KNOWN_MEDIA_TYPES = ['photo', 'image', 'audio', 'video']
 NUMERIC_LIST = [u'integer', u'decimal', u'calculate']
 SELECT_ONE = u'select one'
+# list of fields we can chart
+CHART_FIELDS = ['select one', 'integer', 'decimal', 'date', 'datetime',
+                'start', 'end', 'today']
 
 # google_sheets
 GOOGLE_SHEET = u'google_sheets'
@@ -1,17 +1,23 @@
+import json
 import unicodecsv as csv
 from collections import OrderedDict
+from hashlib import md5
 from itertools import chain
 
 from django.conf import settings
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import smart_str
 from pyxform.section import Section, RepeatingSection
 from pyxform.question import Question
 
 from onadata.apps.logger.models import OsmData
+from onadata.apps.logger.models.instance import InstanceHistory
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.models.xform import question_types_to_exclude
 from onadata.apps.viewer.models.data_dictionary import DataDictionary
 from onadata.apps.viewer.models.parsed_instance import (
-    ParsedInstance, query_data)
+    ParsedInstance, query_data, queryset_json_iterator)
 from onadata.libs.exceptions import NoRecordsFoundError
 from onadata.libs.utils.common_tags import ID, XFORM_ID_STRING, STATUS,\
     ATTACHMENTS, GEOLOCATION, UUID, SUBMISSION_TIME, NA_REP,\
@@ -273,7 +279,7 @@ class AbstractDataFrameBuilder(object):
 
     def _query_data(self, query='{}', start=0,
                     limit=ParsedInstance.DEFAULT_LIMIT,
-                    fields='[]', count=False):
+                    fields='[]', count=False, stream=False):
         # query_data takes params as json strings
         # so we dumps the fields dictionary
         count_args = {
@@ -304,7 +310,8 @@ class AbstractDataFrameBuilder(object):
                 'sort': 'id',
                 'start_index': start,
                 'limit': limit,
-                'count': False
+                'count': False,
+                'stream': stream
             }
             cursor = query_data(**query_args)
             return cursor
@@ -426,8 +433,7 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
                     # generated when we reindex
                 ordered_columns[child.get_abbreviated_xpath()] = None
 
-    def _format_for_dataframe(self, cursor):
-        # TODO: check for and handle empty results
+    def _add_select_multiple_and_gps_columns(self):
         # add ordered columns for select multiples
         if self.split_select_multiples:
             for key, choices in self.select_multiples.items():
@@ -438,58 +444,101 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
         for key in self.gps_fields:
             gps_xpaths = self.dd.get_additional_geopoint_xpaths(key)
             self.ordered_columns[key] = [key] + gps_xpaths
-        data = []
+
+    def _format_record(self, record, image_xpaths):
+        # split select multiples
+        if self.split_select_multiples:
+            record = self._split_select_multiples(
+                record, self.select_multiples,
+                self.BINARY_SELECT_MULTIPLES)
+        # check for gps and split into components i.e. latitude, longitude,
+        # altitude, precision
+        self._split_gps_fields(record, self.gps_fields)
+        self._tag_edit_string(record)
+        flat_dict = {}
+        # re index repeats
+        for key, value in record.iteritems():
+            reindexed = self._reindex(key, value, self.ordered_columns,
+                                      record, self.dd,
+                                      include_images=image_xpaths)
+            flat_dict.update(reindexed)
+
+        return flat_dict
+
+    def _iter_format_for_dataframe(self, cursor):
+        """
+        Yields one flattened record at a time, the select multiple and gps
+        columns should already have been added to the ordered columns.
+        """
         image_xpaths = [] if not self.include_images \
             else self.dd.get_media_survey_xpaths()
 
         for record in cursor:
-            # split select multiples
-            if self.split_select_multiples:
-                record = self._split_select_multiples(
-                    record, self.select_multiples,
-                    self.BINARY_SELECT_MULTIPLES)
-            # check for gps and split into components i.e. latitude, longitude,
-            # altitude, precision
-            self._split_gps_fields(record, self.gps_fields)
-            self._tag_edit_string(record)
-            flat_dict = {}
-            # re index repeats
-            for key, value in record.iteritems():
-                reindexed = self._reindex(key, value, self.ordered_columns,
-                                          record, self.dd,
-                                          include_images=image_xpaths)
-                flat_dict.update(reindexed)
-
-            data.append(flat_dict)
-        return data
+            yield self._format_record(record, image_xpaths)
 
-    def export_to(self, path, dataview=None):
+    def _format_for_dataframe(self, cursor):
+        # TODO: check for and handle empty results
+        self._add_select_multiple_and_gps_columns()
+
+        return [record for record in self._iter_format_for_dataframe(cursor)]
+
+    def _get_repeat_xpaths(self):
+        """
+        Returns the xpaths of repeats that are not nested within another
+        repeat i.e. the repeats that are keys at the top level of a record.
+        """
+        repeats = [e.get_abbreviated_xpath()
+                   for e in self.dd.get_survey_elements()
+                   if isinstance(e, RepeatingSection)]
+
+        return [xpath for xpath in repeats
+                if not [r for r in repeats if xpath.startswith(r + u'/')]]
+
+    def _discover_repeat_columns(self, cursor):
+        """
+        First pass over the data, the columns of repeats are only known once
+        every record has been reindexed. Records are formatted and discarded
+        so that only the column names are kept in memory.
+        """
+        for record in self._iter_format_for_dataframe(cursor):
+            pass
+
+    def _reset_ordered_columns(self):
         self.ordered_columns = OrderedDict()
         self._build_ordered_columns(self.dd.survey, self.ordered_columns)
+        self._add_select_multiple_and_gps_columns()
 
-        if dataview:
-            cursor = dataview.query_data(dataview, all_data=True)
-            data = self._format_for_dataframe(cursor)
-            columns = list(chain.from_iterable(
-                [[xpath] if cols is None else cols
-                 for xpath, cols in self.ordered_columns.iteritems()
-                 if [c for c in dataview.columns if xpath.startswith(c)]]
-            ))
-        else:
-            cursor = self._query_data(self.filter_query)
-            data = self._format_for_dataframe(cursor)
+    def _get_columns(self):
+        columns = list(chain.from_iterable(
+            [[xpath] if cols is None else cols
+             for xpath, cols in self.ordered_columns.iteritems()]))
 
-            columns = list(chain.from_iterable(
-                [[xpath] if cols is None else cols
-                 for xpath, cols in self.ordered_columns.iteritems()]))
+        # add extra columns
+        columns += [col for col in self.ADDITIONAL_COLUMNS]
+        for field in self.dd.get_survey_elements_of_type('osm'):
+            columns += OsmData.get_tag_keys(self.xform,
+                                            field.get_abbreviated_xpath(),
+                                            include_prefix=True)
+
+        return columns
+
+    def _track_last_id(self, cursor):
+        """Keeps the highest submission id of the records read in last_id."""
+        for record in cursor:
+            self.last_id = max(self.last_id, record.get(ID))
+            yield record
+
+    def _get_header_count(self, columns_with_hxl):
+        """Returns the number of rows write_to_csv writes before the data."""
+        count = 0 if self.include_labels_only else 1
+        if self.include_labels or self.include_labels_only:
+            count += 1
+        if self.include_hxl and columns_with_hxl:
+            count += 1
 
-            # add extra columns
-            columns += [col for col in self.ADDITIONAL_COLUMNS]
-            for field in self.dd.get_survey_elements_of_type('osm'):
-                columns += OsmData.get_tag_keys(self.xform,
-                                                field.get_abbreviated_xpath(),
-                                                include_prefix=True)
+        return count
 
+    def _write_to_csv(self, path, data, columns):
         columns_with_hxl = self.include_hxl and get_columns_with_hxl(
             self.dd.survey_elements)
 
@@ -501,3 +550,141 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
                      include_labels_only=self.include_labels_only,
                      include_hxl=self.include_hxl,
                      win_excel_utf8=self.win_excel_utf8)
+
+    def export_to(self, path, dataview=None):
+        self.last_id = 0
+        self._reset_ordered_columns()
+        repeat_xpaths = self._get_repeat_xpaths()
+
+        if dataview:
+            if repeat_xpaths:
+                self._discover_repeat_columns(dataview.query_data(
+                    dataview, all_data=True, stream=True))
+            data = self._iter_format_for_dataframe(
+                dataview.query_data(dataview, all_data=True, stream=True))
+            columns = list(chain.from_iterable(
+                [[xpath] if cols is None else cols
+                 for xpath, cols in self.ordered_columns.iteritems()
+                 if [c for c in dataview.columns if xpath.startswith(c)]]
+            ))
+        else:
+            if repeat_xpaths:
+                # only the repeats determine the columns, avoid reading the
+                # rest of the submission in the discovery pass
+                self._discover_repeat_columns(
+                    self._query_data(self.filter_query,
+                                     fields=json.dumps(repeat_xpaths),
+                                     stream=True))
+            cursor = self._track_last_id(
+                self._query_data(self.filter_query, stream=True))
+            data = self._iter_format_for_dataframe(cursor)
+            columns = self._get_columns()
+
+        self._write_to_csv(path, data, columns)
+
+        return columns
+
+    def update_export(self, path, previous_path, columns, last_id,
+                      last_date_modified):
+        """
+        Writes to `path` the export at `previous_path` with the submissions
+        edited since `last_date_modified` rewritten, the deleted ones dropped
+        and those added after `last_id` appended, the rest of the rows are
+        copied as is.
+
+        Returns False without writing anything when the changed submissions
+        need columns that `columns`, the columns of the previous export, do
+        not have e.g. a repeat with more items than before.
+        """
+        self.last_id = last_id
+        self._reset_ordered_columns()
+        image_xpaths = [] if not self.include_images \
+            else self.dd.get_media_survey_xpaths()
+
+        previous = self.xform.instances.filter(deleted_at=None,
+                                               id__lte=last_id)
+        # the rows only have the uuid, which an edit changes, rows are matched
+        # to the submission ids by their current and previous uuids, rows of
+        # submissions that were deleted, even from the database, match none
+        ids = dict(previous.values_list('uuid', 'id').iterator())
+        # edits are few, keep the rewritten rows in memory by id
+        changed = {}
+        for pk, record in previous.filter(
+                date_modified__gte=last_date_modified)\
+                .values_list('id', 'json').iterator():
+            changed[pk] = self._format_record(record, image_xpaths)
+        for uuid, pk in InstanceHistory.objects.filter(
+                xform_instance_id__in=changed.keys())\
+                .values_list('uuid', 'xform_instance_id').iterator():
+            ids.setdefault(uuid, pk)
+
+        new_records = self.xform.instances.filter(
+            deleted_at=None, id__gt=last_id).order_by('id')
+        if self._get_repeat_xpaths():
+            self._discover_repeat_columns(
+                queryset_json_iterator(new_records))
+
+        if not set(self._get_columns()).issubset(columns):
+            return False
+
+        header_count = self._get_header_count(
+            self.include_hxl and get_columns_with_hxl(
+                self.dd.survey_elements))
+        uuid_index = columns.index(UUID)
+        encoding = 'utf-8-sig' if self.win_excel_utf8 else 'utf-8'
+
+        def _iter_rows():
+            with open(previous_path, 'rb') as csvfile:
+                reader = csv.reader(csvfile, encoding=encoding)
+                for i in xrange(header_count):
+                    next(reader, None)
+
+                for values in reader:
+                    pk = ids.get(values[uuid_index])
+                    if pk in changed:
+                        yield changed.pop(pk)
+                    elif pk is not None:
+                        yield dict(zip(columns, values))
+
+            cursor = self._track_last_id(queryset_json_iterator(new_records))
+            for record in self._iter_format_for_dataframe(cursor):
+                yield record
+
+        self._write_to_csv(path, _iter_rows(), columns)
+
+        return True
+
+    def export_incremental(self, path, previous_path=None, state=None):
+        """
+        Writes the export to `path` by updating the export at `previous_path`
+        when `state`, the value returned for that export, still applies and
+        by exporting every submission otherwise.
+
+        Returns the state of the new export: its columns, the highest
+        submission id and date_modified it includes and a hash of the form.
+        """
+        # read the high-water mark before the data, a submission edited
+        # while exporting is then rewritten again by the next update
+        last_date_modified = self.xform.instances.aggregate(
+            Max('date_modified'))['date_modified__max']
+        survey = md5(smart_str(self.xform.json)).hexdigest()
+        columns = None
+
+        if previous_path and state and state.get('survey') == survey and \
+                state.get('last_date_modified'):
+            columns = state['columns']
+            if not self.update_export(
+                    path, previous_path, columns, state['last_id'],
+                    parse_datetime(state['last_date_modified'])):
+                columns = None
+
+        if columns is None:
+            columns = self.export_to(path)
+
+        return {
+            'columns': columns,
+            'last_id': self.last_id,
+            'last_date_modified': last_date_modified and
+            last_date_modified.isoformat(),
+            'survey': survey,
+        }
@@ -4,21 +4,36 @@ import unicodecsv as ucsv
 import uuid
 import codecs
 
-
+import dateutil.parser
 from celery import task
 from celery import current_task
 from celery.result import AsyncResult
 from collections import defaultdict
 from copy import deepcopy
 from datetime import datetime
+from itertools import chain, islice
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
 from onadata.libs.utils.logger_tools import dict2xml, safe_create_instance
 from onadata.apps.logger.models import Instance
+from onadata.apps.logger.models.data_view import materialize_new_instances
+from onadata.apps.logger.models.instance import FormInactiveError
+from onadata.apps.logger.models.instance import process_submissions
+from onadata.apps.logger.models.survey_type import SurveyType
+from onadata.apps.logger.xform_instance_parser import DictInstanceParser
+from onadata.apps.viewer.models.parsed_instance import ParsedInstance
+from onadata.libs.utils.cache_tools import bump_xform_data_version
 from onadata.libs.utils.common_tags import MULTIPLE_SELECT_TYPE
 from onadata.libs.utils.dict_tools import csv_dict_to_nested_dict
 from onadata.libs.utils.async_status import (celery_state_to_status,
                                              async_status, FAILED)
 
+# the number of rows saved together by a bulk import
+CSV_IMPORT_BATCH_SIZE = getattr(settings, 'CSV_IMPORT_BATCH_SIZE', 1000)
+
 
 def get_submission_meta_dict(xform, instance_id):
     """Generates metadata for our submission
@@ -38,7 +53,8 @@ def get_submission_meta_dict(xform, instance_id):
 
     update = 0
 
-    if xform.instances.filter(uuid=instance_id).count() > 0:
+    if instance_id and \
+            xform.instances.filter(uuid=instance_id).count() > 0:
         uuid_arg = 'uuid:{}'.format(uuid.uuid4())
         meta.update({'instanceID': uuid_arg,
                      'deprecatedID': 'uuid:{}'.format(instance_id)})
@@ -106,22 +122,227 @@ def dict_pathkeys_to_nested_dicts(dictionary):
     return d
 
 
+def _get_submission_date(submission_date):
+    if not submission_date:
+        return timezone.now()
+
+    date_created = dateutil.parser.parse(submission_date)
+    if not timezone.is_aware(date_created):
+        date_created = timezone.make_aware(date_created, timezone.utc)
+
+    return date_created
+
+
+def bulk_create_instances(xform, rows):
+    """Saves new submissions in bulk
+
+    The submissions are saved with one INSERT per table, their json is built
+    from the row dicts instead of parsing the xml and the post submission
+    processing runs once for all of them.
+
+    :param onadata.apps.logger.models.XForm xform: The submissions' XForm.
+    :param list rows: (submission dict, submission date, username) tuples.
+    :return: The saved submissions.
+    :rtype: list
+    """
+    if not xform.downloadable:
+        raise FormInactiveError()
+
+    root_name = json.loads(xform.json).get('name', xform.id_string)
+    survey_type, created = SurveyType.objects.get_or_create(slug=root_name)
+    users = dict([
+        (user.username, user) for user in User.objects.filter(
+            username__in=set([r[2] for r in rows if r[2]]))])
+    instances = []
+
+    with transaction.atomic():
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [Instance._meta.db_table, len(rows)])
+
+        for (pk,), (row, submission_date, submitted_by) in \
+                zip(cursor.fetchall(), rows):
+            row_uuid = row['meta']['instanceID']
+            instance = Instance(
+                id=pk, xform=xform, user=users.get(submitted_by),
+                survey_type=survey_type, uuid=row_uuid.replace('uuid:', ''),
+                version=xform.version,
+                date_created=_get_submission_date(submission_date),
+                xml=dict2xmlsubmission(row, xform, row_uuid,
+                                       submission_date))
+            instance._parser = DictInstanceParser({root_name: row}, xform)
+            instance._set_geom()
+            instance._set_json()
+            instance._set_checksum()
+            instances.append(instance)
+
+        # bulk_create sets date_created to the time of the INSERT, on the
+        # instances too, the submission dates are restored after it
+        dates = [i.date_created for i in instances]
+        Instance.objects.bulk_create(instances)
+
+        cursor.execute(
+            'UPDATE logger_instance SET date_created = v.date_created '
+            'FROM (VALUES {}) AS v (id, date_created) '
+            'WHERE logger_instance.id = v.id'.format(
+                ', '.join(['(%s, %s)'] * len(instances))),
+            list(chain.from_iterable(
+                [(i.pk, date) for i, date in zip(instances, dates)])))
+        for instance, date in zip(instances, dates):
+            instance.date_created = date
+
+        parsed_instances = [ParsedInstance(instance=i) for i in instances]
+        for parsed_instance in parsed_instances:
+            parsed_instance._set_geopoint()
+        ParsedInstance.objects.bulk_create(parsed_instances)
+
+        # bulk_create sends no post_save
+        materialize_new_instances(xform.pk, [i.pk for i in instances])
+
+    bump_xform_data_version(xform.pk)
+    process_submissions(xform.pk, [(i.pk, True) for i in instances])
+
+    return instances
+
+
+def _csv_submission_rows(csv_reader, addition_col, xform, submission_time):
+    """
+    Yields the (submission dict, row uuid, username, submission date) of each
+    CSV row.
+    """
+    ona_uuid = {'formhub': {'uuid': xform.uuid}}
+
+    for row in csv_reader:
+        # remove the additional columns
+        for index in addition_col:
+            del row[index]
+
+        # fetch submission uuid before purging row metadata
+        row_uuid = row.get('_uuid')
+        submitted_by = row.get('_submitted_by')
+        submission_date = row.get('_submission_time', submission_time)
+
+        location_data = {}
+        for key in row.keys():  # seems faster than a comprehension
+            # remove metadata (keys starting with '_')
+            if key.startswith('_'):
+                del row[key]
+
+            # Collect row location data into separate location_data dict
+            if key.endswith(('.latitude', '.longitude',
+                            '.altitude', '.precision')):
+                location_key, location_prop = key.rsplit(u'.', 1)
+                location_data.setdefault(location_key, {}).update(
+                    {location_prop: row.get(key, '0')})
+            # remove 'n/a' values
+            if not key.startswith('_') and row[key] == 'n/a':
+                del row[key]
+
+        # collect all location K-V pairs into single geopoint field(s)
+        # in location_data dict
+        for location_key in location_data.keys():
+            location_data.update(
+                {location_key:
+                 (u'%(latitude)s %(longitude)s '
+                  '%(altitude)s %(precision)s') % defaultdict(
+                      lambda: '', location_data.get(location_key))})
+
+        row = csv_dict_to_nested_dict(row)
+        location_data = csv_dict_to_nested_dict(location_data)
+
+        row = dict_merge(row, location_data)
+
+        # inject our form's uuid into the submission
+        row.update(ona_uuid)
+
+        yield row, row_uuid, submitted_by, submission_date
+
+
+def _submit_csv_row(username, xform, row, submitted_by, submission_date):
+    """Submits one row as an xml submission, returns the error if any."""
+    row_uuid = row.get('meta').get('instanceID')
+    xml_file = cStringIO.StringIO(
+        dict2xmlsubmission(row, xform, row_uuid, submission_date))
+
+    try:
+        error, instance = safe_create_instance(username, xml_file, [],
+                                               xform.uuid, None)
+    except ValueError as e:
+        error = e
+
+    if not error:
+        users = User.objects.filter(
+            username=submitted_by) if submitted_by else []
+        if users:
+            instance.user = users[0]
+            instance.save()
+
+    return error
+
+
+def _submit_csv_rows(username, xform, rows, bulk, rollback_uuids):
+    """
+    Submits the rows yielded by :py:func:`_csv_submission_rows`, returns the
+    error if any and the number of edited submissions.
+    """
+    edited = set()
+    if bulk:
+        edited = set(xform.instances.filter(
+            uuid__in=[r[1] for r in rows if r[1]]
+        ).values_list('uuid', flat=True))
+
+    new_rows = []
+    updates = 0
+    for row, row_uuid, submitted_by, submission_date in rows:
+        if bulk and row_uuid not in edited:
+            row_uuid = None
+
+        old_meta = row.get('meta', {})
+        new_meta, update = get_submission_meta_dict(xform, row_uuid)
+        old_meta.update(new_meta)
+        row.update({'meta': old_meta})
+
+        rollback_uuids.append(
+            row.get('meta').get('instanceID').replace('uuid:', ''))
+
+        if bulk and not update:
+            new_rows.append((row, submission_date, submitted_by))
+            continue
+
+        updates += update
+        error = _submit_csv_row(username, xform, row, submitted_by,
+                                submission_date)
+        if error:
+            return error, updates
+
+    if new_rows:
+        bulk_create_instances(xform, new_rows)
+
+    return None, updates
+
+
 @task()
-def submit_csv_async(username, xform, csv_file_temp_path):
+def submit_csv_async(username, xform, csv_file_temp_path, bulk=False):
     with codecs.open(csv_file_temp_path, encoding='utf-8') as csv_file:
-        return submit_csv(username, xform, csv_file)
+        return submit_csv(username, xform, csv_file, bulk)
 
 
-def submit_csv(username, xform, csv_file):
+def submit_csv(username, xform, csv_file, bulk=False):
     """ Imports CSV data to an existing form
 
     Takes a csv formatted file or string containing rows of submission/instance
     and converts those to xml submissions and finally submits them by calling
     :py:func:`onadata.libs.utils.logger_tools.safe_create_instance`
 
+    With `bulk` new submissions are saved CSV_IMPORT_BATCH_SIZE rows at a time
+    by :py:func:`bulk_create_instances`, edits are still submitted one by one.
+
     :param str username: the subission user
     :param onadata.apps.logger.models.XForm xfrom: The submission's XForm.
     :param (str or file): A CSV formatted file with submission rows.
+    :param bool bulk: Save new submissions in bulk.
     :return: If sucessful, a dict with import summary else dict with error str.
     :rtype: Dict
     """
@@ -190,77 +411,26 @@ def submit_csv(username, xform, csv_file):
 
     rollback_uuids = []
     submission_time = datetime.utcnow().isoformat()
-    ona_uuid = {'formhub': {'uuid': xform.uuid}}
-    error = None
+    rows = _csv_submission_rows(csv_reader, addition_col, xform,
+                                submission_time)
+    batch_size = CSV_IMPORT_BATCH_SIZE if bulk else 1
     additions = inserts = 0
     try:
-        for row in csv_reader:
-            # remove the additional columns
-            for index in addition_col:
-                del row[index]
-
-            # fetch submission uuid before purging row metadata
-            row_uuid = row.get('_uuid')
-            submitted_by = row.get('_submitted_by')
-            submission_date = row.get('_submission_time', submission_time)
-
-            location_data = {}
-            for key in row.keys():  # seems faster than a comprehension
-                # remove metadata (keys starting with '_')
-                if key.startswith('_'):
-                    del row[key]
-
-                # Collect row location data into separate location_data dict
-                if key.endswith(('.latitude', '.longitude',
-                                '.altitude', '.precision')):
-                    location_key, location_prop = key.rsplit(u'.', 1)
-                    location_data.setdefault(location_key, {}).update(
-                        {location_prop: row.get(key, '0')})
-                # remove 'n/a' values
-                if not key.startswith('_') and row[key] == 'n/a':
-                    del row[key]
-
-            # collect all location K-V pairs into single geopoint field(s)
-            # in location_data dict
-            for location_key in location_data.keys():
-                location_data.update(
-                    {location_key:
-                     (u'%(latitude)s %(longitude)s '
-                      '%(altitude)s %(precision)s') % defaultdict(
-                          lambda: '', location_data.get(location_key))})
-
-            row = csv_dict_to_nested_dict(row)
-            location_data = csv_dict_to_nested_dict(location_data)
-
-            row = dict_merge(row, location_data)
-
-            # inject our form's uuid into the submission
-            row.update(ona_uuid)
-
-            old_meta = row.get('meta', {})
-            new_meta, update = get_submission_meta_dict(xform, row_uuid)
-            inserts += update
-            old_meta.update(new_meta)
-            row.update({'meta': old_meta})
-
-            row_uuid = row.get('meta').get('instanceID')
-            rollback_uuids.append(row_uuid.replace('uuid:', ''))
-
-            xml_file = cStringIO.StringIO(
-                dict2xmlsubmission(row, xform, row_uuid, submission_date))
-
-            try:
-                error, instance = safe_create_instance(username, xml_file, [],
-                                                       xform.uuid, None)
-            except ValueError as e:
-                error = e
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            error, updates = _submit_csv_rows(username, xform, batch, bulk,
+                                              rollback_uuids)
 
             if error:
                 Instance.objects.filter(uuid__in=rollback_uuids,
                                         xform=xform).delete()
                 return async_status(FAILED, str(error))
             else:
-                additions += 1
+                additions += len(batch)
+                inserts += updates
                 try:
                     current_task.update_state(state='PROGRESS',
                                               meta={'progress': additions,
@@ -269,12 +439,6 @@ def submit_csv(username, xform, csv_file):
                 except:
                     pass
 
-                users = User.objects.filter(
-                    username=submitted_by) if submitted_by else []
-                if users:
-                    instance.user = users[0]
-                    instance.save()
-
     except UnicodeDecodeError:
         Instance.objects.filter(uuid__in=rollback_uuids,
                                 xform=xform).delete()
@@ -1,20 +1,26 @@
 import csv
+from collections import deque
 from datetime import datetime, date
+from itertools import imap
+from multiprocessing import Pool, current_process
 import six
 import uuid
 from zipfile import ZipFile
 
 from django.conf import settings
 from django.core.files.temp import NamedTemporaryFile
+from django.db import connection
 from openpyxl.utils.datetime import to_excel
 from openpyxl.workbook import Workbook
 from pyxform.question import Question
 from pyxform.section import Section, RepeatingSection
 from savReaderWriter import SavWriter
 
+from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import _encode_for_mongo,\
     QUESTION_TYPES_TO_EXCLUDE
 from onadata.apps.viewer.models.data_dictionary import DataDictionary
+from onadata.apps.viewer.models.export import INCREMENTAL_EXPORT_KEY
 from onadata.libs.utils.common_tags import (
     ID, XFORM_ID_STRING, STATUS, ATTACHMENTS, GEOLOCATION, BAMBOO_DATASET_ID,
     DELETEDAT, INDEX, PARENT_INDEX, PARENT_TABLE_NAME,
@@ -26,6 +32,9 @@ from onadata.libs.utils.mongo import _is_invalid_for_mongo,\
 # the bind type of select multiples that we use to compare
 MULTIPLE_SELECT_BIND_TYPE = u"select"
 GEOPOINT_BIND_TYPE = u"geopoint"
+# the celery queue of the chunks of partitioned exports built in workers, a
+# queue of its own keeps the waiting export tasks from starving the chunks
+EXPORT_PARTITION_QUEUE = getattr(settings, 'EXPORT_PARTITION_QUEUE', None)
 
 
 def current_site_url(path):
@@ -162,6 +171,70 @@ def dict_to_joined_export(data, index, indices, name, survey, row,
     return output
 
 
+class PartitionedRecords(object):
+    """
+    The records of an export as chunks of submission ids, the chunks are
+    read and turned into rows by `processes` worker processes.
+    """
+
+    def __init__(self, id_chunks, processes):
+        self.id_chunks = id_chunks
+        self.processes = processes
+
+
+# the export builder of the worker processes of a partitioned export
+_chunk_export_builder = None
+
+
+def _set_chunk_export_builder(export_builder):
+    global _chunk_export_builder
+    _chunk_export_builder = export_builder
+
+
+def _get_chunk_rows(args):
+    return _chunk_export_builder.get_chunk_rows(*args)
+
+
+def _iter_chunk_subtasks(export_builder, tasks, size):
+    """
+    Yields the rows of the chunks `tasks` built by celery subtasks in order,
+    with at most `size` subtasks queued or done and not yet consumed.
+    """
+    # imported here, the viewer tasks import the export tools
+    from onadata.apps.viewer.tasks import get_export_chunk_rows
+
+    options = {'queue': EXPORT_PARTITION_QUEUE} \
+        if EXPORT_PARTITION_QUEUE else {}
+    pending = deque()
+    try:
+        for ids, media_xpaths in tasks:
+            if len(pending) >= size:
+                yield pending.popleft().get()
+            pending.append(get_export_chunk_rows.apply_async(
+                args=[export_builder, ids, media_xpaths], **options))
+
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        for result in pending:
+            result.revoke()
+
+
+def _imap_bounded(pool, func, tasks, size):
+    """
+    Yields the results of `func` for `tasks` in order, as pool.imap does,
+    with at most `size` tasks queued or done and not yet consumed.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= size:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+
+    while pending:
+        yield pending.popleft().get()
+
+
 class ExportBuilder(object):
     IGNORED_COLUMNS = [XFORM_ID_STRING, STATUS, ATTACHMENTS, GEOLOCATION,
                        BAMBOO_DATASET_ID, DELETEDAT]
@@ -195,6 +268,7 @@ class ExportBuilder(object):
 
     XLS_SHEET_NAME_MAX_CHARS = 31
     url = None
+    incremental_state = None
 
     @classmethod
     def string_to_date_with_xls_validation(cls, date_str):
@@ -473,6 +547,114 @@ class ExportBuilder(object):
 
         return row
 
+    def _iter_section_rows(self, data, media_xpaths, index=1, indices=None):
+        """
+        Yields (section, row) for the rows of every section of the records in
+        `data`, records are numbered from `index` and repeats from the counts
+        in `indices`.
+        """
+        indices = {} if indices is None else indices
+        survey_name = self.survey.name
+        for d in data:
+            # decode mongo section names
+            joined_export = dict_to_joined_export(d, index, indices,
+                                                  survey_name,
+                                                  self.survey, d,
+                                                  media_xpaths)
+            output = ExportBuilder.decode_mongo_encoded_section_names(
+                joined_export)
+            # attach meta fields (index, parent_index, parent_table)
+            # output has keys for every section
+            if survey_name not in output:
+                output[survey_name] = {}
+            output[survey_name][INDEX] = index
+            output[survey_name][PARENT_INDEX] = -1
+            for section in self.sections:
+                # section name might not exist within the output, e.g. data was
+                # not provided for said repeat - write test to check this
+                row = output.get(section['name'], None)
+                if type(row) == dict:
+                    yield section, self.pre_process_row(row, section)
+                elif type(row) == list:
+                    for child_row in row:
+                        yield section, self.pre_process_row(child_row, section)
+            index += 1
+
+    def _get_chunk_records(self, ids):
+        # submissions deleted since the ids were read are left out
+        return Instance.objects.filter(pk__in=ids, deleted_at__isnull=True)\
+            .order_by('pk').values_list('json', flat=True).iterator()
+
+    def get_chunk_rows(self, ids, media_xpaths):
+        """
+        Returns the (section name, row) pairs of the submissions `ids`
+        numbered from 1 and the number of rows of each section.
+        """
+        survey_name = self.survey.name
+        indices = {}
+        rows = [(section['name'], row) for section, row in
+                self._iter_section_rows(self._get_chunk_records(ids),
+                                        media_xpaths, 1, indices)]
+        counts = ExportBuilder.decode_mongo_encoded_section_names(indices)
+        counts[survey_name] = len(
+            [name for name, row in rows if name == survey_name])
+
+        return rows, counts
+
+    def _iter_partitioned_rows(self, records, media_xpaths):
+        """
+        Yields (section, row) for the rows of the chunks of `records` which
+        are processed in parallel.
+
+        Records and repeats are numbered within each chunk and shifted here
+        by the number of rows of the section and of its parent section in
+        the previous chunks, chunks may hold fewer records than ids.
+        """
+        sections = dict([(s['name'], s) for s in self.sections])
+        survey_name = self.survey.name
+        tasks = ((ids, media_xpaths) for ids in records.id_chunks)
+
+        pool = None
+        # daemon processes e.g. celery prefork workers can not start
+        # processes of their own, the chunks are built by other workers
+        if records.processes > 1 and current_process().daemon:
+            results = _iter_chunk_subtasks(self, tasks, records.processes * 2)
+        # workers need a connection of their own, one that is within a
+        # transaction can not be closed
+        elif records.processes > 1 and not connection.in_atomic_block:
+            connection.close()
+            pool = Pool(records.processes, _set_chunk_export_builder, [self])
+            # the rows of at most two chunks per process are held at a time
+            results = _imap_bounded(pool, _get_chunk_rows, tasks,
+                                    records.processes * 2)
+        else:
+            _set_chunk_export_builder(self)
+            results = imap(_get_chunk_rows, tasks)
+
+        offsets = {}
+        try:
+            for rows, counts in results:
+                for section_name, row in rows:
+                    row[INDEX] += offsets.get(section_name, 0)
+                    if section_name != survey_name:
+                        parent = _decode_from_mongo(row[PARENT_TABLE_NAME])
+                        row[PARENT_INDEX] += offsets.get(parent, 0)
+                    yield sections[section_name], row
+
+                for key, count in counts.iteritems():
+                    offsets[key] = offsets.get(key, 0) + count
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    def iter_rows(self, data, media_xpaths):
+        """Yields (section, row) for the rows of every section of `data`."""
+        if isinstance(data, PartitionedRecords):
+            return self._iter_partitioned_rows(data, media_xpaths)
+
+        return self._iter_section_rows(data, media_xpaths)
+
     def to_zipped_csv(self, path, data, *args, **kwargs):
         def write_row(row, csv_writer, fields):
             csv_writer.writerow(
@@ -515,42 +697,11 @@ class ExportBuilder(object):
                     writer = csv_defs[section['name']]['csv_writer']
                     writer.writerow(hxl_row)
 
-        index = 1
-        indices = {}
-        survey_name = self.survey.name
-        for d in data:
-            # decode mongo section names
-            joined_export = dict_to_joined_export(d, index, indices,
-                                                  survey_name,
-                                                  self.survey, d,
-                                                  media_xpaths)
-            output = ExportBuilder.decode_mongo_encoded_section_names(
-                joined_export)
-            # attach meta fields (index, parent_index, parent_table)
-            # output has keys for every section
-            if survey_name not in output:
-                output[survey_name] = {}
-            output[survey_name][INDEX] = index
-            output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to csv
-                section_name = section['name']
-                csv_def = csv_defs[section_name]
-                fields = self.get_fields(dataview, section, 'xpath')
-                csv_writer = csv_def['csv_writer']
-                # section name might not exist within the output, e.g. data was
-                # not provided for said repeat - write test to check this
-                row = output.get(section_name, None)
-                if type(row) == dict:
-                    write_row(
-                        self.pre_process_row(row, section),
-                        csv_writer, fields)
-                elif type(row) == list:
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            csv_writer, fields)
-            index += 1
+        for section, row in self.iter_rows(data, media_xpaths):
+            # write the row to the csv of its section
+            csv_writer = csv_defs[section['name']]['csv_writer']
+            fields = self.get_fields(dataview, section, 'xpath')
+            write_row(row, csv_writer, fields)
 
         # write zipfile
         with ZipFile(path, 'w') as zip_file:
@@ -643,41 +794,11 @@ class ExportBuilder(object):
                            for col in headers]
                 hxl_row and ws.append(hxl_row)
 
-        index = 1
-        indices = {}
-        survey_name = self.survey.name
-        for d in data:
-            joined_export = dict_to_joined_export(d, index, indices,
-                                                  survey_name,
-                                                  self.survey, d,
-                                                  media_xpaths)
-            output = ExportBuilder.decode_mongo_encoded_section_names(
-                joined_export)
-            # attach meta fields (index, parent_index, parent_table)
-            # output has keys for every section
-            if survey_name not in output:
-                output[survey_name] = {}
-            output[survey_name][INDEX] = index
-            output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to xls
-                section_name = section['name']
-                fields = self.get_fields(dataview, section, 'xpath')
-
-                ws = work_sheets[section_name]
-                # section might not exist within the output, e.g. data was
-                # not provided for said repeat - write test to check this
-                row = output.get(section_name, None)
-                if type(row) == dict:
-                    write_row(
-                        self.pre_process_row(row, section),
-                        ws, fields, work_sheet_titles)
-                elif type(row) == list:
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            ws, fields, work_sheet_titles)
-            index += 1
+        for section, row in self.iter_rows(data, media_xpaths):
+            # write the row to the sheet of its section
+            ws = work_sheets[section['name']]
+            fields = self.get_fields(dataview, section, 'xpath')
+            write_row(row, ws, fields, work_sheet_titles)
 
         wb.save(filename=path)
 
@@ -700,7 +821,16 @@ class ExportBuilder(object):
             self.INCLUDE_HXL, win_excel_utf8=win_excel_utf8
         )
 
-        csv_builder.export_to(path, dataview=dataview)
+        if kwargs.get('incremental'):
+            previous_export = kwargs.get('previous_export')
+            if previous_export is not None:
+                self.incremental_state = csv_builder.export_incremental(
+                    path, previous_export.full_filepath,
+                    previous_export.options.get(INCREMENTAL_EXPORT_KEY))
+            else:
+                self.incremental_state = csv_builder.export_incremental(path)
+        else:
+            csv_builder.export_to(path, dataview=dataview)
 
     def get_default_language(self, languages):
         language = self.dd.default_language
@@ -833,42 +963,13 @@ class ExportBuilder(object):
         media_xpaths = [] if not self.INCLUDE_IMAGES \
             else self.dd.get_media_survey_xpaths()
 
-        index = 1
-        indices = {}
-        survey_name = self.survey.name
-        for d in data:
-            # decode mongo section names
-            joined_export = dict_to_joined_export(d, index, indices,
-                                                  survey_name,
-                                                  self.survey, d,
-                                                  media_xpaths)
-            output = ExportBuilder.decode_mongo_encoded_section_names(
-                joined_export)
-            # attach meta fields (index, parent_index, parent_table)
-            # output has keys for every section
-            if survey_name not in output:
-                output[survey_name] = {}
-            output[survey_name][INDEX] = index
-            output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to csv
-                section_name = section['name']
-                sav_def = sav_defs[section_name]
-                fields = [
-                    element['xpath'] for element in
-                    section['elements']] + self.EXTRA_FIELDS
-                sav_writer = sav_def['sav_writer']
-                row = output.get(section_name, None)
-                if type(row) == dict:
-                    write_row(
-                        self.pre_process_row(row, section),
-                        sav_writer, fields)
-                elif type(row) == list:
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            sav_writer, fields)
-            index += 1
+        for section, row in self.iter_rows(data, media_xpaths):
+            # write the row to the sav file of its section
+            sav_writer = sav_defs[section['name']]['sav_writer']
+            fields = [
+                element['xpath'] for element in
+                section['elements']] + self.EXTRA_FIELDS
+            write_row(row, sav_writer, fields)
 
         for section_name, sav_def in sav_defs.iteritems():
             sav_def['sav_writer'].closeSavFile(
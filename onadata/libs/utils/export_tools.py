@@ -21,14 +21,16 @@ from onadata.apps.logger.models import XForm
 from onadata.apps.logger.models.data_view import DataView
 from onadata.apps.main.models.meta_data import MetaData
 from onadata.apps.viewer.models.export import Export,\
-    get_export_options_query_kwargs
+    INCREMENTAL_EXPORT_KEY, get_export_options_query_kwargs
+from onadata.apps.viewer.models.parsed_instance import get_sql_with_params
 from onadata.apps.viewer.models.parsed_instance import query_data
 from onadata.libs.exceptions import J2XException, NoRecordsFoundError
-from onadata.libs.utils.viewer_tools import create_attachments_zipfile,\
+from onadata.libs.utils.viewer_tools import save_attachments_zipfile,\
     image_urls
 from onadata.libs.utils.common_tags import (
     GROUPNAME_REMOVED_FLAG, DATAVIEW_EXPORT)
 from onadata.libs.utils.export_builder import ExportBuilder
+from onadata.libs.utils.export_builder import PartitionedRecords
 from onadata.libs.utils.osm import get_combined_osm
 from onadata.libs.utils.model_tools import (
     queryset_iterator, get_columns_with_hxl)
@@ -37,6 +39,14 @@ from onadata.libs.utils.common_tools import str_to_bool
 
 DEFAULT_GROUP_DELIMITER = '/'
 EXPORT_QUERY_KEY = 'query'
+# exports of more than EXPORT_PARTITION_SIZE submissions are built by
+# EXPORT_PARTITION_PROCESSES processes when it is more than one
+EXPORT_PARTITION_PROCESSES = getattr(settings, 'EXPORT_PARTITION_PROCESSES',
+                                     1)
+EXPORT_PARTITION_SIZE = getattr(settings, 'EXPORT_PARTITION_SIZE', 10000)
+# CSV exports of a whole form are built from the previous export of the form
+# by rewriting the edited rows and appending the new ones
+INCREMENTAL_EXPORTS = getattr(settings, 'INCREMENTAL_EXPORTS', False)
 
 
 def dict_to_flat_export(d, parent_index=0):
@@ -60,6 +70,45 @@ def get_export_options(options):
     return export_options
 
 
+def get_partitioned_records(xform, query=None, start=None, end=None,
+                            processes=EXPORT_PARTITION_PROCESSES,
+                            size=EXPORT_PARTITION_SIZE):
+    """
+    Returns the submissions to export as chunks of `size` submission ids,
+    None when there is only one chunk.
+    """
+    sql, params, records = get_sql_with_params(xform, query=query,
+                                               start=start, end=end)
+    ids = list(records.values_list('id', flat=True))
+
+    if len(ids) <= size:
+        return None
+
+    return PartitionedRecords(
+        [ids[i:i + size] for i in xrange(0, len(ids), size)], processes)
+
+
+def get_previous_incremental_export(xform, export_type, options):
+    """
+    Returns the latest successful export of `xform` with the same options
+    that recorded an incremental export state, None if there is none.
+    """
+    export_options = get_export_options(options)
+    exports = Export.objects.filter(
+        xform=xform, export_type=export_type,
+        internal_status=Export.SUCCESSFUL,
+        options__has_key=INCREMENTAL_EXPORT_KEY,
+        **get_export_options_query_kwargs(options)).order_by('-created_on')
+
+    for export in exports[:Export.MAX_EXPORTS]:
+        previous_options = dict(export.options)
+        previous_options.pop(INCREMENTAL_EXPORT_KEY)
+        if previous_options == export_options and export.filepath:
+            return export
+
+    return None
+
+
 def get_or_create_export(export_id, xform, export_type, options):
     if export_id:
         try:
@@ -108,11 +157,25 @@ def generate_export(export_type, xform, export_id=None, options=None):
             user__username__iexact=username, id_string__iexact=id_string)
 
     dataview = None
+    records = None
     if options.get("dataview_pk"):
         dataview = DataView.objects.get(pk=options.get("dataview_pk"))
-        records = dataview.query_data(dataview, all_data=True)
-    else:
-        records = query_data(xform, query=filter_query, start=start, end=end)
+        records = dataview.query_data(dataview, all_data=True, stream=True)
+    elif EXPORT_PARTITION_PROCESSES > 1 and export_type in [
+            Export.XLS_EXPORT, Export.CSV_ZIP_EXPORT, Export.SAV_ZIP_EXPORT]:
+        records = get_partitioned_records(
+            xform, filter_query, start, end,
+            processes=EXPORT_PARTITION_PROCESSES, size=EXPORT_PARTITION_SIZE)
+
+    if records is None:
+        records = query_data(xform, query=filter_query, start=start, end=end,
+                             stream=True)
+
+    incremental = INCREMENTAL_EXPORTS and \
+        export_type == Export.CSV_EXPORT and not dataview and \
+        not filter_query and start is None and end is None
+    previous_export = incremental and get_previous_incremental_export(
+        xform, export_type, options) or None
 
     export_builder = ExportBuilder()
 
@@ -153,7 +216,8 @@ def generate_export(export_type, xform, export_id=None, options=None):
         func.__call__(
             temp_file.name, records, username, id_string, filter_query,
             start=start, end=end, dataview=dataview, xform=xform,
-            options=options, columns_with_hxl=columns_with_hxl
+            options=options, columns_with_hxl=columns_with_hxl,
+            incremental=incremental, previous_export=previous_export
         )
     except NoRecordsFoundError:
         pass
@@ -207,6 +271,9 @@ def generate_export(export_type, xform, export_id=None, options=None):
     # Get URL of the exported sheet.
     if export_type == Export.GOOGLE_SHEETS_EXPORT:
         export.export_url = export_builder.url
+    if export_builder.incremental_state is not None:
+        export.options[INCREMENTAL_EXPORT_KEY] = \
+            export_builder.incremental_state
 
     # if we should create a new export is true, we should not save it
     if start is None and end is None:
@@ -321,7 +388,7 @@ def generate_attachments_zip_export(export_type, username, id_string,
 
     if options.get("dataview_pk"):
         dataview = DataView.objects.get(pk=options.get("dataview_pk"))
-        records = dataview.query_data(dataview, all_data=True)
+        records = dataview.query_data(dataview, all_data=True, stream=True)
         instances_ids = [rec.get('_id') for rec in records]
         attachments = Attachment.objects.filter(instance_id__in=instances_ids)
     else:
@@ -336,21 +403,7 @@ def generate_attachments_zip_export(export_type, username, id_string,
         id_string,
         export_type,
         filename)
-    storage = get_storage_class()()
-    zip_file = None
-
-    try:
-        zip_file = create_attachments_zipfile(attachments)
-
-        try:
-            temp_file = open(zip_file.name)
-            export_filename = storage.save(
-                file_path,
-                File(temp_file, file_path))
-        finally:
-            temp_file.close()
-    finally:
-        zip_file and zip_file.close()
+    export_filename = save_attachments_zipfile(attachments, file_path)
 
     dir_name, basename = os.path.split(export_filename)
 
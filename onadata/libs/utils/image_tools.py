@@ -1,14 +1,19 @@
-import requests
+import logging
 
 from cStringIO import StringIO
 from PIL import Image
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import get_storage_class
 from django.core.files.base import ContentFile
 
 from tempfile import NamedTemporaryFile
 
+from onadata.libs.utils.cache_tools import (
+    ATTACHMENT_THUMBNAILS,
+    ATTACHMENT_THUMBNAILS_FAILURE_TIMEOUT,
+    ATTACHMENT_THUMBNAILS_LOCK_TIMEOUT)
 from onadata.libs.utils.viewer_tools import get_path
 
 
@@ -50,57 +55,108 @@ def _save_thumbnails(image, path, size, suffix):
 
 
 def resize(filename):
+    """
+    Creates all the thumbnails of the image `filename` from one decode of the
+    image, each size is made from the previous larger one.
+    """
     default_storage = get_storage_class()()
-    path = default_storage.url(filename)
-    req = requests.get(path)
-    if req.status_code == 200:
-        try:
-            im = StringIO(req.content)
-            image = Image.open(im)
-            conf = settings.THUMB_CONF
-            [_save_thumbnails(
-                image, filename,
-                conf[key]['size'],
-                conf[key]['suffix']) for key in settings.THUMB_ORDER]
-        except IOError:
-            raise Exception("The image file couldn't be identified")
-
-
-def resize_local_env(filename):
-    default_storage = get_storage_class()()
-    path = default_storage.path(filename)
-    image = Image.open(path)
     conf = settings.THUMB_CONF
+    largest = conf[settings.THUMB_ORDER[0]]['size']
+
+    try:
+        with default_storage.open(filename) as f:
+            image = Image.open(StringIO(f.read()))
+        # a JPEG is decoded at the smallest scale that is still larger than
+        # the largest thumbnail
+        image.draft(image.mode, (largest, largest))
+        [_save_thumbnails(
+            image, filename,
+            conf[key]['size'],
+            conf[key]['suffix']) for key in settings.THUMB_ORDER]
+    except IOError:
+        raise Exception("The image file couldn't be identified")
+
+
+def _thumbnails_key(attachment_id):
+    return '{}{}'.format(ATTACHMENT_THUMBNAILS, attachment_id)
+
+
+def get_thumbnail_sizes(attachment):
+    """
+    Returns the thumbnail sizes created for an attachment, None when they
+    have not been created yet.
+    """
+    return cache.get(_thumbnails_key(attachment.pk))
+
+
+def create_thumbnails(attachment, force=False):
+    """
+    Creates the thumbnails of an image attachment unless they exist and
+    records which sizes the attachment has, a failure is only recorded for
+    a while e.g. the media file may not be in the storage yet.
+    """
+    default_storage = get_storage_class()()
+    filename = attachment.media_file.name
+    paths = [get_path(filename, settings.THUMB_CONF[key]['suffix'])
+             for key in settings.THUMB_ORDER]
+    sizes = []
+
+    try:
+        if force or not all(default_storage.exists(p) for p in paths):
+            resize(filename)
+        sizes = settings.THUMB_ORDER
+    except Exception as e:
+        logging.exception(u"Thumbnails of %s failed: %s" % (filename, e))
+    finally:
+        cache.set(_thumbnails_key(attachment.pk), sizes,
+                  None if sizes else ATTACHMENT_THUMBNAILS_FAILURE_TIMEOUT)
+        cache.delete(_thumbnails_key(attachment.pk) + '-lock')
+
+    return sizes
+
 
-    [_save_thumbnails(
-        image, path, conf[key]['size'],
-        conf[key]['suffix']) for key in settings.THUMB_ORDER]
+def queue_thumbnails(attachment):
+    """
+    Creates the thumbnails of an image attachment in the background, once
+    however many times it is asked for.
+    """
+    from onadata.apps.logger.tasks import create_thumbnails_async
+
+    if cache.add(_thumbnails_key(attachment.pk) + '-lock', True,
+                 ATTACHMENT_THUMBNAILS_LOCK_TIMEOUT):
+        create_thumbnails_async.delay(attachment.pk)
+
+
+def get_thumbnail_path(attachment, suffix):
+    """
+    Returns the storage path of the `suffix` thumbnail of an attachment,
+    None when it has not been created, without checking the storage.
+    """
+    if not attachment.mimetype.startswith('image'):
+        return None
+
+    sizes = get_thumbnail_sizes(attachment)
+
+    if sizes is None:
+        queue_thumbnails(attachment)
+        # thumbnails are created inline when celery runs tasks eagerly
+        sizes = get_thumbnail_sizes(attachment)
+
+    if sizes and suffix in sizes:
+        return get_path(attachment.media_file.name,
+                        settings.THUMB_CONF[suffix]['suffix'])
 
 
 def image_url(attachment, suffix):
     '''Return url of an image given size(@param suffix)
-    e.g large, medium, small, or generate required thumbnail
+    e.g large, medium, small, the url of the original image is returned until
+    the thumbnail is created
     '''
     url = attachment.media_file.url
-    if suffix == 'original':
-        return url
-    else:
-        default_storage = get_storage_class()()
-        fs = get_storage_class('django.core.files.storage.FileSystemStorage')()
-        if suffix in settings.THUMB_CONF:
-            size = settings.THUMB_CONF[suffix]['suffix']
-            filename = attachment.media_file.name
-            if default_storage.exists(filename):
-                if default_storage.exists(get_path(filename, size)) and\
-                        default_storage.size(get_path(filename, size)) > 0:
-                    url = default_storage.url(
-                        get_path(filename, size))
-                else:
-                    if default_storage.__class__ != fs.__class__:
-                        resize(filename)
-                    else:
-                        resize_local_env(filename)
-                    return image_url(attachment, suffix)
-            else:
-                return None
+    if suffix != 'original' and suffix in settings.THUMB_CONF:
+        path = get_thumbnail_path(attachment, suffix)
+        if path:
+            default_storage = get_storage_class()()
+            url = default_storage.url(path)
+
     return url
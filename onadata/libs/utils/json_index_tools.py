@@ -0,0 +1,167 @@
+from hashlib import md5
+
+from django.db import DatabaseError, connection
+from django.utils.translation import ugettext as _
+
+from onadata.libs.utils.cache_tools import get_filter_field_counts
+
+# names of the indexes are the prefix, the form id and a hash of the field
+JSON_INDEX_PREFIX = u'logger_instance_json_'
+GIN_INDEX_SUFFIX = u'gin'
+
+
+def _get_index_prefix(xform):
+    return u'{}{}_'.format(JSON_INDEX_PREFIX, xform.pk)
+
+
+def get_json_index_name(xform, field=None):
+    """
+    Returns the name of the index of `field` of the form, of the GIN index
+    of the whole json when `field` is None.
+    """
+    suffix = GIN_INDEX_SUFFIX if field is None \
+        else md5(field.encode('utf-8')).hexdigest()[:8]
+
+    return _get_index_prefix(xform) + suffix
+
+
+def get_json_index_expression(xform, field):
+    """
+    Returns the expression get_where_clause and json_order_by filter and
+    sort `field` with, an index is only used for a query with the very same
+    expression.
+    """
+    integers = [e.get_abbreviated_xpath()
+                for e in xform.get_survey_elements_of_type('integer')]
+
+    if field in integers:
+        return u"CAST(json->>%s AS INT)"
+
+    return u"json->>%s"
+
+
+def _execute(sql, params=None):
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+
+    return cursor
+
+
+def _check_autocommit():
+    # indexes are built and dropped concurrently so that submissions are not
+    # locked out, which can only be done out of a transaction
+    if connection.in_atomic_block:
+        raise ValueError(_(u"Indexes can not be changed within a "
+                           u"transaction"))
+
+
+def get_json_indexes(xform):
+    """
+    Returns the json indexes of the form as dicts of the index name,
+    definition and whether it is valid, a concurrent build that failed or
+    is still running leaves an invalid index.
+    """
+    prefix = _get_index_prefix(xform).replace(u'_', u'\\_')
+    cursor = _execute(
+        u"SELECT i.indexname, i.indexdef, x.indisvalid FROM pg_indexes i "
+        u"JOIN pg_class c ON c.relname = i.indexname "
+        u"JOIN pg_index x ON x.indexrelid = c.oid "
+        u"WHERE i.tablename = 'logger_instance' AND i.indexname LIKE %s "
+        u"ORDER BY i.indexname", [prefix + u'%'])
+
+    return [{'name': name, 'definition': definition, 'valid': valid}
+            for name, definition, valid in cursor.fetchall()]
+
+
+def _get_index_validity(name):
+    """Returns whether the index is valid, None if it does not exist."""
+    cursor = _execute(
+        u"SELECT x.indisvalid FROM pg_index x "
+        u"JOIN pg_class c ON c.oid = x.indexrelid WHERE c.relname = %s",
+        [name])
+    row = cursor.fetchone()
+
+    return row[0] if row else None
+
+
+def _drop_index(name):
+    _execute(u"DROP INDEX CONCURRENTLY IF EXISTS {}".format(name))
+
+
+def _create_index(name, sql, params):
+    _check_autocommit()
+
+    # CREATE INDEX IF NOT EXISTS needs PostgreSQL 9.5
+    valid = _get_index_validity(name)
+    if valid:
+        return name
+    if valid is not None:
+        # left behind by a build that failed, it is maintained on writes
+        # but never used by queries
+        _drop_index(name)
+
+    try:
+        _execute(sql.format(name=name), params)
+    except DatabaseError as e:
+        _drop_index(name)
+        raise ValueError(_(u"Failed to create index %(name)s: %(error)s")
+                         % {'name': name, 'error': e})
+
+    return name
+
+
+def check_json_field(xform, field):
+    """Raises ValueError when `field` is not a field of the form."""
+    if field not in xform.get_field_name_xpaths_only():
+        raise ValueError(_(u"%s is not a field of the form") % field)
+
+
+def create_json_index(xform, field):
+    """
+    Creates an index on `field` of the submissions of the form and returns
+    the index name, the index only covers the rows of the form.
+    """
+    check_json_field(xform, field)
+
+    sql = u"CREATE INDEX CONCURRENTLY {name} ON logger_instance " \
+        u"((%s)) WHERE xform_id = %%s" \
+        % get_json_index_expression(xform, field)
+
+    return _create_index(get_json_index_name(xform, field), sql,
+                         [field, xform.pk])
+
+
+def create_json_gin_index(xform):
+    """
+    Creates a GIN index of the submission json of the form for containment
+    (@>) queries and returns the index name.
+    """
+    sql = u"CREATE INDEX CONCURRENTLY {name} ON logger_instance " \
+        u"USING GIN (json jsonb_path_ops) " \
+        u"WHERE xform_id = %s"
+
+    return _create_index(get_json_index_name(xform), sql, [xform.pk])
+
+
+def check_json_index(xform, name):
+    """Raises ValueError when `name` is not a json index of the form."""
+    if name not in [i['name'] for i in get_json_indexes(xform)]:
+        raise ValueError(_(u"%s is not an index of the form") % name)
+
+
+def drop_json_index(xform, name):
+    check_json_index(xform, name)
+    _check_autocommit()
+    _drop_index(name)
+
+
+def get_most_filtered_fields(xform, count):
+    """
+    Returns up to `count` fields of the form that its submissions are
+    filtered or sorted on most.
+    """
+    fields = xform.get_field_name_xpaths_only()
+    counts = get_filter_field_counts(xform.pk)
+
+    return sorted([f for f in counts if f in fields],
+                  key=lambda f: counts[f], reverse=True)[:count]
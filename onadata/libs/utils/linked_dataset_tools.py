@@ -0,0 +1,215 @@
+import json
+import logging
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.files.storage import get_storage_class
+
+from onadata.apps.logger.models.data_view import DataView
+from onadata.apps.logger.models.xform import XForm
+from onadata.apps.viewer.models.export import Export
+from onadata.libs.exceptions import NoRecordsPermission
+from onadata.libs.permissions import filter_queryset_xform_meta_perms_sql
+from onadata.libs.utils.cache_tools import (LINKED_DATASET_CSV,
+                                            LINKED_DATASET_CSV_LOCK_TIMEOUT,
+                                            bump_xform_manifest_version,
+                                            get_xform_data_version)
+from onadata.libs.utils.export_tools import generate_export
+from onadata.libs.utils.export_tools import parse_request_export_options
+from onadata.libs.utils.logger_tools import \
+    generate_content_disposition_header
+from onadata.libs.utils.media_tools import get_file_response
+from onadata.libs.utils.model_tools import get_columns_with_hxl
+
+EMPTY_HASH = u'md5:'
+
+
+def get_linked_dataset(data_value):
+    """
+    Returns the form, the dataview and the file name of a linked dataset
+    media value i.e. "xform <pk> <name>" or "dataview <pk> <name>", the form
+    is None when the value is not a linked dataset.
+    """
+    parts = data_value.split() if data_value else []
+    model = {'xform': XForm, 'dataview': DataView}.get(
+        parts[0] if parts else None)
+
+    if model is None or len(parts) < 2 or not parts[1].isdigit():
+        return None, None, None
+
+    obj = model.objects.filter(pk=parts[1]).first()
+    if obj is None:
+        return None, None, None
+
+    name = parts[2] if len(parts) > 2 else None
+    if isinstance(obj, DataView):
+        return obj.xform, obj, name
+
+    return obj, None, name
+
+
+def get_linked_dataset_options(xform, dataview, params):
+    """Returns the CSV export options of a linked dataset request."""
+    options = parse_request_export_options(params)
+    options['dataview_pk'] = dataview.pk if dataview else False
+
+    if dataview:
+        # imported here, api_export_tools imports the viewer tasks
+        from onadata.libs.utils.api_export_tools import include_hxl_row
+
+        columns_with_hxl = get_columns_with_hxl(xform.survey.get('children'))
+        if columns_with_hxl:
+            options['include_hxl'] = include_hxl_row(
+                dataview.columns, columns_with_hxl.keys())
+
+    return options
+
+
+def get_source_version(xform, dataview):
+    """
+    Returns a value that changes when the data of a linked dataset changes.
+    """
+    return u'{}-{}-{}'.format(
+        get_xform_data_version(xform.pk), xform.date_modified,
+        dataview.date_modified if dataview else None)
+
+
+def _linked_dataset_key(metadata_id, options):
+    return '{}{}-{}'.format(
+        LINKED_DATASET_CSV, metadata_id,
+        md5(json.dumps(options, sort_keys=True, default=unicode)).hexdigest())
+
+
+def is_shared_dataset(xform, user):
+    """
+    Returns True when `user` sees all the submissions of the form, and so the
+    same CSV as everyone else who does.
+    """
+    try:
+        return filter_queryset_xform_meta_perms_sql(xform, user, {}) == {}
+    except NoRecordsPermission:
+        return False
+
+
+def create_linked_dataset_csv(metadata, xform, dataview, options):
+    """
+    Exports the linked dataset to a CSV file and records it as the file of
+    the media `metadata` for the version of the data it was created from.
+    """
+    key = _linked_dataset_key(metadata.pk, options)
+    # read before exporting, changes made while exporting leave it outdated
+    version = get_source_version(xform, dataview)
+    entry = None
+
+    try:
+        export = generate_export(Export.CSV_EXPORT, xform, None,
+                                 dict(options))
+        if export.filename:
+            storage = get_storage_class()()
+            file_hash = md5()
+            with storage.open(export.filepath) as f:
+                for chunk in f.chunks():
+                    file_hash.update(chunk)
+
+            entry = {
+                'version': version,
+                'path': export.filepath,
+                'hash': u'md5:%s' % file_hash.hexdigest()
+            }
+            cache.set(key, entry, None)
+            # the manifest of the form lists the new hash
+            bump_xform_manifest_version(metadata.object_id)
+    except Exception as e:
+        logging.exception(u"Linked dataset CSV of %s failed: %s" % (
+            metadata.pk, e))
+    finally:
+        cache.delete(key + '-lock')
+
+    return entry
+
+
+def queue_linked_dataset_csv(metadata_id, options, params):
+    """
+    Creates the CSV of a linked dataset media in the background, once
+    however many times it is asked for.
+    """
+    from onadata.apps.viewer.tasks import create_linked_dataset_csv_async
+
+    if cache.add(_linked_dataset_key(metadata_id, options) + '-lock', True,
+                 LINKED_DATASET_CSV_LOCK_TIMEOUT):
+        create_linked_dataset_csv_async.delay(metadata_id, params)
+
+
+def get_linked_dataset_csv(metadata_id, xform, dataview, options, params):
+    """
+    Returns the latest CSV file created for a linked dataset media, a dict
+    of the file's path, hash and data version, None if there is none yet.
+
+    A CSV created from data that has since changed is returned as is and a
+    new one is created in the background.
+    """
+    entry = cache.get(_linked_dataset_key(metadata_id, options))
+
+    if entry is not None and \
+            entry['version'] != get_source_version(xform, dataview):
+        queue_linked_dataset_csv(metadata_id, options, params)
+
+    return entry
+
+
+def get_linked_dataset_hash(metadata, user, params):
+    """
+    Returns the hash of the CSV a linked dataset media is downloaded as, the
+    empty hash when the CSV has not been created yet or is created for
+    `user` alone.
+    """
+    xform, dataview, name = get_linked_dataset(metadata.data_value)
+
+    if xform is None or not is_shared_dataset(xform, user):
+        return EMPTY_HASH
+
+    options = get_linked_dataset_options(xform, dataview, params)
+    entry = get_linked_dataset_csv(metadata.pk, xform, dataview, options,
+                                   params)
+
+    if entry is None:
+        queue_linked_dataset_csv(metadata.pk, options, params)
+
+        return EMPTY_HASH
+
+    return entry['hash']
+
+
+def get_linked_dataset_response(request, metadata, xform, dataview,
+                                filename):
+    """
+    Returns a response that sends the CSV of a linked dataset media from
+    storage, None when the CSV is created for the user alone.
+    """
+    if not is_shared_dataset(xform, request.user):
+        return None
+
+    params = request.query_params.dict()
+    options = get_linked_dataset_options(xform, dataview, params)
+    content_disposition = generate_content_disposition_header(
+        filename or xform.id_string, 'csv', show_date=False)
+    entry = get_linked_dataset_csv(metadata.pk, xform, dataview, options,
+                                   params)
+
+    for attempt in xrange(2):
+        if entry is None:
+            entry = create_linked_dataset_csv(metadata, xform, dataview,
+                                              options)
+            if entry is None:
+                return None
+
+        try:
+            return get_file_response(
+                request, entry['path'],
+                'application/%s' % Export.EXPORT_MIMES['csv'],
+                entry['hash'].split(':')[-1], content_disposition)
+        except (IOError, OSError):
+            # the export file was deleted, older exports are removed
+            entry = None
+
+    return None
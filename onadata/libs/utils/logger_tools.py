@@ -35,7 +35,8 @@ from onadata.apps.logger.models import Instance
 from onadata.apps.logger.models.instance import (
     FormInactiveError,
     InstanceHistory,
-    get_id_string_from_xml_str)
+    get_id_string_from_xml_str,
+    get_xml_checksum)
 from onadata.apps.logger.models import XForm
 from onadata.apps.logger.models.xform import XLSFormError
 from onadata.apps.logger.xform_instance_parser import (
@@ -212,10 +213,12 @@ def save_submission(xform, xml, media_files, new_uuid, submitted_by, status,
             date_created_override = timezone.make_aware(
                 date_created_override, timezone.utc)
         instance.date_created = date_created_override
-        instance.save()
 
     if instance.xform is not None:
-        instance.save()
+        # the json of a saved submission is complete unless attachments were
+        # added or the submission date changed
+        if media_files or date_created_override:
+            instance.save()
         pi, created = ParsedInstance.objects.get_or_create(
             instance=instance)
 
@@ -260,8 +263,9 @@ def create_instance(username, xml_file, media_files,
     check_submission_permissions(request, xform)
 
     new_uuid = get_uuid_from_xml(xml)
+    checksum = get_xml_checksum(xml)
     filtered_instances = get_filtered_instances(
-        Q(xml=xml) | Q(uuid=new_uuid), xform_id=xform.pk
+        Q(checksum=checksum) | Q(uuid=new_uuid), xform_id=xform.pk
     )
     existing_instance = filtered_instances.first()
 
@@ -299,7 +303,7 @@ def create_instance(username, xml_file, media_files,
                 date_created_override)
     except IntegrityError:
         instance = Instance.objects.filter(
-            xml=xml, xform__id=xform.pk).first()
+            checksum=checksum, xform__id=xform.pk).first()
 
         if instance:
             attachment_names = [
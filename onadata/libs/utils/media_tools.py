@@ -0,0 +1,167 @@
+import re
+
+from django.conf import settings
+from django.core.files.storage import get_storage_class
+from django.http import HttpResponse
+from django.http import HttpResponseNotModified
+from django.http import HttpResponseRedirect
+from django.http import StreamingHttpResponse
+
+# how media files are sent: None to stream them from django,
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (apache, lighttpd) to have the
+# front-end server send them or 'redirect' to redirect to the storage url
+# e.g. a presigned S3 url
+MEDIA_DOWNLOAD_OFFLOAD = getattr(settings, 'MEDIA_DOWNLOAD_OFFLOAD', None)
+# the internal nginx location that serves the storage files
+MEDIA_X_ACCEL_REDIRECT_PREFIX = getattr(
+    settings, 'MEDIA_X_ACCEL_REDIRECT_PREFIX', '/protected/')
+MEDIA_STREAM_CHUNK_SIZE = getattr(settings, 'MEDIA_STREAM_CHUNK_SIZE',
+                                  64 * 1024)
+
+RANGE_REGEX = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def etag_matches(request, etag_hash):
+    """
+    Returns True when the If-None-Match header of the request matches
+    `etag_hash`.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+    if not if_none_match or not etag_hash:
+        return False
+
+    etags = [etag.strip() for etag in if_none_match.split(',')]
+
+    return u'*' in etags or etag_hash in [
+        etag.replace('W/', '', 1).strip('"') for etag in etags]
+
+
+def get_byte_range(request, size, etag_hash=None):
+    """
+    Returns the (first, last) bytes of the Range header of the request, None
+    when the whole file is to be sent.
+
+    Only single ranges are served, the whole file is sent for other ranges or
+    when the If-Range header does not match the file.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+
+    if not header or (if_range and if_range.strip('"') != etag_hash):
+        return None
+
+    match = RANGE_REGEX.match(header)
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # the last `last` bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+
+    if first > last or first >= size:
+        raise RangeNotSatisfiable()
+
+    return first, last
+
+
+def read_file(f, first, length, chunk_size=MEDIA_STREAM_CHUNK_SIZE):
+    """Yields `length` bytes of the file `f` from byte `first` in chunks."""
+    try:
+        if first:
+            f.seek(first)
+
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+
+            yield data
+    finally:
+        f.close()
+
+
+def _get_offload_response(storage, path):
+    if MEDIA_DOWNLOAD_OFFLOAD == 'redirect':
+        return HttpResponseRedirect(storage.url(path))
+
+    if MEDIA_DOWNLOAD_OFFLOAD == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = MEDIA_X_ACCEL_REDIRECT_PREFIX + path
+
+        return response
+
+    if MEDIA_DOWNLOAD_OFFLOAD == 'x-sendfile':
+        try:
+            file_path = storage.path(path)
+        except NotImplementedError:
+            # the files are not on this server
+            return None
+        response = HttpResponse()
+        response['X-Sendfile'] = file_path.encode('utf-8')
+
+        return response
+
+
+def get_file_response(request, path, content_type, etag_hash=None,
+                      content_disposition=None, storage=None):
+    """
+    Returns a response that sends the storage file `path` in chunks or has
+    it sent by the front-end server or the storage, see
+    MEDIA_DOWNLOAD_OFFLOAD.
+
+    Conditional (If-None-Match) and range (Range) requests are answered when
+    django sends the file.
+
+    Raises IOError or OSError when the file does not exist.
+    """
+    if etag_matches(request, etag_hash):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag_hash
+
+        return response
+
+    storage = storage or get_storage_class()()
+    response = _get_offload_response(storage, path) \
+        if MEDIA_DOWNLOAD_OFFLOAD else None
+
+    if response is None:
+        size = storage.size(path)
+        try:
+            byte_range = get_byte_range(request, size, etag_hash)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+
+            return response
+
+        first, last = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(
+            read_file(storage.open(path), first, last - first + 1),
+            status=206 if byte_range else 200)
+        response['Content-Length'] = last - first + 1
+        response['Accept-Ranges'] = 'bytes'
+        if byte_range:
+            response['Content-Range'] = 'bytes %d-%d/%d' % (first, last,
+                                                            size)
+
+    if not isinstance(response, HttpResponseRedirect):
+        response['Content-Type'] = content_type
+        if content_disposition:
+            response['Content-Disposition'] = content_disposition
+    if etag_hash:
+        response['ETag'] = etag_hash
+
+    return response
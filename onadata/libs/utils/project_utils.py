@@ -1,7 +1,20 @@
-from onadata.libs.permissions import get_object_users_with_permissions
+from celery import task
+from django.conf import settings
+from django.db import transaction
+from guardian.shortcuts import get_users_with_perms
+
+from onadata.apps.logger.models import Project
+from onadata.apps.logger.models import XForm
+from onadata.libs.permissions import assign_roles
+from onadata.libs.permissions import get_role
 from onadata.libs.permissions import OwnerRole
 from onadata.libs.permissions import ROLES
 
+# projects with more users than this have their permissions set on new forms
+# by a celery task, None to always set them when the form is saved
+PROJECT_PERMS_ASYNC_USERS = getattr(settings, 'PROJECT_PERMS_ASYNC_USERS',
+                                    None)
+
 
 def set_project_perms_to_xform(xform, project):
     # allows us to still use xform.shared and xform.shared_data as before
@@ -12,12 +25,37 @@ def set_project_perms_to_xform(xform, project):
         xform.shared_data = project.shared
         xform.save()
 
-    for perm in get_object_users_with_permissions(project):
-        user = perm['user']
-        role_name = perm['role']
-        role = ROLES.get(role_name)
+    users_with_perms = get_users_with_perms(
+        project, attach_perms=True, with_group_users=False)
+
+    if PROJECT_PERMS_ASYNC_USERS is not None and \
+            len(users_with_perms) > PROJECT_PERMS_ASYNC_USERS:
+        transaction.on_commit(
+            lambda: set_project_perms_to_xform_async.delay(xform.pk,
+                                                           project.pk))
+    else:
+        _set_project_roles_to_xform(xform, project, users_with_perms)
+
 
-        if user != xform.created_by:
-            role.add(user, xform)
+def _set_project_roles_to_xform(xform, project, users_with_perms):
+    roles = {}
+    for user, permissions in users_with_perms.items():
+        if user == xform.created_by:
+            roles[user] = OwnerRole
         else:
-            OwnerRole.add(user, xform)
+            role = ROLES.get(get_role(permissions, project))
+            if role:
+                roles[user] = role
+
+    assign_roles(xform, roles)
+
+
+@task()
+def set_project_perms_to_xform_async(xform_id, project_id):
+    xform = XForm.objects.filter(pk=xform_id).first()
+    project = Project.objects.filter(pk=project_id).first()
+
+    if xform and project:
+        users_with_perms = get_users_with_perms(
+            project, attach_perms=True, with_group_users=False)
+        _set_project_roles_to_xform(xform, project, users_with_perms)
@@ -1,19 +1,29 @@
 import os
+import shutil
 import traceback
 import requests
-import zipfile
 
-from tempfile import NamedTemporaryFile
+from tempfile import SpooledTemporaryFile
 from urlparse import urljoin
 from xml.dom import minidom
 
 from django.conf import settings
+from django.core.files import File
 from django.core.files.storage import get_storage_class
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.mail import mail_admins
 from django.utils.translation import ugettext as _
 
 from onadata.libs.utils import common_tags
+from onadata.libs.utils.zip_tools import IteratorFile, ZIP_CHUNK_SIZE, \
+    iter_zip, prefetch
+
+# the number of attachments fetched from storage at the same time for zips
+ATTACHMENTS_ZIP_WORKERS = getattr(settings, 'ATTACHMENTS_ZIP_WORKERS', 4)
+# the bytes of the fetched attachments of a zip kept in memory, the rest of
+# the attachments is spooled to temporary files
+ATTACHMENTS_ZIP_MEMORY = getattr(settings, 'ATTACHMENTS_ZIP_MEMORY',
+                                 16 * 1024 * 1024)
 
 
 SLASH = u"/"
@@ -39,17 +49,9 @@ def get_path(path, suffix):
 
 
 def image_urls(instance):
-    default_storage = get_storage_class()()
-    urls = []
-    suffix = settings.THUMB_CONF['medium']['suffix']
-    for a in instance.attachments.all():
-        if default_storage.exists(get_path(a.media_file.name, suffix)):
-            url = default_storage.url(
-                get_path(a.media_file.name, suffix))
-        else:
-            url = a.media_file.url
-        urls.append(url)
-    return urls
+    from onadata.libs.utils.image_tools import image_url
+
+    return [image_url(a, 'medium') for a in instance.attachments.all()]
 
 
 def parse_xform_instance(xml_str):
@@ -228,21 +230,82 @@ def generate_enketo_form_defaults(xform, **kwargs):
     return defaults
 
 
-def create_attachments_zipfile(attachments):
-    # create zip_file
-    tmp = NamedTemporaryFile()
-    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as z:
-        for attachment in attachments:
-            default_storage = get_storage_class()()
+def _open_attachment(name):
+    """
+    Fetches a whole attachment from storage into a temporary file that is
+    kept in memory up to its share of ATTACHMENTS_ZIP_MEMORY, None when it
+    does not exist or can not be read.
+    """
+    default_storage = get_storage_class()()
+    spooled = SpooledTemporaryFile(
+        max_size=ATTACHMENTS_ZIP_MEMORY // (ATTACHMENTS_ZIP_WORKERS + 1))
+
+    try:
+        if default_storage.exists(name):
+            with default_storage.open(name) as f:
+                shutil.copyfileobj(f, spooled, ZIP_CHUNK_SIZE)
+            spooled.seek(0)
+
+            return name, spooled
+    except Exception, e:
+        report_exception("Create attachment zip exception", e)
+
+    spooled.close()
+
+
+def _close_attachment(opened):
+    if opened is not None:
+        opened[1].close()
+
+
+def _read_attachment(name, f):
+    try:
+        data = f.read(ZIP_CHUNK_SIZE)
+        while data:
+            yield data
+            data = f.read(ZIP_CHUNK_SIZE)
+    finally:
+        f.close()
+
+
+def iter_attachments_zip(attachments):
+    """
+    Yields the bytes of a zip of the attachments as it is written, up to
+    ATTACHMENTS_ZIP_WORKERS attachments are fetched from storage at the same
+    time, those fetched are closed when the zip is not read to the end.
+    """
+    names = (a.media_file.name for a in attachments)
+    opened = prefetch(_open_attachment, names, ATTACHMENTS_ZIP_WORKERS,
+                      _close_attachment)
+
+    try:
+        for data in iter_zip((a[0], _read_attachment(*a))
+                             for a in opened if a is not None):
+            yield data
+    finally:
+        opened.close()
+
+
+def save_attachments_zipfile(attachments, path):
+    """
+    Saves a zip of the attachments to storage as it is written, returns the
+    name of the saved file.
+    """
+    default_storage = get_storage_class()()
+
+    try:
+        default_storage.path(path)
+    except NotImplementedError:
+        # remote storages e.g. S3 upload the file in parts as it is written
+        path = default_storage.get_available_name(path)
+        with default_storage.open(path, 'wb') as f:
+            for data in iter_attachments_zip(attachments):
+                f.write(data)
 
-            if default_storage.exists(attachment.media_file.name):
-                try:
-                    with default_storage.open(attachment.media_file.name) as f:
-                        z.writestr(attachment.media_file.name, f.read())
-                except Exception, e:
-                    report_exception("Create attachment zip exception", e)
+        return path
 
-    return tmp
+    return default_storage.save(
+        path, File(IteratorFile(iter_attachments_zip(attachments)), path))
 
 
 def get_form(kwargs):
@@ -0,0 +1,161 @@
+import os
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+ZIP_CHUNK_SIZE = 64 * 1024
+# files that are already compressed are stored as they are
+STORED_EXTENSIONS = set([
+    '3gp', 'aac', 'amr', 'avi', 'gif', 'gz', 'jpeg', 'jpg', 'm4a', 'mkv',
+    'mov', 'mp3', 'mp4', 'mpeg', 'ogg', 'png', 'webm', 'webp', 'zip'])
+ZIP64_VERSION = 45
+
+
+class ZipOutput(object):
+    """A write only file that keeps what is written to it until read."""
+
+    def __init__(self):
+        self.position = 0
+        self.data = []
+
+    def write(self, data):
+        self.data.append(data)
+        self.position += len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def read(self):
+        data = ''.join(self.data)
+        self.data = []
+
+        return data
+
+
+class IteratorFile(object):
+    """A read only file of the bytes yielded by an iterator."""
+
+    def __init__(self, iterator):
+        self.iterator = iter(iterator)
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.buffer += next(self.iterator)
+            except StopIteration:
+                break
+
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+
+        return data
+
+    def close(self):
+        if hasattr(self.iterator, 'close'):
+            self.iterator.close()
+
+
+def _write_entry(output, name, chunks):
+    """
+    Writes a zip entry of the bytes yielded by `chunks` to `output` without
+    seeking back, the CRC and sizes are written after the data. Yields the
+    bytes written as it goes and returns the ZipInfo of the entry last.
+    """
+    info = zipfile.ZipInfo(name, time.localtime()[:6])
+    info.external_attr = 0o600 << 16
+    info.flag_bits |= 0x08
+    info.extract_version = ZIP64_VERSION
+    info.header_offset = output.tell()
+    info.CRC = info.compress_size = info.file_size = 0
+
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    compressor = None
+    if extension not in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_DEFLATED
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                      zlib.DEFLATED, -15)
+
+    # the sizes of the data descriptor are 8 bytes with a zip64 header
+    output.write(info.FileHeader(zip64=True))
+
+    crc = 0
+    for data in chunks:
+        info.file_size += len(data)
+        crc = zlib.crc32(data, crc)
+        if compressor:
+            data = compressor.compress(data)
+        info.compress_size += len(data)
+        output.write(data)
+
+        yield output.read()
+
+    if compressor:
+        data = compressor.flush()
+        info.compress_size += len(data)
+        output.write(data)
+
+    info.CRC = crc & 0xffffffff
+    output.write(struct.pack('<4sLQQ', 'PK\x07\x08', info.CRC,
+                             info.compress_size, info.file_size))
+
+    yield output.read()
+    yield info
+
+
+def iter_zip(files):
+    """
+    Yields the bytes of a zip archive of `files`, (name, iterable of bytes)
+    pairs, as it is written so that it can be streamed.
+    """
+    output = ZipOutput()
+    archive = zipfile.ZipFile(output, 'w', allowZip64=True)
+
+    for name, chunks in files:
+        for data in _write_entry(output, name, chunks):
+            if isinstance(data, zipfile.ZipInfo):
+                archive.filelist.append(data)
+                archive.NameToInfo[data.filename] = data
+            elif data:
+                yield data
+
+    # writes the central directory
+    archive.close()
+
+    yield output.read()
+
+
+def prefetch(func, items, workers, cleanup=None):
+    """
+    Yields func(item) for each of `items` in order, up to `workers` items
+    ahead of the one yielded are processed at the same time.
+
+    When the generator is closed early `cleanup` is called with each result
+    that was processed and not yielded.
+    """
+    pool = ThreadPool(workers)
+    pending = deque()
+
+    try:
+        for item in items:
+            pending.append(pool.apply_async(func, (item, )))
+            if len(pending) > workers:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.close()
+        pool.join()
+
+        if cleanup is not None:
+            for result in pending:
+                if result.successful():
+                    cleanup(result.get())
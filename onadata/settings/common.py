@@ -14,6 +14,7 @@ import os
 import subprocess  # noqa, used by included files
 import sys
 import socket
+from datetime import timedelta
 from urlparse import urljoin
 
 from celery.signals import after_setup_logger
@@ -274,7 +275,7 @@ AUTH_PROFILE_MODULE = 'onadata.apps.main.UserProfile'
 # case insensitive usernames
 AUTHENTICATION_BACKENDS = (
     'onadata.apps.main.backends.ModelBackend',
-    'guardian.backends.ObjectPermissionBackend',
+    'onadata.apps.main.backends.ObjectPermissionBackend',
 )
 
 # Settings for Django Registration
@@ -431,6 +432,14 @@ CELERY_ALWAYS_EAGER = False
 CELERY_IMPORTS = ('onadata.libs.utils.csv_import',)
 CSV_ROW_IMPORT_ASYNC_THRESHOLD = 100
 GOOGLE_SHEET_UPLOAD_BATCH = 1000
+# run by celery beat, sends the failed rest service deliveries that are due
+# even when the retry scheduled by the failure was lost
+CELERYBEAT_SCHEDULE = {
+    'retry-rest-service-deliveries': {
+        'task': 'onadata.apps.restservice.tasks.retry_deliveries_async',
+        'schedule': timedelta(minutes=1),
+    },
+}
 
 # duration to keep zip exports before deletion (in seconds)
 ZIP_EXPORT_COUNTDOWN = 3600  # 1 hour
@@ -496,6 +505,9 @@ METADATA_SEPARATOR = "|"
 PARSED_INSTANCE_DEFAULT_LIMIT = 1000000
 PARSED_INSTANCE_DEFAULT_BATCHSIZE = 1000
 
+# submission parser, minidom or lxml
+XFORM_INSTANCE_PARSER = 'minidom'
+
 PROFILE_SERIALIZER = \
     "onadata.libs.serializers.user_profile_serializer.UserProfileSerializer"
 ORG_PROFILE_SERIALIZER = \